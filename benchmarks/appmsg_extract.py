@@ -0,0 +1,215 @@
+"""
+AppMsg extract benchmark - APP消息 XML 提取基准测试
+
+使用与微信真实消息结构一致的 appmsg 载荷（引用、网页分享、文件、小程序），对比：
+- 改造前：每条消息 etree.fromstring 构建 DOM 后多次 .//appmsg/... 查找
+- 正则快速路径 + XPath 兜底（不使用缓存）
+- 带内容哈希缓存的提取器（转发内容重复）
+- 进程池并行解析
+
+运行方式：
+    python -m benchmarks.appmsg_extract [--messages 20000] [--workers 4]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Optional
+
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.appmsg import AppMessage, AppMessageExtractor, parse_app_message  # noqa: E402
+
+QUOTE = """<?xml version="1.0"?>
+<msg>
+    <appmsg appid="" sdkver="0">
+        <title>{text}</title>
+        <des />
+        <action />
+        <type>57</type>
+        <showtype>0</showtype>
+        <content />
+        <url />
+        <appattach>
+            <totallen>0</totallen>
+            <attachid />
+            <fileext />
+        </appattach>
+        <extinfo />
+        <refermsg>
+            <type>1</type>
+            <svrid>{n}</svrid>
+            <fromusr>12345678@chatroom</fromusr>
+            <chatusr>wxid_member_{m}</chatusr>
+            <displayname>群友{m}</displayname>
+            <content>被引用的消息 {n} &lt;b&gt;</content>
+            <msgsource>&lt;msgsource&gt;&lt;sequence_id&gt;{n}&lt;/sequence_id&gt;&lt;/msgsource&gt;</msgsource>
+        </refermsg>
+    </appmsg>
+    <fromusername>wxid_member_{m}</fromusername>
+    <scene>0</scene>
+    <appinfo>
+        <version>1</version>
+        <appname></appname>
+    </appinfo>
+    <commenturl></commenturl>
+</msg>"""
+
+LINK = """<?xml version="1.0"?>
+<msg>
+    <appmsg appid="wx6618f1cfc6c132f8" sdkver="0">
+        <title><![CDATA[第 {n} 篇：一篇很长的公众号文章标题，讲讲数据库索引]]></title>
+        <des><![CDATA[文章摘要 {n}，B+ 树、联合索引、最左前缀 & 覆盖索引]]></des>
+        <action>view</action>
+        <type>5</type>
+        <showtype>0</showtype>
+        <url>https://mp.weixin.qq.com/s?__biz=MzA&amp;mid={n}&amp;idx=1&amp;sn=abcdef</url>
+        <thumburl>https://mmbiz.qpic.cn/mmbiz_jpg/{n}/0?wx_fmt=jpeg</thumburl>
+        <appattach>
+            <totallen>0</totallen>
+            <cdnthumburl>3057020100044b304902010002</cdnthumburl>
+            <cdnthumbmd5>9f0b7a6b2d9c</cdnthumbmd5>
+            <cdnthumblength>8842</cdnthumblength>
+        </appattach>
+        <mmreader>
+            <category type="20" count="1">
+                <name><![CDATA[公众号]]></name>
+                <item>
+                    <itemshowtype>0</itemshowtype>
+                    <title><![CDATA[第 {n} 篇：一篇很长的公众号文章标题]]></title>
+                    <url><![CDATA[https://mp.weixin.qq.com/s?mid={n}]]></url>
+                </item>
+            </category>
+        </mmreader>
+        <sourceusername>gh_123456</sourceusername>
+        <sourcedisplayname>技术公众号</sourcedisplayname>
+    </appmsg>
+    <fromusername>wxid_member_{m}</fromusername>
+    <scene>0</scene>
+</msg>"""
+
+FILE = """<?xml version="1.0"?>
+<msg>
+    <appmsg appid="" sdkver="0">
+        <title>季度报告_{n}.pdf</title>
+        <des />
+        <action>view</action>
+        <type>6</type>
+        <showtype>0</showtype>
+        <appattach>
+            <totallen>{n}2048</totallen>
+            <attachid>@cdn_3057020100044b_{n}</attachid>
+            <fileext>pdf</fileext>
+            <cdnattachurl>3057020100044b304902010002</cdnattachurl>
+            <aeskey>0123456789abcdef</aeskey>
+        </appattach>
+        <md5>d41d8cd98f00b204e9800998ecf8427e</md5>
+    </appmsg>
+    <fromusername>wxid_member_{m}</fromusername>
+</msg>"""
+
+MINI_PROGRAM = """<?xml version="1.0"?>
+<msg>
+    <appmsg appid="" sdkver="0">
+        <title>快来帮我砍一刀 {n}</title>
+        <des>小程序描述</des>
+        <type>33</type>
+        <url>https://mp.weixin.qq.com/mp/waerrpage?appid=wx1234</url>
+        <sourcedisplayname>某小程序</sourcedisplayname>
+        <weappinfo>
+            <pagepath><![CDATA[pages/index/index.html?id={n}]]></pagepath>
+            <username>gh_abcdef@app</username>
+            <appid>wx1234</appid>
+            <type>2</type>
+            <version>18</version>
+        </weappinfo>
+    </appmsg>
+    <fromusername>wxid_member_{m}</fromusername>
+</msg>"""
+
+
+def build_payloads(count: int, duplicate_ratio: float) -> List[str]:
+    """生成消息载荷，duplicate_ratio 比例的消息是转发的重复内容"""
+    rng = random.Random(42)
+    templates = [QUOTE, QUOTE, LINK, FILE, MINI_PROGRAM]
+    forwarded = [template.format(text="转发内容", n=i, m=i) for i, template in enumerate(templates)]
+    payloads = []
+    for n in range(count):
+        if rng.random() < duplicate_ratio:
+            payloads.append(rng.choice(forwarded))
+        else:
+            template = rng.choice(templates)
+            payloads.append(template.format(text=f"回复第 {n} 条：说得对 &amp; 有道理", n=n, m=n % 200))
+    return payloads
+
+
+def legacy_extract(content: str) -> Optional[AppMessage]:
+    """改造前的实现：构建完整 DOM 后逐个字段查找"""
+    try:
+        root = etree.fromstring(content.encode("utf-8"))
+    except etree.XMLSyntaxError:
+        return None
+
+    def text(path: str) -> str:
+        elem = root.find(path)
+        return (elem.text or "") if elem is not None else ""
+
+    return AppMessage(text(".//appmsg/type"), text(".//appmsg/title"), text(".//appmsg/des"))
+
+
+def measure(name: str, payloads: List[str], fn: Callable[[List[str]], object], repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(payloads)
+        timings.append(time.perf_counter() - started)
+    print(f"{name}: {len(payloads) / min(timings):,.0f} 条/秒")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="APP消息 XML 提取基准测试")
+    parser.add_argument("--messages", type=int, default=20000, help="消息条数")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="转发重复内容的比例")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="进程池进程数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景运行次数，取最好成绩")
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.messages, args.duplicates)
+
+    # 正确性：快速路径与完整 DOM 解析结果一致
+    for content in payloads[:2000]:
+        expected = legacy_extract(content)
+        actual = parse_app_message(content)
+        assert expected is not None and actual is not None
+        assert actual.type == expected.type.strip(), (actual, expected)
+        assert actual.title == expected.title.strip(), (actual, expected)
+
+    print(f"消息条数: {args.messages}，重复内容比例: {args.duplicates:.0%}")
+    measure("改造前（DOM + find）", payloads, lambda items: [legacy_extract(c) for c in items], args.repeat)
+    measure("快速路径（无缓存）", payloads, lambda items: [parse_app_message(c) for c in items], args.repeat)
+
+    # 冷缓存：每轮使用新的提取器，只有批内重复内容命中缓存
+    measure(
+        "提取器（冷缓存）",
+        payloads,
+        lambda items: AppMessageExtractor(cache_size=args.messages).extract_many(items),
+        args.repeat,
+    )
+    # 热缓存：同一时间窗口被再次总结
+    warm = AppMessageExtractor(cache_size=args.messages)
+    warm.extract_many(payloads)
+    measure("提取器（热缓存）", payloads, warm.extract_many, args.repeat)
+
+    extractor = AppMessageExtractor(cache_size=0, workers=args.workers, parallel_threshold=1)
+    extractor.extract_many(payloads[:args.workers])  # 预热进程池
+    try:
+        measure(f"进程池（{args.workers} 进程，无缓存）", payloads, extractor.extract_many, args.repeat)
+    finally:
+        extractor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Message fetch benchmark - 群聊总结取数路径基准测试
+
+对比整行 ORM 实体查询与列投影查询在同一个 5 万条消息的群聊上的吞吐(行/秒)，
+使用 SQLite 文件库作为 MySQL 的本地替身。
+
+运行方式：
+    python -m benchmarks.message_fetch [--rows 50000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.model.message import Base, Message  # noqa: E402
+from src.repository.message import (  # noqa: E402
+    MessageRepository,
+    _extract_message_content,
+    _messages_by_time_range_statement,
+)
+
+CHAT_ROOM_ID = "bench@chatroom"
+SELF_WXID = "wxid_self"
+START_TIME = 1_700_000_000
+
+APP_MESSAGE = (
+    '<msg><appmsg appid="" sdkver="0"><title>{title}</title><des>链接描述</des>'
+    '<type>{type}</type><url>https://example.com/{n}</url></appmsg></msg>'
+)
+
+
+def populate(session_maker: sessionmaker, rows: int) -> None:
+    """写入合成数据：80% 文本消息，20% APP消息（引用、文章、附件、小程序混合）"""
+    app_types = ["57", "5", "6", "33"]
+    records = []
+    for n in range(rows):
+        if n % 5 == 0:
+            app_type = app_types[n % len(app_types)]
+            msg_type, content = 49, APP_MESSAGE.format(title=f"标题{n}", type=app_type, n=n)
+        else:
+            msg_type, app_type, content = 1, "0", f"第 {n} 条消息，随便聊点什么"
+        records.append({
+            "id": n + 1,
+            "msg_id": n + 1,
+            "client_msg_id": n + 1,
+            "type": msg_type,
+            "app_msg_type": int(app_type),
+            "content": content,
+            "from_wxid": CHAT_ROOM_ID,
+            "sender_wxid": f"wxid_member_{n % 200}",
+            "created_at": START_TIME + n,
+            "updated_at": START_TIME + n,
+        })
+    with session_maker.begin() as session:
+        session.execute(Message.__table__.insert(), records)
+
+
+def fetch_orm_entities(session: Session) -> int:
+    """改造前的路径：查询整行 ORM 实体后逐行提取内容"""
+    stmt = select(Message).where(
+        Message.from_wxid == CHAT_ROOM_ID,
+        Message.type.in_([1, 49]),
+        Message.sender_wxid != SELF_WXID,
+        Message.created_at >= START_TIME,
+    ).order_by(Message.created_at.asc())
+    count = 0
+    for msg in session.execute(stmt).scalars():
+        if _extract_message_content(msg, ["57", "4", "5", "6"]) is not None:
+            count += 1
+    return count
+
+
+def fetch_projected_rows(session: Session) -> int:
+    """改造后的路径：仓库的列投影查询"""
+    repo = MessageRepository(session)
+    count = 0
+    for batch in repo.iter_messages_by_time_range(SELF_WXID, CHAT_ROOM_ID, START_TIME, START_TIME + 10**9):
+        count += len(batch)
+    return count
+
+
+def fetch_projected_only(session: Session) -> int:
+    """只读取投影行不做内容提取，衡量纯查询开销"""
+    stmt = _messages_by_time_range_statement(SELF_WXID, CHAT_ROOM_ID, START_TIME, START_TIME + 10**9)
+    return len(session.execute(stmt).all())
+
+
+def measure(session_maker: sessionmaker, fn: Callable[[Session], int], rows: int, repeat: int) -> float:
+    """返回多次运行中最好的吞吐(行/秒)"""
+    timings: List[float] = []
+    for _ in range(repeat):
+        with session_maker() as session:
+            started = time.perf_counter()
+            fn(session)
+            timings.append(time.perf_counter() - started)
+    return rows / min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="群聊总结取数路径基准测试")
+    parser.add_argument("--rows", type=int, default=50000, help="合成消息条数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个场景运行次数，取最好成绩")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(engine)
+        session_maker = sessionmaker(bind=engine)
+        populate(session_maker, args.rows)
+
+        cases = [
+            ("ORM 实体 + 内容提取", fetch_orm_entities),
+            ("列投影 + 内容提取", fetch_projected_rows),
+            ("列投影（仅查询）", fetch_projected_only),
+        ]
+        print(f"消息条数: {args.rows}")
+        for name, fn in cases:
+            rate = measure(session_maker, fn, args.rows, args.repeat)
+            print(f"{name}: {rate:,.0f} 行/秒")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Webhook ingest benchmark - Webhook 消息入库吞吐基准测试
+
+对比逐条 INSERT + 提交与入库管道按批多行 INSERT 写入 messages 表的吞吐(条/秒)，
+并统计队列满时被拒绝（推送方需要重试）的投递次数，使用 SQLite 文件库作为 MySQL 的本地替身。
+按 --duplicate-ratio 模拟客户端重复推送，对比有无 NewMsgId 去重时写入的行数。
+
+运行方式：
+    python -m benchmarks.webhook_ingest [--messages 20000] [--per-request 10] [--max-pending 2000] [--duplicate-ratio 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.model.message import Base, Message  # noqa: E402
+from src.webhook.dedupe import MessageDeduper  # noqa: E402
+from src.webhook.ingest import IngestQueueFull, MessageIngestor, message_to_row  # noqa: E402
+
+ROBOT_CODE = "bench"
+ROBOT_WXID = "wxid_self"
+CHAT_ROOM_ID = "bench@chatroom"
+START_TIME = 1_700_000_000
+
+
+def make_messages(count: int, offset: int) -> List[Dict[str, Any]]:
+    """生成 AddMsgs 形式的合成群消息"""
+    return [
+        {
+            "MsgId": offset + n + 1,
+            "NewMsgId": offset + n + 1,
+            "FromUserName": {"string": CHAT_ROOM_ID},
+            "ToUserName": {"string": ROBOT_WXID},
+            "Content": {"string": f"wxid_member_{n % 200}:\n第 {offset + n} 条消息，随便聊点什么"},
+            "CreateTime": START_TIME + offset + n,
+            "MsgType": 1,
+            "MsgSource": "<msgsource><silence>1</silence></msgsource>",
+        }
+        for n in range(count)
+    ]
+
+
+def make_deliveries(total: int, per_request: int, duplicate_ratio: float) -> List[List[Dict[str, Any]]]:
+    """按推送切分消息，按比例重复推送部分请求（紧跟在原推送之后，模拟超时重试）"""
+    deliveries = []
+    every = round(1 / duplicate_ratio) if duplicate_ratio > 0 else 0
+    for n, offset in enumerate(range(0, total, per_request)):
+        messages = make_messages(min(per_request, total - offset), offset)
+        deliveries.append(messages)
+        if every and n % every == 0:
+            deliveries.append(messages)
+    return deliveries
+
+
+async def reset(session_maker: async_sessionmaker) -> None:
+    async with session_maker() as db:
+        await db.execute(Message.__table__.delete())
+        await db.commit()
+
+
+async def count_rows(session_maker: async_sessionmaker) -> int:
+    async with session_maker() as db:
+        return int((await db.execute(select(func.count()).select_from(Message))).scalar_one())
+
+
+async def ingest_row_by_row(session_maker: async_sessionmaker, deliveries: List[List[Dict[str, Any]]]) -> int:
+    """改造前的写法：每条消息一次 INSERT 和提交"""
+    now = int(time.time())
+    async with session_maker() as db:
+        for messages in deliveries:
+            for message in messages:
+                await db.execute(Message.__table__.insert().values(message_to_row(message, ROBOT_WXID, now)))
+                await db.commit()
+    return 0
+
+
+async def ingest_batched(
+    session_maker: async_sessionmaker, deliveries: List[List[Dict[str, Any]]], ingestor: MessageIngestor
+) -> int:
+    """改造后的写法：入库管道攒批写入，队列满时等待后重试，返回被拒绝的投递次数"""
+
+    async def factory(robot_code: str) -> async_sessionmaker:
+        return session_maker
+
+    ingestor.session_maker_factory = factory
+    rejected = 0
+    for messages in deliveries:
+        while True:
+            try:
+                ingestor.submit(ROBOT_CODE, ROBOT_WXID, messages)
+                break
+            except IngestQueueFull:
+                rejected += 1
+                await asyncio.sleep(0.01)
+        # 模拟网络收包，让出事件循环
+        await asyncio.sleep(0)
+    await ingestor.aclose(timeout=600)
+    return rejected
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+        deliveries = make_deliveries(args.messages, args.per_request, args.duplicate_ratio)
+        delivered = sum(len(messages) for messages in deliveries)
+        print(
+            f"消息条数: {args.messages}，推送条数(含重复): {delivered}，每次推送: {args.per_request} 条，"
+            f"队列上限: {args.max_pending}"
+        )
+        cases = [("逐条 INSERT + 提交", None, False)] + [
+            (f"批量入库 batch_size={size}", size, False) for size in args.batch_sizes
+        ] + [(f"批量入库 batch_size={args.batch_sizes[-1]} + 去重", args.batch_sizes[-1], True)]
+        for name, batch_size, dedupe in cases:
+            await reset(session_maker)
+            started = time.perf_counter()
+            hit_rate = ""
+            if batch_size is None:
+                rejected = await ingest_row_by_row(session_maker, deliveries)
+            else:
+                ingestor = MessageIngestor(
+                    max_pending=args.max_pending,
+                    batch_size=batch_size,
+                    flush_interval=0.05,
+                    deduper=MessageDeduper() if dedupe else None,
+                )
+                rejected = await ingest_batched(session_maker, deliveries, ingestor)
+                if ingestor.deduper is not None:
+                    hit_rate = f"，去重命中率 {ingestor.deduper.stats()['hit_rate']:.1%}"
+            elapsed = time.perf_counter() - started
+            written = await count_rows(session_maker)
+            print(
+                f"{name}: {delivered / elapsed:,.0f} 条/秒，写入 {written} 条，"
+                f"拒绝投递 {rejected} 次{hit_rate}"
+            )
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Webhook 消息入库吞吐基准测试")
+    parser.add_argument("--messages", type=int, default=20000, help="合成消息条数")
+    parser.add_argument("--per-request", type=int, default=10, help="每次 Webhook 推送的消息条数")
+    parser.add_argument("--max-pending", type=int, default=2000, help="入库队列上限")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2, help="重复推送的请求比例")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[50, 200, 500], help="批大小")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,9 @@ from .config import (
     tenant_db_manager,
     load_config,
     get_db_by_robot_code,
+    get_async_db_by_robot_code,
 )
+from .budget import ConnectionBudget, connection_budget
 
 __all__ = [
     'MysqlSettings',
@@ -17,4 +19,7 @@ __all__ = [
     'tenant_db_manager',
     'load_config',
     'get_db_by_robot_code',
+    'get_async_db_by_robot_code',
+    'ConnectionBudget',
+    'connection_budget',
 ]
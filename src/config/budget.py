@@ -0,0 +1,273 @@
+"""
+Connection Budget - 进程级数据库连接预算
+
+所有租户的连接池共享同一个预算，按物理连接计数（连接池里空闲的连接也占用预算）。
+预算耗尽时先回收其他连接池的空闲连接，仍不足时按先来先到的顺序排队等待，
+保证进程打开的连接总数不超过 MySQL 的 max_connections。
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set
+
+from sqlalchemy import exc, pool
+from sqlalchemy.pool import ConnectionPoolEntry
+from sqlalchemy.util import await_only
+from sqlalchemy.util import queue as sqla_queue
+
+logger = logging.getLogger(__name__)
+
+
+class _Waiter:
+    """排队等待预算的调用方，同步调用方使用 Event，异步调用方使用 Future"""
+
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(
+        self,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        future: Optional[asyncio.Future] = None,
+    ):
+        self.granted = False
+        self.event = threading.Event() if future is None else None
+        self.loop = loop
+        self.future = future
+
+    def wake(self) -> None:
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve_future, self.future)
+
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ConnectionBudget:
+    """进程级连接预算（公平 FIFO 队列），同时支持线程和 asyncio 调用方"""
+
+    def __init__(self, limit: int):
+        self._lock = threading.Lock()
+        self._limit = limit
+        self._in_use = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._waits = 0
+        self._timeouts = 0
+        self._reclaims = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def configure(self, limit: int) -> None:
+        """调整预算上限，<= 0 表示不限制"""
+        with self._lock:
+            self._limit = limit
+            self._wake_locked()
+
+    def try_acquire(self) -> bool:
+        """不等待地占用一个连接预算，预算不足或有人排队时返回 False"""
+        with self._lock:
+            return self._try_acquire_locked()
+
+    def has_waiters(self) -> bool:
+        """是否有调用方在排队等待预算"""
+        return bool(self._waiters)
+
+    def reclaimed(self) -> None:
+        """记录一次为腾出预算而回收的空闲连接"""
+        with self._lock:
+            self._reclaims += 1
+
+    def acquire(self, timeout: float) -> None:
+        """同步占用一个连接预算，超时抛出 TimeoutError"""
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+            self._waits += 1
+
+        assert waiter.event is not None
+        if waiter.event.wait(timeout):
+            return
+        self._abandon(waiter, timeout)
+
+    async def acquire_async(self, timeout: float) -> None:
+        """异步占用一个连接预算，超时抛出 TimeoutError"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            waiter = _Waiter(loop, loop.create_future())
+            self._waiters.append(waiter)
+            self._waits += 1
+
+        assert waiter.future is not None
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter, timeout)
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # 已经分配到预算但调用方被取消，归还预算
+                    self._release_locked()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        """归还一个连接预算，并唤醒队首的等待者"""
+        with self._lock:
+            self._release_locked()
+
+    def stats(self) -> Dict[str, int]:
+        """返回连接预算的统计信息"""
+        with self._lock:
+            return {
+                "limit": self._limit,
+                "in_use": self._in_use,
+                "waiting": len(self._waiters),
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "reclaims": self._reclaims,
+            }
+
+    def _abandon(self, waiter: _Waiter, timeout: float) -> None:
+        """等待超时：如果期间恰好分配到了预算则直接使用，否则退出队列"""
+        with self._lock:
+            if waiter.granted:
+                return
+            self._waiters.remove(waiter)
+            self._timeouts += 1
+        raise exc.TimeoutError(
+            f"数据库连接预算已耗尽(上限 {self._limit})，等待 {timeout:.2f} 秒后超时"
+        )
+
+    def _try_acquire_locked(self) -> bool:
+        # 有人排队时新来的调用方也必须排队，保证公平
+        if self._waiters:
+            return False
+        if self._limit > 0 and self._in_use >= self._limit:
+            return False
+        self._in_use += 1
+        return True
+
+    def _release_locked(self) -> None:
+        if self._in_use > 0:
+            self._in_use -= 1
+        self._wake_locked()
+
+    def _wake_locked(self) -> None:
+        while self._waiters and (self._limit <= 0 or self._in_use < self._limit):
+            waiter = self._waiters.popleft()
+            self._in_use += 1
+            waiter.wake()
+
+
+class _BudgetedPoolMixin:
+    """按物理连接占用进程级连接预算：建立连接时占用，关闭连接（包括失效）时归还
+    
+    连接池中空闲的连接同样占用预算。预算耗尽时先关闭其他租户连接池中的一个空闲连接腾出预算，
+    没有空闲连接可以回收时再排队等待；有人排队时归还的连接直接关闭，预算交给队首的等待者。
+    """
+
+    _is_asyncio: bool
+    _timeout: float
+    _pool: Any
+
+    def _should_wrap_creator(self, creator: Any) -> Callable[[ConnectionPoolEntry], Any]:
+        # Pool 在设置 creator 时调用，所有物理连接（包括失效后重连）都经过返回的函数
+        invoke = super()._should_wrap_creator(creator)  # type: ignore[misc]
+        _budgeted_pools.add(self)
+
+        def connect(record: ConnectionPoolEntry) -> Any:
+            self._acquire_budget()
+            try:
+                connection = invoke(record)
+            except BaseException:
+                connection_budget.release()
+                raise
+            self._budgeted_connections().add(id(connection))
+            return connection
+
+        return connect
+
+    def _close_connection(self, connection: Any, *, terminate: bool = False) -> None:
+        try:
+            super()._close_connection(connection, terminate=terminate)  # type: ignore[misc]
+        finally:
+            held = self._budgeted_connections()
+            if id(connection) in held:
+                held.discard(id(connection))
+                connection_budget.release()
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        # 有调用方在排队等待预算时，归还的连接直接关闭，把预算让给队首的等待者
+        if connection_budget.has_waiters():
+            try:
+                record.close()
+            finally:
+                self._dec_overflow()  # type: ignore[attr-defined]
+            connection_budget.reclaimed()
+            return
+        super()._do_return_conn(record)  # type: ignore[misc]
+
+    def _budgeted_connections(self) -> Set[int]:
+        held = self.__dict__.get("_budget_connections")
+        if held is None:
+            held = self.__dict__["_budget_connections"] = set()
+        return held
+
+    def _acquire_budget(self) -> None:
+        if connection_budget.try_acquire():
+            return
+        if self._reclaim_idle():
+            connection_budget.reclaimed()
+        if self._is_asyncio:
+            await_only(connection_budget.acquire_async(self._timeout))
+        else:
+            connection_budget.acquire(self._timeout)
+
+    def _reclaim_idle(self) -> bool:
+        """关闭其他连接池中的一个空闲连接，返回是否关闭成功"""
+        candidates = sorted(
+            (pool for pool in list(_budgeted_pools) if pool is not self and pool._is_asyncio == self._is_asyncio),
+            key=lambda pool: pool._pool.qsize(),
+            reverse=True,
+        )
+        for pool in candidates:
+            try:
+                record = pool._pool.get(False)
+            except sqla_queue.Empty:
+                continue
+            try:
+                record.close()
+            except Exception as e:
+                logger.warning(f"回收空闲数据库连接失败: {e}")
+            finally:
+                pool._dec_overflow()
+            return True
+        return False
+
+
+# 所有受预算约束的连接池，预算耗尽时从中回收空闲连接
+_budgeted_pools: "weakref.WeakSet[_BudgetedPoolMixin]" = weakref.WeakSet()
+
+
+class BudgetedQueuePool(_BudgetedPoolMixin, pool.QueuePool):
+    """受进程级连接预算约束的 QueuePool"""
+
+
+class BudgetedAsyncAdaptedQueuePool(_BudgetedPoolMixin, pool.AsyncAdaptedQueuePool):
+    """受进程级连接预算约束的 AsyncAdaptedQueuePool"""
+
+
+# 全局连接预算，load_config 时根据 MYSQL_MAX_CONNECTIONS 调整上限
+connection_budget = ConnectionBudget(limit=500)
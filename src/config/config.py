@@ -1,11 +1,35 @@
 import os
+import time
+import asyncio
 import logging
-from typing import Dict, Optional
-from threading import RLock
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from threading import Event, RLock
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, pool, text
+from sqlalchemy import Engine, create_engine, exc, literal, select, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from .budget import BudgetedAsyncAdaptedQueuePool, BudgetedQueuePool, connection_budget
+from ..model.message import Message
+from ..robot_context.session_scope import session_leak_detector
+from ..repository.settings_cache import settings_cache
+from ..utils.appmsg import appmsg_extractor
+from ..llm.client_registry import openai_client_registry
+from ..llm.rate_limiter import llm_rate_limiter
+from ..utils.robot_client import robot_client
+from ..utils.singleflight import summary_flight
+from ..utils.jobs import job_queue
+from ..scheduler.scheduler import parse_scheduled_robots, summary_scheduler
+from ..webhook.dedupe import message_deduper
+from ..webhook.ingest import message_ingestor
 
 logger = logging.getLogger(__name__)
 
@@ -18,53 +42,429 @@ class MysqlSettings:
         self.port: str = ""
         self.user: str = ""
         self.password: str = ""
+        self.max_tenants: int = 200           # 最多缓存的租户连接池数量
+        self.tenant_idle_ttl: int = 1800      # 租户连接池空闲多久后释放(秒)
+        self.max_connections: int = 500       # 进程内所有租户共享的连接预算
+        self.tenant_pool_min: int = 10        # 每个租户连接池常驻的连接数
+        self.tenant_pool_max: int = 50        # 每个租户连接池最多的连接数
+        self.pool_timeout: int = 30           # 等待连接（含连接预算）的超时时间(秒)
+        self.tenant_failure_ttl: int = 10     # 租户连接失败后多久内不再重试(秒)
+        self.session_leak_threshold: int = 60 # 请求会话持有超过多久记录泄漏日志(秒)
+        self.shared_engine: bool = False      # 同一主机的租户是否共用一个连接池
+        self.shared_pool_min: int = 20        # 共享连接池常驻的连接数
+        self.shared_pool_max: int = 200       # 共享连接池最多的连接数
 
 
-class TenantDBManager:
-    """负责基于 RobotCode 缓存和创建不同的数据库连接"""
+class SummarySettings:
+    """群聊总结配置设置"""
+    
+    def __init__(self):
+        self.max_tokens: int = 2000           # 最终报告的最大输出 token 数
+        self.token_budget: int = 60000        # 聊天记录的估算 token 预算，超出时均匀抽样，0 表示不限制
+        self.chunk_chars: int = 20000         # 聊天记录超过多少字符时分段总结，0 表示不分段
+        self.chunk_max_tokens: int = 1000     # 每段摘要的最大输出 token 数
+        self.max_parallel: int = 4            # 单次总结中并行总结的段数
+        self.bucket_seconds: int = 3600       # 按多长的时间段缓存已结束时段的摘要(秒)，0 表示不缓存
+        self.bucket_min_cached_percent: int = 50  # 命中缓存的时间段占比达到多少(%)时才按时间段增量总结
+
+
+# 共享连接池的连接测试：SELECT 1 不经过 schema_translate_map，租户库不存在时也能通过，
+# 因此查询一张映射到租户库的表
+_SHARED_PROBE = select(literal(1)).select_from(Message.__table__).limit(1)
+
+# 根据 RobotCode 构建 DSN 的函数，测试时可替换为 SQLite 等本地数据库
+DSNBuilder = Callable[[str], str]
+
+
+@dataclass
+class _TenantEntry:
+    """单个租户缓存的数据库引擎"""
+    engine: Optional[Engine] = None
+    session_maker: Optional[sessionmaker] = None
+    async_engine: Optional[AsyncEngine] = None
+    async_session_maker: Optional[async_sessionmaker] = None
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class _InFlight:
+    """正在创建中的同步 SessionMaker，供同一租户的并发调用方等待"""
     
     def __init__(self):
+        self.event = Event()
+        self.result: Optional[sessionmaker] = None
+        self.error: Optional[Exception] = None
+
+
+class TenantDBManager:
+    """负责基于 RobotCode 缓存和创建不同的数据库连接
+    
+    缓存按最近使用顺序（LRU）维护，超过 max_tenants 或空闲超过 idle_ttl 的租户
+    会被淘汰，同时释放其连接池（engine.dispose）。
+    
+    开启 shared_engine 时，同一 MySQL 主机上的所有租户共用一个连接池，
+    每个租户的会话通过 schema_translate_map 把表名映射到对应的数据库（库名即 RobotCode）。
+    相比在签出时执行 USE <db>，这种方式不会修改连接状态，连接归还后可被任意租户复用。
+    """
+    
+    def __init__(
+        self,
+        dsn_builder: Optional[DSNBuilder] = None,
+        async_dsn_builder: Optional[DSNBuilder] = None,
+        max_tenants: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        failure_ttl: Optional[float] = None,
+        shared_engine: Optional[bool] = None,
+        host_dsn_builder: Optional[DSNBuilder] = None,
+        async_host_dsn_builder: Optional[DSNBuilder] = None,
+    ):
         self._lock = RLock()
-        self._tenants: Dict[str, sessionmaker] = {}
+        self._tenants: "OrderedDict[str, _TenantEntry]" = OrderedDict()
+        self._inflight: Dict[str, _InFlight] = {}
+        self._async_inflight: Dict[str, "asyncio.Future[async_sessionmaker]"] = {}
+        self._failures: Dict[str, Tuple[float, str]] = {}
+        self._dsn_builder = dsn_builder or self._build_dsn_for_robot
+        self._async_dsn_builder = async_dsn_builder or self._build_async_dsn_for_robot
+        self._max_tenants = max_tenants
+        self._idle_ttl = idle_ttl
+        self._failure_ttl = failure_ttl
+        self._shared_engine = shared_engine
+        self._host_dsn_builder = host_dsn_builder or self._build_host_dsn_for_robot
+        self._async_host_dsn_builder = async_host_dsn_builder or self._build_async_host_dsn_for_robot
+        self._shared_engines: Dict[str, Engine] = {}
+        self._shared_async_engines: Dict[str, AsyncEngine] = {}
+        self._dispose_tasks: Set[asyncio.Task] = set()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._negative_hits = 0
+    
+    @property
+    def max_tenants(self) -> int:
+        return self._max_tenants if self._max_tenants is not None else mysql_settings.max_tenants
+    
+    @property
+    def idle_ttl(self) -> float:
+        return self._idle_ttl if self._idle_ttl is not None else mysql_settings.tenant_idle_ttl
+    
+    @property
+    def failure_ttl(self) -> float:
+        return self._failure_ttl if self._failure_ttl is not None else mysql_settings.tenant_failure_ttl
+    
+    @property
+    def shared_engine(self) -> bool:
+        return self._shared_engine if self._shared_engine is not None else mysql_settings.shared_engine
     
     def get_session_maker(self, robot_code: str) -> Optional[sessionmaker]:
-        """获取指定 RobotCode 对应的 SessionMaker（带缓存）"""
+        """获取指定 RobotCode 对应的 SessionMaker（带缓存）
+        
+        同一 RobotCode 的并发调用共享同一次创建（singleflight），创建过程不持有全局锁，
+        不会阻塞其他租户；创建失败的租户会在 failure_ttl 内直接返回失败。
+        """
         if not robot_code:
             raise ValueError("robotCode 为空")
         
         # 读缓存
+        session_maker = self._lookup(robot_code, "session_maker")
+        if session_maker is not None:
+            return session_maker
+        
         with self._lock:
-            if robot_code in self._tenants:
-                return self._tenants[robot_code]
+            session_maker = self._lookup(robot_code, "session_maker", count=False)
+            if session_maker is not None:
+                return session_maker
+            self._raise_if_recently_failed(robot_code)
+            
+            flight = self._inflight.get(robot_code)
+            is_leader = flight is None
+            if flight is None:
+                flight = _InFlight()
+                self._inflight[robot_code] = flight
+        
+        # 其他调用方正在创建，等待其结果
+        if not is_leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = self._create_session_maker(robot_code)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(robot_code, None)
+            flight.event.set()
+    
+    async def get_async_session_maker(self, robot_code: str) -> Optional[async_sessionmaker]:
+        """获取指定 RobotCode 对应的异步 SessionMaker（带缓存）
+        
+        同一 RobotCode 的并发调用共享同一个创建任务（singleflight），
+        单个调用方被取消不会中断创建；创建失败的租户会在 failure_ttl 内直接返回失败。
+        """
+        if not robot_code:
+            raise ValueError("robotCode 为空")
+        
+        # 读缓存
+        session_maker = self._lookup(robot_code, "async_session_maker")
+        if session_maker is not None:
+            return session_maker
         
-        # 双重检查加锁创建
         with self._lock:
-            if robot_code in self._tenants:
-                return self._tenants[robot_code]
+            session_maker = self._lookup(robot_code, "async_session_maker", count=False)
+            if session_maker is not None:
+                return session_maker
+            self._raise_if_recently_failed(robot_code)
             
-            dsn = self._build_dsn_for_robot(robot_code)
-            try:
+            task = self._async_inflight.get(robot_code)
+            if task is None:
+                task = asyncio.ensure_future(self._create_async_session_maker(robot_code))
+                self._async_inflight[robot_code] = task
+                task.add_done_callback(
+                    lambda _: self._async_inflight.pop(robot_code, None)
+                )
+        
+        return await asyncio.shield(task)
+    
+    def _create_session_maker(self, robot_code: str) -> sessionmaker:
+        """创建租户的同步引擎并测试连接，调用方不持有全局锁"""
+        owned_engine = None
+        try:
+            if self.shared_engine:
+                engine = self._get_shared_engine(robot_code).execution_options(
+                    schema_translate_map={None: robot_code}
+                )
+            else:
+                engine = owned_engine = create_engine(
+                    self._dsn_builder(robot_code),
+                    poolclass=BudgetedQueuePool,
+                    echo=False,
+                    **self._pool_options()
+                )
+            
+            # 测试连接（共享连接池同时检查租户库是否存在）
+            with engine.connect() as conn:
+                conn.execute(_SHARED_PROBE if self.shared_engine else text("SELECT 1"))
+            
+            session_maker = sessionmaker(bind=engine)
+            self._store(robot_code, engine=owned_engine, session_maker=session_maker)
+            return session_maker
+            
+        except SQLAlchemyError as e:
+            if owned_engine is not None:
+                owned_engine.dispose()
+            # 等待连接（含连接预算）超时说明本进程连接紧张，不是租户库的问题，不做负缓存
+            if not isinstance(e, exc.TimeoutError):
+                self._record_failure(robot_code, e)
+            logger.error(f"打开数据库失败({robot_code}): {e}")
+            raise RuntimeError(f"打开数据库失败({robot_code}): {e}")
+    
+    async def _create_async_session_maker(self, robot_code: str) -> async_sessionmaker:
+        """创建租户的异步引擎并测试连接"""
+        owned_engine = None
+        try:
+            if self.shared_engine:
+                engine = self._get_shared_async_engine(robot_code).execution_options(
+                    schema_translate_map={None: robot_code}
+                )
+            else:
+                engine = owned_engine = create_async_engine(
+                    self._async_dsn_builder(robot_code),
+                    poolclass=BudgetedAsyncAdaptedQueuePool,
+                    echo=False,
+                    **self._pool_options()
+                )
+            
+            # 测试连接（共享连接池同时检查租户库是否存在）
+            async with engine.connect() as conn:
+                await conn.execute(_SHARED_PROBE if self.shared_engine else text("SELECT 1"))
+            
+            session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+            self._store(robot_code, async_engine=owned_engine, async_session_maker=session_maker)
+            return session_maker
+            
+        except SQLAlchemyError as e:
+            if owned_engine is not None:
+                await owned_engine.dispose()
+            if not isinstance(e, exc.TimeoutError):
+                self._record_failure(robot_code, e)
+            logger.error(f"打开异步数据库失败({robot_code}): {e}")
+            raise RuntimeError(f"打开异步数据库失败({robot_code}): {e}")
+    
+    def _get_shared_engine(self, robot_code: str) -> Engine:
+        """获取租户所在主机的共享同步引擎（不存在时创建，创建不会建立连接）"""
+        dsn = self._host_dsn_builder(robot_code)
+        with self._lock:
+            engine = self._shared_engines.get(dsn)
+            if engine is None:
                 engine = create_engine(
                     dsn,
-                    poolclass=pool.QueuePool,
-                    pool_size=10,
-                    max_overflow=40,
-                    pool_recycle=3600,  # 60分钟
-                    pool_pre_ping=True,
-                    echo=False
+                    poolclass=BudgetedQueuePool,
+                    echo=False,
+                    **self._pool_options(shared=True)
                 )
-                
-                # 测试连接
-                with engine.connect() as conn:
-                    conn.execute(text("SELECT 1"))
-                
-                session_maker = sessionmaker(bind=engine)
-                self._tenants[robot_code] = session_maker
-                return session_maker
-                
-            except SQLAlchemyError as e:
-                logger.error(f"打开数据库失败({robot_code}): {e}")
-                raise RuntimeError(f"打开数据库失败({robot_code}): {e}")
+                self._shared_engines[dsn] = engine
+            return engine
+    
+    def _get_shared_async_engine(self, robot_code: str) -> AsyncEngine:
+        """获取租户所在主机的共享异步引擎（不存在时创建，创建不会建立连接）"""
+        dsn = self._async_host_dsn_builder(robot_code)
+        with self._lock:
+            engine = self._shared_async_engines.get(dsn)
+            if engine is None:
+                engine = create_async_engine(
+                    dsn,
+                    poolclass=BudgetedAsyncAdaptedQueuePool,
+                    echo=False,
+                    **self._pool_options(shared=True)
+                )
+                self._shared_async_engines[dsn] = engine
+            return engine
+    
+    def _raise_if_recently_failed(self, robot_code: str) -> None:
+        """租户最近创建失败时直接抛错（负缓存），调用方需持有锁"""
+        failure = self._failures.get(robot_code)
+        if failure is None:
+            return
+        expires_at, message = failure
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            del self._failures[robot_code]
+            return
+        self._negative_hits += 1
+        raise RuntimeError(
+            f"打开数据库失败({robot_code}): {message}（{remaining:.0f} 秒后重试）"
+        )
+    
+    def _record_failure(self, robot_code: str, error: Exception) -> None:
+        """记录租户创建失败，failure_ttl 内不再尝试连接"""
+        if self.failure_ttl <= 0:
+            return
+        with self._lock:
+            self._failures[robot_code] = (time.monotonic() + self.failure_ttl, str(error))
+    
+    def _pool_options(self, shared: bool = False) -> Dict[str, Any]:
+        """连接池参数，连接总数受进程级连接预算约束"""
+        if shared:
+            pool_min = max(mysql_settings.shared_pool_min, 0)
+            pool_max = max(mysql_settings.shared_pool_max, pool_min)
+        else:
+            pool_min = max(mysql_settings.tenant_pool_min, 0)
+            pool_max = max(mysql_settings.tenant_pool_max, pool_min)
+        return {
+            "pool_size": pool_min,
+            "max_overflow": pool_max - pool_min,
+            "pool_timeout": mysql_settings.pool_timeout,
+            "pool_recycle": 3600,  # 60分钟
+            "pool_pre_ping": True,
+        }
+    
+    def stats(self) -> Dict[str, int]:
+        """返回租户连接缓存的统计信息"""
+        with self._lock:
+            return {
+                "tenants": len(self._tenants),
+                "max_tenants": self.max_tenants,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "negative_hits": self._negative_hits,
+                "failed_tenants": len(self._failures),
+                "inflight": len(self._inflight) + len(self._async_inflight),
+                "shared_engines": len(self._shared_engines) + len(self._shared_async_engines),
+            }
+    
+    def dispose_all(self) -> None:
+        """释放所有租户及共享主机的连接池（服务关闭时调用）"""
+        with self._lock:
+            entries = list(self._tenants.values())
+            self._tenants.clear()
+            entries.extend(_TenantEntry(engine=engine) for engine in self._shared_engines.values())
+            entries.extend(
+                _TenantEntry(async_engine=engine) for engine in self._shared_async_engines.values()
+            )
+            self._shared_engines.clear()
+            self._shared_async_engines.clear()
+        for entry in entries:
+            self._dispose_entry(entry)
+    
+    def _lookup(self, robot_code: str, attr: str, count: bool = True) -> Any:
+        """读取缓存中租户的 SessionMaker，命中时刷新 LRU 顺序"""
+        with self._lock:
+            expired = self._evict_idle_locked()
+            entry = self._tenants.get(robot_code)
+            value = getattr(entry, attr) if entry is not None else None
+            if value is not None:
+                entry.last_used = time.monotonic()
+                self._tenants.move_to_end(robot_code)
+            if count:
+                if value is not None:
+                    self._hits += 1
+                else:
+                    self._misses += 1
+        for evicted in expired:
+            self._dispose_entry(evicted)
+        return value
+    
+    def _store(self, robot_code: str, **engines: Any) -> None:
+        """写入租户缓存，并按容量淘汰最久未使用的租户"""
+        evicted: List[_TenantEntry] = []
+        with self._lock:
+            entry = self._tenants.get(robot_code)
+            if entry is None:
+                entry = _TenantEntry()
+                self._tenants[robot_code] = entry
+            for name, value in engines.items():
+                setattr(entry, name, value)
+            entry.last_used = time.monotonic()
+            self._tenants.move_to_end(robot_code)
+            
+            while len(self._tenants) > max(self.max_tenants, 1):
+                evicted_code, evicted_entry = self._tenants.popitem(last=False)
+                self._evictions += 1
+                evicted.append(evicted_entry)
+                logger.info(f"租户连接池超出上限，释放最久未使用的租户: {evicted_code}")
+        for evicted_entry in evicted:
+            self._dispose_entry(evicted_entry)
+    
+    def _evict_idle_locked(self) -> List[_TenantEntry]:
+        """淘汰空闲超时的租户，调用方需持有锁，返回待释放的租户"""
+        evicted: List[_TenantEntry] = []
+        if self.idle_ttl <= 0:
+            return evicted
+        
+        deadline = time.monotonic() - self.idle_ttl
+        # OrderedDict 按最近使用排序，从最旧的开始检查即可
+        while self._tenants:
+            robot_code, entry = next(iter(self._tenants.items()))
+            if entry.last_used > deadline:
+                break
+            self._tenants.popitem(last=False)
+            self._evictions += 1
+            evicted.append(entry)
+            logger.info(f"租户连接池空闲超时，释放租户: {robot_code}")
+        return evicted
+    
+    def _dispose_entry(self, entry: _TenantEntry) -> None:
+        """释放租户的同步和异步连接池"""
+        if entry.engine is not None:
+            try:
+                entry.engine.dispose()
+            except Exception as e:
+                logger.error(f"释放数据库连接池失败: {e}")
+        
+        if entry.async_engine is not None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # 没有运行中的事件循环，只能解除连接池引用，由 GC 回收连接
+                entry.async_engine.sync_engine.dispose(close=False)
+                return
+            task = loop.create_task(entry.async_engine.dispose())
+            self._dispose_tasks.add(task)
+            task.add_done_callback(self._dispose_tasks.discard)
     
     def _build_dsn_for_robot(self, robot_code: str) -> str:
         """构建指定 RobotCode 的数据库 DSN"""
@@ -73,11 +473,37 @@ class TenantDBManager:
             f"@{mysql_settings.host}:{mysql_settings.port}/{robot_code}"
             f"?charset=utf8mb4"
         )
+    
+    def _build_host_dsn_for_robot(self, robot_code: str) -> str:
+        """构建租户所在主机的数据库 DSN（不指定库名，共享引擎使用）"""
+        return (
+            f"mysql+pymysql://{mysql_settings.user}:{mysql_settings.password}"
+            f"@{mysql_settings.host}:{mysql_settings.port}/"
+            f"?charset=utf8mb4"
+        )
+    
+    def _build_async_host_dsn_for_robot(self, robot_code: str) -> str:
+        """构建租户所在主机的异步数据库 DSN（不指定库名，共享引擎使用）"""
+        return (
+            f"mysql+aiomysql://{mysql_settings.user}:{mysql_settings.password}"
+            f"@{mysql_settings.host}:{mysql_settings.port}/"
+            f"?charset=utf8mb4"
+        )
+    
+    def _build_async_dsn_for_robot(self, robot_code: str) -> str:
+        """构建指定 RobotCode 的异步数据库 DSN"""
+        return (
+            f"mysql+aiomysql://{mysql_settings.user}:{mysql_settings.password}"
+            f"@{mysql_settings.host}:{mysql_settings.port}/{robot_code}"
+            f"?charset=utf8mb4"
+        )
 
 
 # 全局变量
 mcp_server_port: int = 0
+admin_token: str = ""  # 管理接口（运行状态、设置缓存失效）的访问令牌，未配置时只允许本机访问
 mysql_settings = MysqlSettings()
+summary_settings = SummarySettings()
 tenant_db_manager = TenantDBManager()
 
 
@@ -88,7 +514,7 @@ def load_config() -> None:
 
 def _load_env_config() -> None:
     """从环境变量加载配置"""
-    global mcp_server_port
+    global mcp_server_port, admin_token
     
     # 本地开发模式
     is_dev_mode = os.getenv("GO_ENV", "").lower() == "dev"
@@ -116,12 +542,109 @@ def _load_env_config() -> None:
         raise ValueError("MCPServerPort 必须在 1 到 65535 之间")
     
     mcp_server_port = port
+    admin_token = os.getenv("ADMIN_TOKEN", "")
     
     # 加载 MySQL 配置
     mysql_settings.host = os.getenv("MYSQL_HOST", "")
     mysql_settings.port = os.getenv("MYSQL_PORT", "")
     mysql_settings.user = os.getenv("MYSQL_USER", "")
     mysql_settings.password = os.getenv("MYSQL_PASSWORD", "")
+    mysql_settings.max_tenants = _get_env_int("MYSQL_MAX_TENANTS", mysql_settings.max_tenants)
+    mysql_settings.tenant_idle_ttl = _get_env_int("MYSQL_TENANT_IDLE_TTL", mysql_settings.tenant_idle_ttl)
+    mysql_settings.max_connections = _get_env_int("MYSQL_MAX_CONNECTIONS", mysql_settings.max_connections)
+    mysql_settings.tenant_pool_min = _get_env_int("MYSQL_TENANT_POOL_MIN", mysql_settings.tenant_pool_min)
+    mysql_settings.tenant_pool_max = _get_env_int("MYSQL_TENANT_POOL_MAX", mysql_settings.tenant_pool_max)
+    mysql_settings.pool_timeout = _get_env_int("MYSQL_POOL_TIMEOUT", mysql_settings.pool_timeout)
+    mysql_settings.tenant_failure_ttl = _get_env_int(
+        "MYSQL_TENANT_FAILURE_TTL", mysql_settings.tenant_failure_ttl
+    )
+    mysql_settings.session_leak_threshold = _get_env_int(
+        "MYSQL_SESSION_LEAK_THRESHOLD", mysql_settings.session_leak_threshold
+    )
+    mysql_settings.shared_engine = os.getenv("MYSQL_SHARED_ENGINE", "").lower() in ("1", "true", "yes")
+    mysql_settings.shared_pool_min = _get_env_int("MYSQL_SHARED_POOL_MIN", mysql_settings.shared_pool_min)
+    mysql_settings.shared_pool_max = _get_env_int("MYSQL_SHARED_POOL_MAX", mysql_settings.shared_pool_max)
+    connection_budget.configure(mysql_settings.max_connections)
+    session_leak_detector.threshold = mysql_settings.session_leak_threshold
+    
+    # 加载设置缓存配置
+    settings_cache.ttl = _get_env_int("SETTINGS_CACHE_TTL", int(settings_cache.ttl))
+    settings_cache.negative_ttl = _get_env_int(
+        "SETTINGS_CACHE_NEGATIVE_TTL", int(settings_cache.negative_ttl)
+    )
+    
+    # 加载 APP消息解析配置
+    appmsg_extractor.configure(
+        cache_size=_get_env_int("APPMSG_CACHE_SIZE", appmsg_extractor.cache_size),
+        workers=_get_env_int("APPMSG_PARSE_WORKERS", appmsg_extractor.workers),
+        parallel_threshold=_get_env_int("APPMSG_PARALLEL_THRESHOLD", appmsg_extractor.parallel_threshold),
+    )
+    
+    # 加载群聊总结配置
+    summary_settings.max_tokens = _get_env_int("SUMMARY_MAX_TOKENS", summary_settings.max_tokens)
+    summary_settings.token_budget = _get_env_int("SUMMARY_TOKEN_BUDGET", summary_settings.token_budget)
+    summary_settings.chunk_chars = _get_env_int("SUMMARY_CHUNK_CHARS", summary_settings.chunk_chars)
+    summary_settings.chunk_max_tokens = _get_env_int(
+        "SUMMARY_CHUNK_MAX_TOKENS", summary_settings.chunk_max_tokens
+    )
+    summary_settings.max_parallel = _get_env_int("SUMMARY_MAX_PARALLEL", summary_settings.max_parallel)
+    summary_settings.bucket_seconds = _get_env_int("SUMMARY_BUCKET_SECONDS", summary_settings.bucket_seconds)
+    summary_settings.bucket_min_cached_percent = _get_env_int(
+        "SUMMARY_BUCKET_MIN_CACHED_PERCENT", summary_settings.bucket_min_cached_percent
+    )
+    summary_flight.cooldown = _get_env_int("SUMMARY_COOLDOWN_SECONDS", int(summary_flight.cooldown))
+    
+    # 加载 AI 客户端配置
+    openai_client_registry.max_clients = _get_env_int("AI_MAX_CLIENTS", openai_client_registry.max_clients)
+    openai_client_registry.idle_ttl = _get_env_int("AI_CLIENT_IDLE_TTL", int(openai_client_registry.idle_ttl))
+    openai_client_registry.timeout = _get_env_int("AI_REQUEST_TIMEOUT", int(openai_client_registry.timeout))
+    openai_client_registry.max_connections = _get_env_int(
+        "AI_MAX_CONNECTIONS", openai_client_registry.max_connections
+    )
+    llm_rate_limiter.rpm = _get_env_int("AI_RATE_LIMIT_RPM", llm_rate_limiter.rpm)
+    llm_rate_limiter.tpm = _get_env_int("AI_RATE_LIMIT_TPM", llm_rate_limiter.tpm)
+    llm_rate_limiter.max_wait = _get_env_int("AI_RATE_LIMIT_MAX_WAIT", int(llm_rate_limiter.max_wait))
+    
+    # 加载机器人客户端配置
+    robot_client.connect_timeout = _get_env_int("ROBOT_CLIENT_CONNECT_TIMEOUT", int(robot_client.connect_timeout))
+    robot_client.read_timeout = _get_env_int("ROBOT_CLIENT_READ_TIMEOUT", int(robot_client.read_timeout))
+    robot_client.max_connections = _get_env_int("ROBOT_CLIENT_MAX_CONNECTIONS", robot_client.max_connections)
+    robot_client.dns_cache.ttl = _get_env_int("ROBOT_CLIENT_DNS_TTL", int(robot_client.dns_cache.ttl))
+    
+    # 加载后台任务配置
+    job_queue.workers = _get_env_int("JOB_WORKERS", job_queue.workers)
+    job_queue.max_pending = _get_env_int("JOB_MAX_PENDING", job_queue.max_pending)
+    job_queue.retention = _get_env_int("JOB_RETENTION", int(job_queue.retention))
+    
+    # 加载定时群聊总结配置
+    summary_scheduler.enabled = os.getenv("SCHEDULER_ENABLED", "").lower() in ("1", "true", "yes")
+    summary_scheduler.robots = parse_scheduled_robots(os.getenv("SCHEDULER_ROBOTS", ""))
+    summary_scheduler.max_concurrency = _get_env_int("SCHEDULER_MAX_CONCURRENCY", summary_scheduler.max_concurrency)
+    summary_scheduler.jitter = _get_env_int("SCHEDULER_JITTER", summary_scheduler.jitter)
+    summary_scheduler.refresh_interval = _get_env_int(
+        "SCHEDULER_REFRESH_INTERVAL", summary_scheduler.refresh_interval
+    )
+    
+    # 加载消息入库配置
+    message_ingestor.max_pending = _get_env_int("INGEST_MAX_PENDING", message_ingestor.max_pending)
+    message_ingestor.batch_size = _get_env_int("INGEST_BATCH_SIZE", message_ingestor.batch_size)
+    message_ingestor.flush_interval = _get_env_int(
+        "INGEST_FLUSH_INTERVAL_MS", int(message_ingestor.flush_interval * 1000)
+    ) / 1000
+    message_deduper.window = _get_env_int("INGEST_DEDUPE_WINDOW", int(message_deduper.window))
+    message_deduper.max_ids = _get_env_int("INGEST_DEDUPE_MAX_IDS", message_deduper.max_ids)
+
+
+def _get_env_int(name: str, default: int) -> int:
+    """读取整数类型的可选环境变量"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.error(f"环境变量 [{name}] 必须是整数")
+        raise ValueError(f"环境变量 [{name}] 必须是整数")
 
 
 def get_db_by_robot_code(robot_code: str) -> Session:
@@ -130,3 +653,11 @@ def get_db_by_robot_code(robot_code: str) -> Session:
     if session_maker is None:
         raise RuntimeError(f"无法获取 {robot_code} 的数据库会话")
     return session_maker()
+
+
+async def get_async_db_by_robot_code(robot_code: str) -> AsyncSession:
+    """获取指定 RobotCode 对应的异步数据库会话（带缓存）"""
+    session_maker = await tenant_db_manager.get_async_session_maker(robot_code)
+    if session_maker is None:
+        raise RuntimeError(f"无法获取 {robot_code} 的异步数据库会话")
+    return session_maker()
@@ -0,0 +1,13 @@
+"""LLM 客户端包初始化文件"""
+
+from .client_registry import OpenAIClientRegistry, openai_client_registry
+from .rate_limiter import LLMRateLimiter, RateLimitTimeout, TokenBucket, llm_rate_limiter
+
+__all__ = [
+    "OpenAIClientRegistry",
+    "openai_client_registry",
+    "LLMRateLimiter",
+    "RateLimitTimeout",
+    "TokenBucket",
+    "llm_rate_limiter",
+]
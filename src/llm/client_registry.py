@@ -0,0 +1,140 @@
+"""
+OpenAI client registry - 进程级 AsyncOpenAI 客户端注册表
+
+按 (规范化后的 BaseURL, API Key) 缓存 AsyncOpenAI 客户端，所有客户端共用一个 httpx 连接池，
+TLS 连接在请求之间复用；客户端数量有上限，空闲超时或超出上限时淘汰最久未使用的客户端。
+"""
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+from ..utils.utils import normalize_ai_base_url
+
+logger = logging.getLogger(__name__)
+
+_ClientKey = Tuple[str, str]
+
+
+@dataclass
+class _ClientEntry:
+    client: AsyncOpenAI
+    last_used: float
+
+
+class OpenAIClientRegistry:
+    """AsyncOpenAI 客户端注册表（LRU + 空闲淘汰），客户端共享 HTTP 连接池"""
+
+    def __init__(
+        self,
+        max_clients: int = 64,
+        idle_ttl: float = 600,
+        timeout: float = 120,
+        connect_timeout: float = 10,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+    ):
+        """
+        初始化客户端注册表
+
+        Args:
+            max_clients: 最多缓存的客户端数量
+            idle_ttl: 客户端空闲多久后淘汰(秒)，<= 0 表示不按空闲时间淘汰
+            timeout: 单次请求的超时时间(秒)
+            connect_timeout: 建立连接的超时时间(秒)
+            max_connections: 共享连接池的最大连接数
+            max_keepalive_connections: 共享连接池保持的空闲长连接数
+        """
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self._lock = Lock()
+        self._clients: "OrderedDict[_ClientKey, _ClientEntry]" = OrderedDict()
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_client(self, base_url: str, api_key: str) -> AsyncOpenAI:
+        """
+        获取指定 BaseURL 和 API Key 的客户端，不存在时创建
+
+        Args:
+            base_url: AI 服务的 BaseURL，会先做规范化
+            api_key: API Key
+
+        Returns:
+            AsyncOpenAI 客户端
+        """
+        key = (normalize_ai_base_url(base_url), api_key)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle_locked(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry.last_used = now
+                self._clients.move_to_end(key)
+                self._hits += 1
+                return entry.client
+
+            self._misses += 1
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=key[0],
+                http_client=self._get_http_client_locked(),
+            )
+            self._clients[key] = _ClientEntry(client=client, last_used=now)
+            while len(self._clients) > max(self.max_clients, 1):
+                self._clients.popitem(last=False)
+                self._evictions += 1
+            return client
+
+    def stats(self) -> Dict[str, int]:
+        """返回客户端注册表的统计信息"""
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "max_clients": self.max_clients,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    async def aclose(self) -> None:
+        """清空所有客户端并关闭共享连接池，服务退出时调用"""
+        with self._lock:
+            self._clients.clear()
+            http_client, self._http_client = self._http_client, None
+        if http_client is not None:
+            await http_client.aclose()
+
+    def _get_http_client_locked(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+            )
+        return self._http_client
+
+    def _evict_idle_locked(self, now: float) -> None:
+        # 客户端共用连接池，淘汰时只解除引用，不关闭连接
+        if self.idle_ttl <= 0:
+            return
+        for key in [k for k, e in self._clients.items() if now - e.last_used > self.idle_ttl]:
+            del self._clients[key]
+            self._evictions += 1
+
+
+# 全局 AsyncOpenAI 客户端注册表，load_config 时根据 AI_* 环境变量调整
+openai_client_registry = OpenAIClientRegistry()
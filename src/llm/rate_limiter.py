@@ -0,0 +1,229 @@
+"""
+LLM rate limiter - 按上游 (BaseURL, API Key) 限流的令牌桶
+
+每个上游有两个令牌桶：每分钟请求数(RPM)和每分钟估算 token 数(TPM)。
+调用前按预估的 token 数申请额度，额度不足时按先来先到的顺序排队等待，
+等待超过 max_wait 时抛出 RateLimitTimeout，而不是让请求直接打到上游再收到 429。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple
+
+from ..utils.utils import normalize_ai_base_url
+
+_LimiterKey = Tuple[str, str]
+
+
+class RateLimitTimeout(Exception):
+    """排队等待额度超时"""
+
+
+class TokenBucket:
+    """令牌桶：容量为每分钟的额度，按秒均匀补充"""
+
+    def __init__(self, per_minute: float):
+        """
+        初始化令牌桶
+
+        Args:
+            per_minute: 每分钟的额度，<= 0 表示不限制
+        """
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """按经过的时间补充额度"""
+        if self.per_minute <= 0:
+            return
+        elapsed = max(now - self.updated_at, 0)
+        self.tokens = min(float(self.per_minute), self.tokens + elapsed * self.per_minute / 60)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """额度足够 amount 还需要等待的时间(秒)，amount 超过容量时按容量计算"""
+        if self.per_minute <= 0:
+            return 0
+        missing = min(amount, self.per_minute) - self.tokens
+        return max(missing, 0) * 60 / self.per_minute
+
+    def take(self, amount: float) -> None:
+        """扣除额度，允许短暂为负（单次请求超过容量时）"""
+        if self.per_minute > 0:
+            self.tokens -= amount
+
+
+@dataclass
+class _Limiter:
+    requests: TokenBucket
+    tokens: TokenBucket
+    # 保证按先来先到的顺序发放额度
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    waiting: int = 0
+    acquired: int = 0
+    delayed: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0
+    max_wait_seconds: float = 0
+    last_used: float = 0
+
+
+async def _acquire_lock(lock: asyncio.Lock, timeout: float) -> bool:
+    """
+    在 timeout 秒内获取锁，返回是否获取成功
+
+    不使用 asyncio.wait_for：Python 3.12 之前，获取锁和超时同时发生时 wait_for 可能丢掉已获取的锁，
+    之后所有请求都会排队到超时。这里超时或被取消时取消获取，获取已经完成的则把锁释放掉。
+    """
+    task = asyncio.ensure_future(lock.acquire())
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        _abandon_lock(lock, task)
+        raise
+    if done:
+        return True
+    _abandon_lock(lock, task)
+    return False
+
+
+def _abandon_lock(lock: asyncio.Lock, task: "asyncio.Future[bool]") -> None:
+    # cancel() 返回 False 说明获取已经完成，锁归我们所有
+    if not task.cancel() and not task.cancelled() and task.exception() is None:
+        lock.release()
+
+
+class LLMRateLimiter:
+    """按 (BaseURL, API Key) 限制 RPM 和 TPM 的异步限流器"""
+
+    def __init__(self, rpm: int = 60, tpm: int = 150000, max_wait: float = 60, max_limiters: int = 256):
+        """
+        初始化限流器
+
+        Args:
+            rpm: 每个上游每分钟的最大请求数，<= 0 表示不限制
+            tpm: 每个上游每分钟的最大估算 token 数（输入 + 最大输出），<= 0 表示不限制
+            max_wait: 排队等待额度的最长时间(秒)
+            max_limiters: 最多保留的上游数量，超出后淘汰最久未使用且没有排队的上游
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = max_wait
+        self.max_limiters = max_limiters
+        self._limiters: Dict[_LimiterKey, _Limiter] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用限流"""
+        return self.rpm > 0 or self.tpm > 0
+
+    async def acquire(self, base_url: str, api_key: str, tokens: int) -> float:
+        """
+        申请一次请求的额度，额度不足时排队等待
+
+        Args:
+            base_url: AI 服务的 BaseURL
+            api_key: API Key
+            tokens: 本次请求的估算 token 数
+
+        Returns:
+            排队等待的时间(秒)
+
+        Raises:
+            RateLimitTimeout: 等待时间超过 max_wait
+        """
+        if not self.enabled:
+            return 0
+        limiter = self._get_limiter((normalize_ai_base_url(base_url), api_key))
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        # 前面有请求在排队，或需要等待额度补充时，计为一次延迟
+        delayed = limiter.lock.locked()
+        limiter.waiting += 1
+        try:
+            if not await _acquire_lock(limiter.lock, max(deadline - started, 0)):
+                limiter.timeouts += 1
+                raise RateLimitTimeout(f"等待 AI 请求额度超过 {self.max_wait:g} 秒")
+            try:
+                while True:
+                    now = time.monotonic()
+                    limiter.requests.refill(now)
+                    limiter.tokens.refill(now)
+                    wait = max(limiter.requests.wait_time(1), limiter.tokens.wait_time(tokens))
+                    if wait <= 0:
+                        break
+                    if now + wait > deadline:
+                        limiter.timeouts += 1
+                        raise RateLimitTimeout(
+                            f"AI 请求额度不足，预计还需等待 {wait:.0f} 秒，超过 {self.max_wait:g} 秒"
+                        )
+                    delayed = True
+                    await asyncio.sleep(wait)
+                limiter.requests.take(1)
+                limiter.tokens.take(tokens)
+            finally:
+                limiter.lock.release()
+        finally:
+            limiter.waiting -= 1
+
+        waited = time.monotonic() - started
+        limiter.acquired += 1
+        limiter.last_used = time.monotonic()
+        if delayed:
+            limiter.delayed += 1
+            limiter.wait_seconds += waited
+            limiter.max_wait_seconds = max(limiter.max_wait_seconds, waited)
+        return waited
+
+    def penalize(self, base_url: str, api_key: str) -> None:
+        """上游返回 429 时清空请求额度，后续请求排队等待补充"""
+        limiter = self._limiters.get((normalize_ai_base_url(base_url), api_key))
+        if limiter is not None:
+            limiter.requests.refill(time.monotonic())
+            limiter.requests.tokens = min(limiter.requests.tokens, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回限流器的统计信息，按上游分组（API Key 只保留末 4 位）"""
+        upstreams = {}
+        for (base_url, api_key), limiter in self._limiters.items():
+            upstreams[f"{base_url} ***{api_key[-4:]}"] = {
+                "queue_depth": limiter.waiting,
+                "acquired": limiter.acquired,
+                "delayed": limiter.delayed,
+                "timeouts": limiter.timeouts,
+                "wait_seconds": round(limiter.wait_seconds, 3),
+                "max_wait_seconds": round(limiter.max_wait_seconds, 3),
+            }
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "max_wait": self.max_wait,
+            "queue_depth": sum(limiter.waiting for limiter in self._limiters.values()),
+            "upstreams": upstreams,
+        }
+
+    def _get_limiter(self, key: _LimiterKey) -> _Limiter:
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            self._evict_idle()
+            limiter = _Limiter(requests=TokenBucket(self.rpm), tokens=TokenBucket(self.tpm))
+            self._limiters[key] = limiter
+        # 配置变更后按新的额度补充
+        limiter.requests.per_minute = self.rpm
+        limiter.tokens.per_minute = self.tpm
+        return limiter
+
+    def _evict_idle(self) -> None:
+        if len(self._limiters) < max(self.max_limiters, 1):
+            return
+        idle = sorted(
+            (limiter.last_used, key) for key, limiter in self._limiters.items()
+            if limiter.waiting == 0 and not limiter.lock.locked()
+        )
+        for _, key in idle[:len(self._limiters) - self.max_limiters + 1]:
+            del self._limiters[key]
+
+
+# 全局 LLM 限流器，load_config 时根据 AI_RATE_LIMIT_* 环境变量调整
+llm_rate_limiter = LLMRateLimiter()
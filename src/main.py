@@ -2,17 +2,31 @@
 WeChat Robot MCP Server - Python Implementation
 微信机器人 MCP 服务器主程序
 """
+import hmac
 import logging
 import sys
+from functools import wraps
 from typing import List
 import asyncio
+from contextlib import asynccontextmanager
 from starlette.applications import Starlette
 from starlette.routing import Mount, Route
 from starlette.responses import JSONResponse
 from mcp.server.fastmcp import FastMCP
 
 from .config import config
+from .config.budget import connection_budget
+from .robot_context import session_leak_detector
+from .repository.settings_cache import settings_cache
+from .utils.appmsg import appmsg_extractor
+from .llm.client_registry import openai_client_registry
+from .llm.rate_limiter import llm_rate_limiter
+from .utils.robot_client import robot_client
+from .utils.singleflight import summary_flight
+from .utils.jobs import job_queue
+from .scheduler import summary_scheduler
 from .tools.registry import register_tools
+from .webhook.ingest import message_ingestor
 from .webhook.wechat_messages import on_wechat_messages
 
 # 设置日志
@@ -33,7 +47,88 @@ register_tools(mcp)
 async def webhook_handler(request):
     """处理 webhook 请求"""
     result = await on_wechat_messages(request)
-    return JSONResponse(content=result, status_code=result.get("code", 200))
+    status_code = result.get("code", 200)
+    # 入库队列满或服务停止时提示推送方稍后重试
+    headers = {"Retry-After": "1"} if status_code in (429, 503) else None
+    return JSONResponse(content=result, status_code=status_code, headers=headers)
+
+
+# 未配置 ADMIN_TOKEN 时允许访问管理接口的客户端地址
+_LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+def admin_only(handler):
+    """管理接口鉴权：配置了 ADMIN_TOKEN 时校验 Authorization: Bearer <token>，未配置时只允许本机访问"""
+    @wraps(handler)
+    async def wrapper(request):
+        if config.admin_token:
+            scheme, _, token = request.headers.get("authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), config.admin_token):
+                return JSONResponse(
+                    content={"code": 401, "message": "管理接口令牌无效"},
+                    status_code=401,
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+        elif request.client is None or request.client.host not in _LOOPBACK_HOSTS:
+            return JSONResponse(
+                content={"code": 403, "message": "未配置 ADMIN_TOKEN，管理接口只允许本机访问"},
+                status_code=403,
+            )
+        return await handler(request)
+    return wrapper
+
+
+@admin_only
+async def stats_handler(request):
+    """运行状态统计，供监控采集"""
+    return JSONResponse(content={
+        "tenant_db": config.tenant_db_manager.stats(),
+        "connection_budget": connection_budget.stats(),
+        "db_sessions": session_leak_detector.stats(),
+        "settings_cache": settings_cache.stats(),
+        "appmsg_extractor": appmsg_extractor.stats(),
+        "ai_clients": openai_client_registry.stats(),
+        "ai_rate_limiter": llm_rate_limiter.stats(),
+        "robot_client": robot_client.stats(),
+        "summary_flight": summary_flight.stats(),
+        "jobs": job_queue.stats(),
+        "scheduler": summary_scheduler.stats(),
+        "ingest": message_ingestor.stats(),
+    })
+
+
+@admin_only
+async def settings_invalidate_handler(request):
+    """主动失效设置缓存，设置变更后由管理端或 webhook 调用"""
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    robot_code = body.get("robot_code") or ""
+    chat_room_id = body.get("chat_room_id") or ""
+    removed = settings_cache.invalidate(robot_code, chat_room_id)
+    logger.info(f"设置缓存已失效(robot_code={robot_code}, chat_room_id={chat_room_id}): {removed} 条")
+    return JSONResponse(content={"code": 200, "message": "ok", "data": {"removed": removed}})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """应用生命周期：运行 MCP 会话管理器和定时任务，退出时释放共享的客户端和连接池"""
+    async with mcp.session_manager.run():
+        summary_scheduler.start()
+        try:
+            yield
+        finally:
+            # 先停止定时任务和后台任务、写完排队的消息，再释放使用的客户端和连接池
+            await summary_scheduler.aclose()
+            await job_queue.aclose()
+            await message_ingestor.aclose()
+            await openai_client_registry.aclose()
+            await robot_client.aclose()
+            config.tenant_db_manager.dispose_all()
+            appmsg_extractor.close()
 
 
 def run() -> None:
@@ -54,7 +149,12 @@ def run() -> None:
             Mount("/mcp", app=mcp.streamable_http_app()),
             # Webhook 端点
             Route("/api/v1/messages", webhook_handler, methods=["POST"]),
-        ]
+            # 运行状态统计（管理接口）
+            Route("/api/v1/stats", stats_handler, methods=["GET"]),
+            # 设置缓存失效（管理接口）
+            Route("/api/v1/settings/invalidate", settings_invalidate_handler, methods=["POST"]),
+        ],
+        lifespan=lifespan,
     )
     
     # 运行服务器
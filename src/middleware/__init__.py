@@ -1,6 +1,7 @@
 """Middleware Package"""
-from .tenant import create_tenant_middleware
+from .tenant import parse_robot_context, tenant_scope
 
 __all__ = [
-    'create_tenant_middleware',
+    'parse_robot_context',
+    'tenant_scope',
 ]
@@ -4,10 +4,17 @@ Tenant Middleware - 租户中间件
 用于从请求中解析机器人上下文并设置数据库连接
 """
 import logging
-from typing import Any, Dict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 
 from ..config import config
-from ..robot_context import RobotContext, set_robot_context, set_db
+from ..robot_context import (
+    DBSessionScope,
+    RobotContext,
+    reset_db_scope,
+    set_db_scope,
+    set_robot_context,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -39,21 +46,40 @@ def parse_robot_context(meta: Dict[str, Any]) -> RobotContext:
         logger.error(f"解析 RobotContext 失败: {e}")
         return RobotContext()
 
-def apply_tenant_from_meta(meta: Dict[str, Any]) -> None:
-    """根据 MCP 请求中的 meta 设置机器人上下文和数据库连接"""
+@asynccontextmanager
+async def tenant_scope(meta: Optional[Dict[str, Any]]) -> AsyncIterator[Optional[RobotContext]]:
+    """根据 MCP 请求中的 meta 设置机器人上下文和请求级数据库会话
+    
+    会话在仓库首次调用 get_async_db() 时才创建，退出作用域时一定会被释放。
+    作用域只提供异步会话：同步引擎的创建和连接测试会阻塞事件循环，工具中不使用同步会话。
+    """
+    # MCP 的 meta 可能是 pydantic 模型，统一转换为字典
+    if meta is not None and hasattr(meta, "model_dump"):
+        meta = meta.model_dump()
     if not meta:
+        yield None
         return
 
     # 解析机器人上下文
     rc = parse_robot_context(meta)
     set_robot_context(rc)
 
-    # 如果有 RobotCode，设置数据库连接
+    scope = DBSessionScope(label=rc.robot_code)
+    # 如果有 RobotCode，准备数据库会话（此时并不签出连接）
     if rc.robot_code:
         try:
-            db = config.get_db_by_robot_code(rc.robot_code)
-            set_db(db)
+            session_maker = await config.tenant_db_manager.get_async_session_maker(rc.robot_code)
+            scope = DBSessionScope(label=rc.robot_code, async_session_factory=session_maker)
         except Exception as e:
             logger.error(
                 f"获取数据库连接失败(RobotCode:{rc.robot_code}): {e}"
             )
+
+    token = set_db_scope(scope)
+    try:
+        yield rc
+    finally:
+        try:
+            await scope.close()
+        finally:
+            reset_db_scope(token)
@@ -12,6 +12,8 @@ from .global_settings import (
     ImageModel
 )
 from .chatroom_settings import ChatRoomSettings, ChatRoomSettingsSchema
+from .chat_room_member import ChatRoomMember, ChatRoomMemberSchema
+from .summary_bucket import ChatRoomSummaryBucket, ChatRoomSummaryBucketSchema
 
 __all__ = [
     # base
@@ -39,4 +41,12 @@ __all__ = [
     # chatroom_settings
     "ChatRoomSettings",
     "ChatRoomSettingsSchema",
+    
+    # chat_room_member
+    "ChatRoomMember",
+    "ChatRoomMemberSchema",
+    
+    # summary_bucket
+    "ChatRoomSummaryBucket",
+    "ChatRoomSummaryBucketSchema",
 ]
@@ -0,0 +1,54 @@
+from typing import Optional
+from sqlalchemy import Column, BigInteger, String, Boolean, Index
+from sqlalchemy.ext.declarative import declarative_base
+from pydantic import BaseModel, Field
+
+Base = declarative_base()
+
+
+class ChatRoomMember(Base):
+    """群成员模型"""
+    __tablename__ = "chat_room_members"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    chat_room_id = Column(String(64), nullable=False, index=True, comment="群ID")
+    wechat_id = Column(String(64), nullable=False, index=True, comment="微信ID")
+    alias = Column(String(64), default="", comment="微信号")
+    nickname = Column(String(64), default="", comment="昵称")
+    avatar = Column(String(255), default="", comment="头像")
+    inviter_wechat_id = Column(String(64), default="", comment="邀请人微信ID")
+    is_admin = Column(Boolean, default=False, comment="是否群管理员")
+    is_blacklisted = Column(Boolean, default=False, comment="是否在黑名单")
+    is_leaved = Column(Boolean, nullable=True, comment="是否已经离开群聊")
+    score = Column(BigInteger, nullable=True, comment="积分")
+    remark = Column(String(255), default="", comment="备注")
+    joined_at = Column(BigInteger, nullable=False, comment="加入时间")
+    last_active_at = Column(BigInteger, nullable=False, comment="最近活跃时间")
+    leaved_at = Column(BigInteger, nullable=True, comment="离开时间")
+    
+    __table_args__ = (
+        # 按群批量查询成员显示名称
+        Index('idx_chat_room_id_wechat_id', 'chat_room_id', 'wechat_id'),
+    )
+
+
+class ChatRoomMemberSchema(BaseModel):
+    """群成员Pydantic模型"""
+    id: int
+    chat_room_id: str = Field(..., description="群ID")
+    wechat_id: str = Field(..., description="微信ID")
+    alias: str = Field("", description="微信号")
+    nickname: str = Field("", description="昵称")
+    avatar: str = Field("", description="头像")
+    inviter_wechat_id: str = Field("", description="邀请人微信ID")
+    is_admin: bool = Field(False, description="是否群管理员")
+    is_blacklisted: bool = Field(False, description="是否在黑名单")
+    is_leaved: Optional[bool] = Field(None, description="是否已经离开群聊")
+    score: Optional[int] = Field(None, description="积分")
+    remark: str = Field("", description="备注")
+    joined_at: int = Field(..., description="加入时间")
+    last_active_at: int = Field(..., description="最近活跃时间")
+    leaved_at: Optional[int] = Field(None, description="离开时间")
+    
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 from typing import Optional, Dict, Any
-from sqlalchemy import Column, BigInteger, String, Boolean, Text, JSON
+from sqlalchemy import Column, BigInteger, String, Boolean, Text, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from pydantic import BaseModel, Field
 from .global_settings import WelcomeType, PatType, NewsType, ImageModel
@@ -47,6 +47,11 @@ class ChatRoomSettings(Base):
     news_enabled = Column(Boolean, nullable=True, comment="是否启用每日早报功能")
     news_type = Column(String(10), nullable=True, comment="是否启用每日早报功能")
     morning_enabled = Column(Boolean, nullable=True, comment="是否启用早安问候功能")
+    
+    __table_args__ = (
+        # 按群查询群聊设置
+        Index('idx_chat_room_id', 'chat_room_id'),
+    )
 
 
 class ChatRoomSettingsSchema(BaseModel):
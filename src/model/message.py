@@ -1,5 +1,5 @@
 from enum import IntEnum
-from sqlalchemy import Column, BigInteger, String, Boolean, Index
+from sqlalchemy import Column, BigInteger, Integer, String, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from pydantic import BaseModel, Field
 
@@ -55,7 +55,8 @@ class Message(Base):
     """消息模型"""
     __tablename__ = "messages"
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # SQLite 只有 INTEGER 主键才会自增（本地替身库）
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
     msg_id = Column(BigInteger, index=True, comment="消息Id")
     client_msg_id = Column(BigInteger, index=True, comment="客户端消息Id")
     is_chat_room = Column(Boolean, default=False, comment="消息是否来自群聊")
@@ -74,6 +75,11 @@ class Message(Base):
     attachment_url = Column(String(255), default="", comment="文件地址")
     created_at = Column(BigInteger, nullable=False, comment="创建时间")
     updated_at = Column(BigInteger, nullable=False, comment="更新时间")
+    
+    __table_args__ = (
+        # 群聊总结按群和时间范围查询
+        Index('idx_from_wxid_created_at', 'from_wxid', 'created_at'),
+    )
 
 
 class MessageSchema(BaseModel):
@@ -0,0 +1,40 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, Index
+from sqlalchemy.ext.declarative import declarative_base
+from pydantic import BaseModel, Field
+
+Base = declarative_base()
+
+
+class ChatRoomSummaryBucket(Base):
+    """群聊总结的分时段缓存，每个已结束的时间段只总结一次"""
+    __tablename__ = "chat_room_summary_buckets"
+    
+    # SQLite 只有 INTEGER 主键才会自增（本地替身库）
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True, comment="主键ID")
+    chat_room_id = Column(String(64), nullable=False, comment="群聊ID")
+    bucket_seconds = Column(BigInteger, nullable=False, comment="时间段长度(秒)")
+    bucket_start = Column(BigInteger, nullable=False, comment="时间段开始时间戳")
+    message_count = Column(BigInteger, default=0, comment="时间段内参与总结的消息条数")
+    summary = Column(Text, nullable=False, comment="时间段的话题摘要，没有可总结的消息时为空")
+    model = Column(String(100), default="", comment="生成摘要使用的AI模型名称")
+    created_at = Column(BigInteger, nullable=False, comment="生成时间")
+    
+    __table_args__ = (
+        # 按群和时间段查询缓存的摘要
+        Index('uniq_chat_room_bucket', 'chat_room_id', 'bucket_seconds', 'bucket_start', unique=True),
+    )
+
+
+class ChatRoomSummaryBucketSchema(BaseModel):
+    """群聊总结分时段缓存Pydantic模型"""
+    id: int = Field(..., description="主键ID")
+    chat_room_id: str = Field(..., description="群聊ID")
+    bucket_seconds: int = Field(..., description="时间段长度(秒)")
+    bucket_start: int = Field(..., description="时间段开始时间戳")
+    message_count: int = Field(0, description="时间段内参与总结的消息条数")
+    summary: str = Field("", description="时间段的话题摘要")
+    model: str = Field("", description="生成摘要使用的AI模型名称")
+    created_at: int = Field(..., description="生成时间")
+    
+    class Config:
+        from_attributes = True
@@ -2,14 +2,33 @@
 Repository layer for database operations
 """
 
-from .message import MessageRepository
-from .contact import ContactRepository
-from .chatroom_settings import ChatRoomSettingsRepository
-from .global_settings import GlobalSettingsRepository
+from .message import MessageRepository, AsyncMessageRepository
+from .contact import ContactRepository, AsyncContactRepository
+from .chatroom_settings import ChatRoomSettingsRepository, AsyncChatRoomSettingsRepository
+from .global_settings import GlobalSettingsRepository, AsyncGlobalSettingsRepository
+from .chat_room_member import (
+    ChatRoomMemberRepository,
+    AsyncChatRoomMemberRepository,
+    MemberNameCache,
+    member_name_cache,
+)
+from .settings_cache import SettingsCache, settings_cache
+from .summary_bucket import AsyncSummaryBucketRepository
 
 __all__ = [
     "MessageRepository",
     "ContactRepository",
     "ChatRoomSettingsRepository",
     "GlobalSettingsRepository",
+    "AsyncMessageRepository",
+    "AsyncContactRepository",
+    "AsyncChatRoomSettingsRepository",
+    "AsyncGlobalSettingsRepository",
+    "ChatRoomMemberRepository",
+    "AsyncChatRoomMemberRepository",
+    "MemberNameCache",
+    "member_name_cache",
+    "SettingsCache",
+    "settings_cache",
+    "AsyncSummaryBucketRepository",
 ]
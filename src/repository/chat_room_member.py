@@ -0,0 +1,235 @@
+"""
+Chat room member repository for database operations
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..model.chat_room_member import ChatRoomMember
+
+# 单条 IN (...) 查询最多包含的微信ID数量
+_IN_BATCH_SIZE = 500
+
+_RoomKey = Tuple[str, str]
+
+
+class _RoomNames:
+    """单个群缓存的显示名称，以及查不到的微信ID（非群成员）各自的过期时间"""
+
+    __slots__ = ("expires_at", "names", "misses")
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.names: Dict[str, str] = {}
+        self.misses: Dict[str, float] = {}
+
+
+class MemberNameCache:
+    """按群缓存群成员显示名称（LRU + TTL）"""
+
+    def __init__(self, ttl: float = 600, miss_ttl: float = 60, max_rooms: int = 1000):
+        """
+        初始化群成员名称缓存
+
+        Args:
+            ttl: 单个群的缓存有效期(秒)，<= 0 表示关闭缓存
+            miss_ttl: 查不到的微信ID的缓存有效期(秒)，较短以便新入群的成员尽快显示名称
+            max_rooms: 最多缓存的群数量，超出后淘汰最久未使用的群
+        """
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.max_rooms = max_rooms
+        self._lock = Lock()
+        self._rooms: "OrderedDict[_RoomKey, _RoomNames]" = OrderedDict()
+
+    def get_many(
+        self, robot_code: str, chat_room_id: str, wechat_ids: Iterable[str]
+    ) -> Tuple[Dict[str, str], Set[str]]:
+        """
+        批量读取显示名称，查不到的微信ID在 miss_ttl 内映射为微信ID本身
+
+        Returns:
+            (已缓存的名称, 未缓存的微信ID)
+        """
+        wechat_ids = set(wechat_ids)
+        if self.ttl <= 0:
+            return {}, wechat_ids
+        key = (robot_code, chat_room_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rooms.get(key)
+            if entry is None or entry.expires_at <= now:
+                self._rooms.pop(key, None)
+                return {}, wechat_ids
+            self._rooms.move_to_end(key)
+            found: Dict[str, str] = {}
+            for wxid in wechat_ids:
+                name = entry.names.get(wxid)
+                if name is not None:
+                    found[wxid] = name
+                elif entry.misses.get(wxid, 0) > now:
+                    found[wxid] = wxid
+        return found, wechat_ids - found.keys()
+
+    def put_many(
+        self, robot_code: str, chat_room_id: str, names: Dict[str, str], misses: Iterable[str] = ()
+    ) -> None:
+        """批量写入显示名称，misses 为查不到的微信ID，按 miss_ttl 缓存"""
+        misses = set(misses)
+        if self.ttl <= 0 or not (names or misses):
+            return
+        key = (robot_code, chat_room_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rooms.get(key)
+            if entry is None or entry.expires_at <= now:
+                entry = _RoomNames(now + self.ttl)
+                self._rooms[key] = entry
+            entry.names.update(names)
+            for wxid in names:
+                entry.misses.pop(wxid, None)
+            if self.miss_ttl > 0:
+                miss_expires_at = now + self.miss_ttl
+                for wxid in misses:
+                    entry.misses[wxid] = miss_expires_at
+            self._rooms.move_to_end(key)
+            while len(self._rooms) > max(self.max_rooms, 1):
+                self._rooms.popitem(last=False)
+
+    def invalidate(self, robot_code: str, chat_room_id: Optional[str] = None) -> None:
+        """失效某个租户（或某个群）的名称缓存"""
+        with self._lock:
+            if chat_room_id:
+                self._rooms.pop((robot_code, chat_room_id), None)
+                return
+            for key in [k for k in self._rooms if k[0] == robot_code]:
+                del self._rooms[key]
+
+
+def _display_names_statement(chat_room_id: str, wechat_ids: List[str]) -> Select:
+    """构建批量查询群成员显示名称的语句"""
+    return select(
+        ChatRoomMember.wechat_id,
+        ChatRoomMember.remark,
+        ChatRoomMember.nickname,
+    ).where(
+        ChatRoomMember.chat_room_id == chat_room_id,
+        ChatRoomMember.wechat_id.in_(wechat_ids),
+    ).order_by(ChatRoomMember.id.asc())
+
+
+def _batches(wechat_ids: Set[str]) -> Iterable[List[str]]:
+    ordered = sorted(wechat_ids)
+    for i in range(0, len(ordered), _IN_BATCH_SIZE):
+        yield ordered[i:i + _IN_BATCH_SIZE]
+
+
+def _collect_display_names(rows: Iterable, names: Dict[str, str]) -> None:
+    # 显示名称优先级：备注 > 昵称 > 微信ID
+    for wechat_id, remark, nickname in rows:
+        names[wechat_id] = remark or nickname or wechat_id
+
+
+def _merge_loaded(
+    robot_code: Optional[str],
+    chat_room_id: str,
+    names: Dict[str, str],
+    missing: Set[str],
+    loaded: Dict[str, str],
+) -> Dict[str, str]:
+    # 查不到的（非群成员）显示为微信ID本身，单独按较短的有效期缓存
+    misses = missing - loaded.keys()
+    if robot_code:
+        member_name_cache.put_many(robot_code, chat_room_id, loaded, misses)
+    names.update((wxid, wxid) for wxid in misses)
+    names.update(loaded)
+    return names
+
+
+class ChatRoomMemberRepository:
+    """群成员仓库"""
+    
+    def __init__(self, db: Session, robot_code: Optional[str] = None):
+        """
+        初始化群成员仓库
+        
+        Args:
+            db: 数据库会话
+            robot_code: 机器人编码，指定时显示名称经过按群的缓存
+        """
+        self.db = db
+        self.robot_code = robot_code
+    
+    def get_display_names(self, chat_room_id: str, wechat_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        批量获取群成员的显示名称（备注 > 昵称 > 微信ID）
+        
+        Args:
+            chat_room_id: 群聊ID
+            wechat_ids: 微信ID列表
+            
+        Returns:
+            微信ID到显示名称的映射，非群成员映射为微信ID本身
+        """
+        if self.robot_code:
+            names, missing = member_name_cache.get_many(self.robot_code, chat_room_id, wechat_ids)
+        else:
+            names, missing = {}, set(wechat_ids)
+        if not missing:
+            return names
+        
+        loaded: Dict[str, str] = {}
+        for batch in _batches(missing):
+            _collect_display_names(
+                self.db.execute(_display_names_statement(chat_room_id, batch)),
+                loaded,
+            )
+        return _merge_loaded(self.robot_code, chat_room_id, names, missing, loaded)
+
+
+class AsyncChatRoomMemberRepository:
+    """群成员仓库（异步）"""
+    
+    def __init__(self, db: AsyncSession, robot_code: Optional[str] = None):
+        """
+        初始化群成员仓库
+        
+        Args:
+            db: 异步数据库会话
+            robot_code: 机器人编码，指定时显示名称经过按群的缓存
+        """
+        self.db = db
+        self.robot_code = robot_code
+    
+    async def get_display_names(self, chat_room_id: str, wechat_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        批量获取群成员的显示名称（备注 > 昵称 > 微信ID）
+        
+        Args:
+            chat_room_id: 群聊ID
+            wechat_ids: 微信ID列表
+            
+        Returns:
+            微信ID到显示名称的映射，非群成员映射为微信ID本身
+        """
+        if self.robot_code:
+            names, missing = member_name_cache.get_many(self.robot_code, chat_room_id, wechat_ids)
+        else:
+            names, missing = {}, set(wechat_ids)
+        if not missing:
+            return names
+        
+        loaded: Dict[str, str] = {}
+        for batch in _batches(missing):
+            result = await self.db.execute(_display_names_statement(chat_room_id, batch))
+            _collect_display_names(result, loaded)
+        return _merge_loaded(self.robot_code, chat_room_id, names, missing, loaded)
+
+
+# 全局群成员名称缓存
+member_name_cache = MemberNameCache()
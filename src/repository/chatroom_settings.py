@@ -2,23 +2,28 @@
 ChatRoom settings repository for database operations
 """
 
-from typing import Optional
+from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..model.chatroom_settings import ChatRoomSettings
+from .settings_cache import CHAT_ROOM_SETTINGS, settings_cache
 
 
 class ChatRoomSettingsRepository:
     """群聊设置仓库"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, robot_code: Optional[str] = None):
         """
         初始化群聊设置仓库
         
         Args:
             db: 数据库会话
+            robot_code: 机器人编码，指定时读取经过按租户的设置缓存
         """
         self.db = db
+        self.robot_code = robot_code
     
     def get_chatroom_settings(self, chat_room_id: str) -> Optional[ChatRoomSettings]:
         """
@@ -30,6 +35,77 @@ class ChatRoomSettingsRepository:
         Returns:
             群聊设置对象，如果不存在返回 None
         """
-        return self.db.query(ChatRoomSettings).filter(
+        use_cache = bool(self.robot_code) and settings_cache.enabled
+        if use_cache:
+            hit, cached = settings_cache.get(self.robot_code, CHAT_ROOM_SETTINGS, chat_room_id)
+            if hit:
+                return cached
+        
+        chatroom_settings = self.db.query(ChatRoomSettings).filter(
             ChatRoomSettings.chat_room_id == chat_room_id
         ).first()
+        if use_cache:
+            # 从会话中分离后再缓存，没有设置的群聊也会被缓存（负缓存）
+            if chatroom_settings is not None:
+                self.db.expunge(chatroom_settings)
+            settings_cache.set(self.robot_code, CHAT_ROOM_SETTINGS, chat_room_id, chatroom_settings)
+        return chatroom_settings
+
+
+class AsyncChatRoomSettingsRepository:
+    """群聊设置仓库（异步）"""
+    
+    def __init__(self, db: AsyncSession, robot_code: Optional[str] = None):
+        """
+        初始化群聊设置仓库
+        
+        Args:
+            db: 异步数据库会话
+            robot_code: 机器人编码，指定时读取经过按租户的设置缓存
+        """
+        self.db = db
+        self.robot_code = robot_code
+    
+    async def get_chatroom_settings(self, chat_room_id: str) -> Optional[ChatRoomSettings]:
+        """
+        根据群聊ID获取群聊设置
+        
+        Args:
+            chat_room_id: 群聊ID
+            
+        Returns:
+            群聊设置对象，如果不存在返回 None
+        """
+        use_cache = bool(self.robot_code) and settings_cache.enabled
+        if use_cache:
+            hit, cached = settings_cache.get(self.robot_code, CHAT_ROOM_SETTINGS, chat_room_id)
+            if hit:
+                return cached
+        
+        result = await self.db.execute(
+            select(ChatRoomSettings).where(
+                ChatRoomSettings.chat_room_id == chat_room_id
+            ).limit(1)
+        )
+        chatroom_settings = result.scalars().first()
+        if use_cache:
+            # 从会话中分离后再缓存，没有设置的群聊也会被缓存（负缓存）
+            if chatroom_settings is not None:
+                self.db.expunge(chatroom_settings)
+            settings_cache.set(self.robot_code, CHAT_ROOM_SETTINGS, chat_room_id, chatroom_settings)
+        return chatroom_settings
+    
+    async def list_summary_enabled_chat_room_ids(self) -> List[str]:
+        """
+        获取开启了群聊总结的群聊ID列表，供定时总结使用
+        
+        Returns:
+            群聊ID列表
+        """
+        result = await self.db.execute(
+            select(ChatRoomSettings.chat_room_id).where(
+                ChatRoomSettings.chat_room_summary_enabled.is_(True),
+                ChatRoomSettings.chat_room_id != ""
+            ).order_by(ChatRoomSettings.chat_room_id)
+        )
+        return [str(row[0]) for row in result.all()]
@@ -3,7 +3,9 @@ Contact repository for database operations
 """
 
 from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..model.contact import Contact
 
@@ -33,3 +35,33 @@ class ContactRepository:
         return self.db.query(Contact).filter(
             Contact.wechat_id == wechat_id
         ).first()
+
+
+class AsyncContactRepository:
+    """联系人仓库（异步）"""
+    
+    def __init__(self, db: AsyncSession):
+        """
+        初始化联系人仓库
+        
+        Args:
+            db: 异步数据库会话
+        """
+        self.db = db
+    
+    async def get_contact_by_wechat_id(self, wechat_id: str) -> Optional[Contact]:
+        """
+        根据微信ID获取联系人
+        
+        Args:
+            wechat_id: 微信ID
+            
+        Returns:
+            联系人对象，如果不存在返回 None
+        """
+        result = await self.db.execute(
+            select(Contact).where(
+                Contact.wechat_id == wechat_id
+            ).limit(1)
+        )
+        return result.scalars().first()
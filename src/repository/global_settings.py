@@ -3,22 +3,27 @@ Global settings repository for database operations
 """
 
 from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..model.global_settings import GlobalSettings
+from .settings_cache import GLOBAL_SETTINGS, settings_cache
 
 
 class GlobalSettingsRepository:
     """全局设置仓库"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, robot_code: Optional[str] = None):
         """
         初始化全局设置仓库
         
         Args:
             db: 数据库会话
+            robot_code: 机器人编码，指定时读取经过按租户的设置缓存
         """
         self.db = db
+        self.robot_code = robot_code
     
     def get_global_settings(self) -> Optional[GlobalSettings]:
         """
@@ -27,4 +32,53 @@ class GlobalSettingsRepository:
         Returns:
             全局设置对象，如果不存在返回 None
         """
-        return self.db.query(GlobalSettings).first()
+        use_cache = bool(self.robot_code) and settings_cache.enabled
+        if use_cache:
+            hit, cached = settings_cache.get(self.robot_code, GLOBAL_SETTINGS)
+            if hit:
+                return cached
+        
+        global_settings = self.db.query(GlobalSettings).first()
+        if use_cache:
+            # 从会话中分离后再缓存，避免会话关闭后被其他请求共享
+            if global_settings is not None:
+                self.db.expunge(global_settings)
+            settings_cache.set(self.robot_code, GLOBAL_SETTINGS, "", global_settings)
+        return global_settings
+
+
+class AsyncGlobalSettingsRepository:
+    """全局设置仓库（异步）"""
+    
+    def __init__(self, db: AsyncSession, robot_code: Optional[str] = None):
+        """
+        初始化全局设置仓库
+        
+        Args:
+            db: 异步数据库会话
+            robot_code: 机器人编码，指定时读取经过按租户的设置缓存
+        """
+        self.db = db
+        self.robot_code = robot_code
+    
+    async def get_global_settings(self) -> Optional[GlobalSettings]:
+        """
+        获取全局设置
+        
+        Returns:
+            全局设置对象，如果不存在返回 None
+        """
+        use_cache = bool(self.robot_code) and settings_cache.enabled
+        if use_cache:
+            hit, cached = settings_cache.get(self.robot_code, GLOBAL_SETTINGS)
+            if hit:
+                return cached
+        
+        result = await self.db.execute(select(GlobalSettings).limit(1))
+        global_settings = result.scalars().first()
+        if use_cache:
+            # 从会话中分离后再缓存，避免会话关闭后被其他请求共享
+            if global_settings is not None:
+                self.db.expunge(global_settings)
+            settings_cache.set(self.robot_code, GLOBAL_SETTINGS, "", global_settings)
+        return global_settings
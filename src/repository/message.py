@@ -2,25 +2,44 @@
 Message repository for database operations
 """
 
-from typing import List, Optional, Dict, Any, cast
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Dict, Any, Set, cast
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import ColumnElement, Row, Select, and_, func, insert, literal, or_, select
 
-try:
-    from lxml import etree
-except ImportError:
-    import xml.etree.ElementTree as etree
+from ..model.message import AppMessageType, Message, MessageType
+from ..utils.appmsg import AppMessage, appmsg_extractor
+from .chat_room_member import AsyncChatRoomMemberRepository, ChatRoomMemberRepository
 
-from ..model.message import Message
+# 流式读取消息时每批的行数
+STREAM_BATCH_SIZE = 500
+
+# 群聊总结保留的APP消息子类型：引用、视频分享、网页分享、文件
+SUMMARY_APP_MESSAGE_TYPES = (
+    AppMessageType.QUOTE,
+    AppMessageType.VIDEO,
+    AppMessageType.URL,
+    AppMessageType.ATTACH,
+)
+
+# 群聊总结只需要的列，按列投影查询返回轻量的行元组，不构建 ORM 实体和标识映射
+_TEXT_MESSAGE_COLUMNS = (
+    Message.type,
+    Message.app_msg_type,
+    Message.content,
+    Message.sender_wxid,
+    Message.created_at,
+)
 
 
 class TextMessageItem:
     """文本消息项"""
     
-    def __init__(self, nickname: str, message: str, created_at: int):
+    def __init__(self, nickname: str, message: str, created_at: int, sender_wxid: str = ""):
         self.nickname = nickname
         self.message = message
         self.created_at = created_at
+        self.sender_wxid = sender_wxid
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
@@ -31,17 +50,182 @@ class TextMessageItem:
         }
 
 
+def _messages_by_time_range_condition(
+    self_wxid: str,
+    chat_room_id: str,
+    start_time: int,
+    end_time: int
+) -> ColumnElement[bool]:
+    """按时间范围查询群聊消息的过滤条件，取数和计数共用"""
+    # 子类型通过 app_msg_type 列在数据库中过滤，小程序、转账、红包等不会被读取；
+    # 旧数据的 app_msg_type 为 0，仍需读取后在 Python 中解析 XML 判断
+    return and_(
+        Message.from_wxid == chat_room_id,
+        or_(
+            Message.type == int(MessageType.TEXT),  # 文本消息
+            and_(
+                Message.type == int(MessageType.APP),  # APP消息
+                or_(
+                    Message.app_msg_type.in_([int(t) for t in SUMMARY_APP_MESSAGE_TYPES]),
+                    Message.app_msg_type == 0,
+                )
+            )
+        ),
+        Message.sender_wxid != self_wxid,
+        Message.created_at >= start_time,
+        Message.created_at < end_time
+    )
+
+
+def _messages_by_time_range_statement(
+    self_wxid: str,
+    chat_room_id: str,
+    start_time: int,
+    end_time: int
+) -> Select:
+    """构建按时间范围查询群聊消息的列投影语句，同步和异步仓库共用"""
+    return select(*_TEXT_MESSAGE_COLUMNS).where(
+        _messages_by_time_range_condition(self_wxid, chat_room_id, start_time, end_time)
+    ).order_by(Message.created_at.asc())
+
+
+def _count_messages_statement(
+    self_wxid: str,
+    chat_room_id: str,
+    start_time: int,
+    end_time: int,
+    limit: int
+) -> Select:
+    """构建计数语句，子查询带 LIMIT，最多扫描 limit 行索引就返回"""
+    probe = select(literal(1)).where(
+        _messages_by_time_range_condition(self_wxid, chat_room_id, start_time, end_time)
+    ).limit(limit).subquery()
+    return select(func.count()).select_from(probe)
+
+
+def _app_message_contents(messages: List[Row]) -> List[str]:
+    """一批消息行中需要解析 XML 的 APP消息内容"""
+    return [
+        str(msg.content)
+        for msg in messages
+        if msg.type == int(MessageType.APP) and msg.content
+    ]
+
+
+def _to_text_message_items(
+    messages: Iterable[Row],
+    app_messages: Optional[Dict[str, Optional[AppMessage]]] = None
+) -> List[TextMessageItem]:
+    """
+    将消息行转换为文本消息项，发送者昵称暂时使用微信ID，由 _apply_display_names 填充
+    
+    Args:
+        messages: 消息行列表（_TEXT_MESSAGE_COLUMNS 投影）
+        app_messages: 预先批量提取的 appmsg 结果，缺失的内容逐条提取
+        
+    Returns:
+        文本消息项列表
+    """
+    # APP消息类型
+    app_msg_list = [str(int(t)) for t in SUMMARY_APP_MESSAGE_TYPES]
+    
+    result = []
+    for msg in messages:
+        sender_wxid = str(msg.sender_wxid or "")
+        
+        # 处理消息内容
+        message_content = _extract_message_content(msg, app_msg_list, app_messages)
+        
+        if message_content is not None:
+            result.append(TextMessageItem(
+                nickname=sender_wxid,
+                message=message_content,
+                created_at=cast(int, msg.created_at) if msg.created_at is not None else 0,
+                sender_wxid=sender_wxid
+            ))
+    
+    return result
+
+
+def _apply_display_names(items: List[TextMessageItem], display_names: Dict[str, str]) -> None:
+    """用群成员显示名称（备注 > 昵称 > 微信ID）填充发送者昵称"""
+    for item in items:
+        item.nickname = display_names.get(item.sender_wxid) or item.sender_wxid
+
+
+def _extract_message_content(
+    msg: Any,
+    app_msg_list: List[str],
+    app_messages: Optional[Dict[str, Optional[AppMessage]]] = None
+) -> Optional[str]:
+    """
+    提取消息内容
+    
+    Args:
+        msg: 消息行或消息对象，需要包含 type、app_msg_type 和 content
+        app_msg_list: APP消息类型列表
+        app_messages: 预先批量提取的 appmsg 结果
+        
+    Returns:
+        消息内容，如果不符合条件返回 None
+    """
+    msg_type = cast(int, msg.type) if msg.type is not None else 0
+    
+    # 文本消息
+    if msg_type == 1:
+        return str(msg.content or "")
+    
+    # APP消息
+    if msg_type == 49:
+        content = str(msg.content or "")
+        if not content:
+            return None
+        
+        if app_messages is not None and content in app_messages:
+            app_message = app_messages[content]
+        else:
+            app_message = appmsg_extractor.extract(content)
+        if app_message is None:
+            # XML 解析失败，返回原始内容
+            return content
+        
+        # app_msg_type 列有值时直接使用，只有旧数据(为 0)才使用 XML 中的 appmsg/type
+        column_type = getattr(msg, 'app_msg_type', None)
+        appmsg_type = str(column_type) if column_type else app_message.type
+        
+        # 检查是否在允许的类型列表中
+        if not appmsg_type or appmsg_type not in app_msg_list:
+            return None
+        
+        # 根据类型提取内容
+        if appmsg_type == '57':  # 引用消息
+            return app_message.title
+        
+        elif appmsg_type == '5' or appmsg_type == '4':  # 网页分享消息
+            return f"网页分享消息，标题: {app_message.title}，描述：{app_message.des}"
+        
+        elif appmsg_type == '6':  # 文件消息
+            return f"文件消息，文件名: {app_message.title}"
+        
+        else:
+            return app_message.des
+    
+    return None
+
+
 class MessageRepository:
     """消息仓库"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, robot_code: Optional[str] = None):
         """
         初始化消息仓库
         
         Args:
             db: 数据库会话
+            robot_code: 机器人编码，指定时发送者昵称经过按群的缓存
         """
         self.db = db
+        self.member_repo = ChatRoomMemberRepository(db, robot_code)
     
     def get_messages_by_time_range(
         self,
@@ -62,110 +246,222 @@ class MessageRepository:
         Returns:
             消息列表
         """
-        # APP消息类型
-        app_msg_list = ['57', '4', '5', '6']
+        items: List[TextMessageItem] = []
+        for batch in self.iter_messages_by_time_range(self_wxid, chat_room_id, start_time, end_time):
+            items.extend(batch)
+        self.resolve_nicknames(chat_room_id, items)
+        return items
+    
+    def count_messages_by_time_range(
+        self,
+        self_wxid: str,
+        chat_room_id: str,
+        start_time: int,
+        end_time: int,
+        limit: int
+    ) -> int:
+        """
+        统计时间范围内的消息条数，最多数到 limit 条
         
-        # 构建查询
-        # 由于 SQLAlchemy 不支持 MySQL 的 EXTRACTVALUE，我们需要在 Python 中处理 XML
-        query = self.db.query(Message).filter(
-            and_(
-                Message.from_wxid == chat_room_id,
-                or_(
-                    Message.type == 1,  # 文本消息
-                    and_(
-                        Message.type == 49,  # APP消息
-                        # 这里我们先查出来，再在 Python 中过滤
-                    )
-                ),
-                Message.sender_wxid != self_wxid,
-                Message.created_at >= start_time,
-                Message.created_at < end_time
-            )
-        ).order_by(Message.created_at.asc())
+        只走索引计数，不读取消息内容，用于在取数前判断消息是否足够；
+        旧数据的APP消息要解析 XML 后才能确定是否保留，因此结果是取数后条数的上限
+        
+        Args:
+            self_wxid: 自己的微信ID
+            chat_room_id: 群聊ID
+            start_time: 开始时间戳
+            end_time: 结束时间戳
+            limit: 最多统计的条数
+            
+        Returns:
+            消息条数，不超过 limit
+        """
+        stmt = _count_messages_statement(self_wxid, chat_room_id, start_time, end_time, limit)
+        return int(self.db.execute(stmt).scalar_one())
+    
+    def iter_messages_by_time_range(
+        self,
+        self_wxid: str,
+        chat_room_id: str,
+        start_time: int,
+        end_time: int,
+        batch_size: int = STREAM_BATCH_SIZE
+    ) -> Iterator[List[TextMessageItem]]:
+        """
+        按批流式读取时间范围内的消息（服务端游标），内存占用只与批大小有关
         
-        messages = query.all()
+        流读取期间连接被游标占用，发送者昵称为微信ID，读取结束后调用 resolve_nicknames 填充
         
-        # 处理结果
-        result = []
-        for msg in messages:
-            # 获取发送者昵称（需要联表查询 chat_room_members）
-            # 这里简化处理，直接使用 sender_wxid
-            # 实际应该联表查询 chat_room_members 获取 remark 或 nickname
-            nickname = str(msg.sender_wxid or "")
+        Args:
+            self_wxid: 自己的微信ID
+            chat_room_id: 群聊ID
+            start_time: 开始时间戳
+            end_time: 结束时间戳
+            batch_size: 每批读取的行数
             
-            # 处理消息内容
-            message_content = self._extract_message_content(msg, app_msg_list)
+        Yields:
+            每批的消息列表
+        """
+        stmt = _messages_by_time_range_statement(
+            self_wxid, chat_room_id, start_time, end_time
+        ).execution_options(yield_per=batch_size)
+        for partition in self.db.execute(stmt).partitions():
+            app_messages = appmsg_extractor.extract_many(_app_message_contents(partition))
+            yield _to_text_message_items(partition, app_messages)
+    
+    def resolve_nicknames(self, chat_room_id: str, items: List[TextMessageItem]) -> None:
+        """
+        一次批量查询所有发送者的显示名称，并填充到消息项中
+        
+        Args:
+            chat_room_id: 群聊ID
+            items: 消息列表
+        """
+        display_names = self.member_repo.get_display_names(
+            chat_room_id, {item.sender_wxid for item in items}
+        )
+        _apply_display_names(items, display_names)
+
+
+class AsyncMessageRepository:
+    """消息仓库（异步）"""
+    
+    def __init__(self, db: AsyncSession, robot_code: Optional[str] = None):
+        """
+        初始化消息仓库
+        
+        Args:
+            db: 异步数据库会话
+            robot_code: 机器人编码，指定时发送者昵称经过按群的缓存
+        """
+        self.db = db
+        self.member_repo = AsyncChatRoomMemberRepository(db, robot_code)
+    
+    async def get_messages_by_time_range(
+        self,
+        self_wxid: str,
+        chat_room_id: str,
+        start_time: int,
+        end_time: int
+    ) -> List[TextMessageItem]:
+        """
+        根据时间范围获取消息列表
+        
+        Args:
+            self_wxid: 自己的微信ID
+            chat_room_id: 群聊ID
+            start_time: 开始时间戳
+            end_time: 结束时间戳
             
-            if message_content is not None:
-                result.append(TextMessageItem(
-                    nickname=nickname,
-                    message=message_content,
-                    created_at=cast(int, msg.created_at) if msg.created_at is not None else 0
-                ))
+        Returns:
+            消息列表
+        """
+        items: List[TextMessageItem] = []
+        async for batch in self.stream_messages_by_time_range(
+            self_wxid, chat_room_id, start_time, end_time
+        ):
+            items.extend(batch)
+        await self.resolve_nicknames(chat_room_id, items)
+        return items
+    
+    async def count_messages_by_time_range(
+        self,
+        self_wxid: str,
+        chat_room_id: str,
+        start_time: int,
+        end_time: int,
+        limit: int
+    ) -> int:
+        """
+        统计时间范围内的消息条数，最多数到 limit 条
         
-        return result
+        只走索引计数，不读取消息内容，用于在取数前判断消息是否足够；
+        旧数据的APP消息要解析 XML 后才能确定是否保留，因此结果是取数后条数的上限
+        
+        Args:
+            self_wxid: 自己的微信ID
+            chat_room_id: 群聊ID
+            start_time: 开始时间戳
+            end_time: 结束时间戳
+            limit: 最多统计的条数
+            
+        Returns:
+            消息条数，不超过 limit
+        """
+        stmt = _count_messages_statement(self_wxid, chat_room_id, start_time, end_time, limit)
+        return int((await self.db.execute(stmt)).scalar_one())
     
-    def _extract_message_content(self, msg: Message, app_msg_list: List[str]) -> Optional[str]:
+    async def stream_messages_by_time_range(
+        self,
+        self_wxid: str,
+        chat_room_id: str,
+        start_time: int,
+        end_time: int,
+        batch_size: int = STREAM_BATCH_SIZE
+    ) -> AsyncIterator[List[TextMessageItem]]:
         """
-        提取消息内容
+        按批流式读取时间范围内的消息（服务端游标），内存占用只与批大小有关
+        
+        流读取期间连接被游标占用，发送者昵称为微信ID，读取结束后调用 resolve_nicknames 填充
         
         Args:
-            msg: 消息对象
-            app_msg_list: APP消息类型列表
+            self_wxid: 自己的微信ID
+            chat_room_id: 群聊ID
+            start_time: 开始时间戳
+            end_time: 结束时间戳
+            batch_size: 每批读取的行数
+            
+        Yields:
+            每批的消息列表
+        """
+        stmt = _messages_by_time_range_statement(
+            self_wxid, chat_room_id, start_time, end_time
+        ).execution_options(yield_per=batch_size)
+        result = await self.db.stream(stmt)
+        try:
+            async for partition in result.partitions():
+                app_messages = await appmsg_extractor.extract_many_async(_app_message_contents(partition))
+                yield _to_text_message_items(partition, app_messages)
+        finally:
+            await result.close()
+    
+    async def resolve_nicknames(self, chat_room_id: str, items: List[TextMessageItem]) -> None:
+        """
+        一次批量查询所有发送者的显示名称，并填充到消息项中
+        
+        Args:
+            chat_room_id: 群聊ID
+            items: 消息列表
+        """
+        display_names = await self.member_repo.get_display_names(
+            chat_room_id, {item.sender_wxid for item in items}
+        )
+        _apply_display_names(items, display_names)
+    
+    async def insert_messages(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        批量写入消息，不提交事务
+        
+        以 executemany 方式执行，语句只编译一次；MySQL 驱动会把整批改写为一条多行 INSERT
+        
+        Args:
+            rows: 消息行，所有行的字段必须相同
+        """
+        if rows:
+            await self.db.execute(insert(Message), rows)
+    
+    async def get_existing_msg_ids(self, msg_ids: Iterable[int]) -> Set[int]:
+        """
+        查询已经入库的消息ID（NewMsgId），走 msg_id 索引
+        
+        Args:
+            msg_ids: 要检查的消息ID
             
         Returns:
-            消息内容，如果不符合条件返回 None
-        """
-        msg_type = cast(int, msg.type) if msg.type is not None else 0
-        
-        # 文本消息
-        if msg_type == 1:
-            return str(msg.content or "")
-        
-        # APP消息
-        if msg_type == 49:
-            try:
-                content = str(msg.content or "")
-                if not content:
-                    return None
-                    
-                # 解析 XML
-                root = etree.fromstring(content.encode('utf-8'))
-                
-                # 获取 appmsg/type
-                appmsg_type_elem = root.find('.//appmsg/type')
-                if appmsg_type_elem is None:
-                    return None
-                
-                appmsg_type = appmsg_type_elem.text
-                
-                # 检查是否在允许的类型列表中
-                if appmsg_type not in app_msg_list:
-                    return None
-                
-                # 根据类型提取内容
-                if appmsg_type == '57':  # 引用消息
-                    title_elem = root.find('.//appmsg/title')
-                    return title_elem.text if title_elem is not None else ""
-                
-                elif appmsg_type == '5' or appmsg_type == '4':  # 网页分享消息
-                    title_elem = root.find('.//appmsg/title')
-                    des_elem = root.find('.//appmsg/des')
-                    title = title_elem.text if title_elem is not None else ""
-                    des = des_elem.text if des_elem is not None else ""
-                    return f"网页分享消息，标题: {title}，描述：{des}"
-                
-                elif appmsg_type == '6':  # 文件消息
-                    title_elem = root.find('.//appmsg/title')
-                    title = title_elem.text if title_elem is not None else ""
-                    return f"文件消息，文件名: {title}"
-                
-                else:
-                    des_elem = root.find('.//appmsg/des')
-                    return des_elem.text if des_elem is not None else ""
-                    
-            except Exception:
-                # XML 解析失败，返回原始内容
-                return str(msg.content or "")
-        
-        return None
+            其中已经存在于 messages 表的消息ID
+        """
+        ids = list(set(msg_ids))
+        if not ids:
+            return set()
+        result = await self.db.execute(select(Message.msg_id).where(Message.msg_id.in_(ids)))
+        return {int(row[0]) for row in result.all()}
@@ -0,0 +1,113 @@
+"""
+Settings cache - 全局设置和群聊设置的读穿透缓存
+
+按租户（RobotCode）缓存，支持 TTL 过期、不存在记录的负缓存和主动失效
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+# 缓存类型
+GLOBAL_SETTINGS = "global_settings"
+CHAT_ROOM_SETTINGS = "chat_room_settings"
+
+_CacheKey = Tuple[str, str, str]
+
+
+class SettingsCache:
+    """按租户缓存设置对象，None 表示记录不存在（负缓存）"""
+
+    def __init__(self, ttl: float = 60, negative_ttl: float = 30, max_entries: int = 10000):
+        """
+        初始化设置缓存
+
+        Args:
+            ttl: 缓存有效期(秒)，<= 0 表示关闭缓存
+            negative_ttl: 记录不存在时的缓存有效期(秒)
+            max_entries: 最多缓存的条目数，超出后淘汰最久未使用的条目
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: "OrderedDict[_CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, robot_code: str, kind: str, key: str = "") -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Returns:
+            (是否命中, 缓存的值)，命中时值可能为 None（负缓存）
+        """
+        cache_key = (robot_code, kind, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(cache_key)
+                    self._hits += 1
+                    return True, value
+                del self._entries[cache_key]
+            self._misses += 1
+            return False, None
+
+    def set(self, robot_code: str, kind: str, key: str, value: Any) -> None:
+        """写入缓存，value 为 None 时使用负缓存有效期"""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        cache_key = (robot_code, kind, key)
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > max(self.max_entries, 1):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, robot_code: Optional[str] = None, chat_room_id: Optional[str] = None) -> int:
+        """
+        主动失效缓存
+
+        Args:
+            robot_code: 机器人编码，为空时清空所有租户的缓存
+            chat_room_id: 群聊ID，指定时只失效该群聊的设置，否则失效该租户的全部设置
+
+        Returns:
+            失效的条目数
+        """
+        with self._lock:
+            if not robot_code:
+                keys = list(self._entries)
+            elif chat_room_id:
+                keys = [(robot_code, CHAT_ROOM_SETTINGS, chat_room_id)]
+            else:
+                keys = [k for k in self._entries if k[0] == robot_code]
+            removed = 0
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    removed += 1
+            self._invalidations += 1
+            return removed
+
+    def stats(self) -> Dict[str, int]:
+        """返回设置缓存的统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+            }
+
+
+# 全局设置缓存，load_config 时根据 SETTINGS_CACHE_TTL 调整有效期
+settings_cache = SettingsCache()
@@ -0,0 +1,139 @@
+"""
+Summary bucket repository for database operations
+"""
+
+import logging
+import time
+from threading import Lock
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..model.summary_bucket import ChatRoomSummaryBucket
+
+logger = logging.getLogger(__name__)
+
+# 缓存表不可用（例如还没有用 wechat-robot-schema-advisor --create-tables 建表）时，多久(秒)后再重试
+UNAVAILABLE_RETRY_SECONDS = 600
+
+# 各租户缓存表不可用时的重试时间（time.monotonic()）
+_unavailable_until: Dict[str, float] = {}
+_unavailable_lock = Lock()
+
+
+class AsyncSummaryBucketRepository:
+    """群聊总结分时段缓存的异步仓库"""
+    
+    def __init__(self, db: AsyncSession, robot_code: str):
+        """
+        初始化分时段缓存仓库
+        
+        Args:
+            db: 异步数据库会话
+            robot_code: 机器人编码
+        """
+        self.db = db
+        self.robot_code = robot_code
+    
+    def available(self) -> bool:
+        """
+        缓存表是否可用，查询失败后 UNAVAILABLE_RETRY_SECONDS 秒内视为不可用
+        
+        Returns:
+            是否可以使用分时段缓存
+        """
+        with _unavailable_lock:
+            until = _unavailable_until.get(self.robot_code)
+            if until is None:
+                return True
+            if time.monotonic() < until:
+                return False
+            del _unavailable_until[self.robot_code]
+            return True
+    
+    async def get_summaries(
+        self,
+        chat_room_id: str,
+        bucket_seconds: int,
+        bucket_starts: Sequence[int]
+    ) -> Optional[Dict[int, str]]:
+        """
+        批量查询时间段的摘要
+        
+        缓存表由 wechat-robot-schema-advisor --create-tables 创建，请求中不执行建表语句；
+        表不存在等查询失败时本次不使用缓存，一段时间后再重试
+        
+        Args:
+            chat_room_id: 群聊ID
+            bucket_seconds: 时间段长度(秒)
+            bucket_starts: 时间段开始时间戳列表
+            
+        Returns:
+            时间段开始时间戳到摘要的映射，没有缓存的时间段不包含在内；缓存表不可用时为 None
+        """
+        if not bucket_starts:
+            return {}
+        try:
+            result = await self.db.execute(
+                select(ChatRoomSummaryBucket.bucket_start, ChatRoomSummaryBucket.summary).where(
+                    ChatRoomSummaryBucket.chat_room_id == chat_room_id,
+                    ChatRoomSummaryBucket.bucket_seconds == bucket_seconds,
+                    ChatRoomSummaryBucket.bucket_start.in_(list(bucket_starts))
+                )
+            )
+            return {int(row[0]): row[1] or "" for row in result.all()}
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            with _unavailable_lock:
+                _unavailable_until[self.robot_code] = time.monotonic() + UNAVAILABLE_RETRY_SECONDS
+            logger.warning(
+                f"群聊总结缓存表不可用({self.robot_code})，{UNAVAILABLE_RETRY_SECONDS} 秒内不使用分时段缓存，"
+                f"可以用 wechat-robot-schema-advisor --create-tables 建表: {e}"
+            )
+            return None
+    
+    async def save_summary(
+        self,
+        chat_room_id: str,
+        bucket_seconds: int,
+        bucket_start: int,
+        summary: str,
+        message_count: int,
+        model: Optional[str] = None
+    ) -> bool:
+        """
+        保存一个已结束时间段的摘要，写入失败不影响本次总结
+        
+        Args:
+            chat_room_id: 群聊ID
+            bucket_seconds: 时间段长度(秒)
+            bucket_start: 时间段开始时间戳
+            summary: 话题摘要，没有可总结的消息时为空
+            message_count: 参与总结的消息条数
+            model: 生成摘要使用的AI模型名称
+            
+        Returns:
+            是否保存成功
+        """
+        self.db.add(ChatRoomSummaryBucket(
+            chat_room_id=chat_room_id,
+            bucket_seconds=bucket_seconds,
+            bucket_start=bucket_start,
+            summary=summary,
+            message_count=message_count,
+            model=model or "",
+            created_at=int(time.time()),
+        ))
+        try:
+            await self.db.commit()
+            return True
+        except IntegrityError:
+            # 并发的请求已经保存了同一个时间段
+            await self.db.rollback()
+            return False
+        except Exception as e:
+            await self.db.rollback()
+            logger.warning(f"保存群聊总结缓存失败({self.robot_code}/{chat_room_id}@{bucket_start}): {e}")
+            return False
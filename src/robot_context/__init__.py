@@ -5,8 +5,15 @@ from .context import (
     get_robot_context,
     set_db,
     get_db,
+    set_async_db,
+    get_async_db,
+    release_async_db,
     get_sql_db,
+    set_db_scope,
+    reset_db_scope,
+    get_db_scope,
 )
+from .session_scope import DBSessionScope, SessionLeakDetector, session_leak_detector
 
 __all__ = [
     'RobotContext',
@@ -14,5 +21,14 @@ __all__ = [
     'get_robot_context',
     'set_db',
     'get_db',
+    'set_async_db',
+    'get_async_db',
+    'release_async_db',
     'get_sql_db',
+    'set_db_scope',
+    'reset_db_scope',
+    'get_db_scope',
+    'DBSessionScope',
+    'SessionLeakDetector',
+    'session_leak_detector',
 ]
@@ -3,10 +3,13 @@ Robot Context Module - 机器人上下文管理
 
 使用 contextvars 实现线程安全的上下文传递
 """
-from contextvars import ContextVar
+from contextvars import ContextVar, Token
 from typing import Optional
 from dataclasses import dataclass
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .session_scope import DBSessionScope
 
 
 @dataclass
@@ -30,6 +33,12 @@ _robot_context_var: ContextVar[Optional[RobotContext]] = ContextVar(
 _db_var: ContextVar[Optional[Session]] = ContextVar(
     'robot_db', default=None
 )
+_async_db_var: ContextVar[Optional[AsyncSession]] = ContextVar(
+    'robot_async_db', default=None
+)
+_db_scope_var: ContextVar[Optional[DBSessionScope]] = ContextVar(
+    'robot_db_scope', default=None
+)
 
 
 def set_robot_context(rc: RobotContext) -> None:
@@ -48,8 +57,59 @@ def set_db(db: Session) -> None:
 
 
 def get_db() -> Optional[Session]:
-    """获取数据库会话"""
-    return _db_var.get()
+    """获取数据库会话，存在请求级作用域时首次调用才创建会话"""
+    db = _db_var.get()
+    if db is None:
+        scope = _db_scope_var.get()
+        if scope is not None:
+            db = scope.get_session()
+    return db
+
+
+def set_async_db(db: AsyncSession) -> None:
+    """设置异步数据库会话"""
+    _async_db_var.set(db)
+
+
+def get_async_db() -> Optional[AsyncSession]:
+    """获取异步数据库会话，存在请求级作用域时首次调用才创建会话"""
+    db = _async_db_var.get()
+    if db is None:
+        scope = _db_scope_var.get()
+        if scope is not None:
+            db = scope.get_async_session()
+    return db
+
+
+async def release_async_db() -> None:
+    """
+    提前释放异步数据库会话，连接归还连接池
+
+    用于读完数据后还要长时间等待（例如调用 AI）的请求；之后需要再访问数据库时，
+    重新调用 get_async_db() 获取会话，不要继续使用释放前拿到的会话
+    """
+    db = _async_db_var.get()
+    if db is not None:
+        await db.close()
+        return
+    scope = _db_scope_var.get()
+    if scope is not None:
+        await scope.close()
+
+
+def set_db_scope(scope: Optional[DBSessionScope]) -> Token:
+    """设置请求级数据库会话作用域"""
+    return _db_scope_var.set(scope)
+
+
+def reset_db_scope(token: Token) -> None:
+    """恢复进入作用域之前的数据库会话作用域"""
+    _db_scope_var.reset(token)
+
+
+def get_db_scope() -> Optional[DBSessionScope]:
+    """获取请求级数据库会话作用域"""
+    return _db_scope_var.get()
 
 
 def get_sql_db():
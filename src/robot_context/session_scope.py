@@ -0,0 +1,146 @@
+"""
+Session Scope - 请求级数据库会话作用域
+
+仓库首次访问 get_db()/get_async_db() 时才创建会话并签出连接，
+工具调用结束时统一释放；同时由泄漏检测器记录持有时间过长的会话。
+"""
+import asyncio
+import itertools
+import logging
+import time
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLeakDetector:
+    """定期检查持有时间超过阈值的数据库会话并记录日志"""
+
+    def __init__(self, threshold: float = 60, interval: float = 10):
+        self.threshold = threshold
+        self.interval = interval
+        self._ids = itertools.count(1)
+        self._sessions: Dict[int, "DBSessionScope"] = {}
+        self._reported: Set[int] = set()
+        self._leaks = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, scope: "DBSessionScope") -> int:
+        """登记一个持有会话的作用域，返回登记编号"""
+        scope_id = next(self._ids)
+        self._sessions[scope_id] = scope
+        self._ensure_started()
+        return scope_id
+
+    def unregister(self, scope_id: int) -> None:
+        """会话释放后取消登记"""
+        self._sessions.pop(scope_id, None)
+        self._reported.discard(scope_id)
+
+    def check(self) -> int:
+        """检查一次，返回本次新发现的泄漏数量"""
+        if self.threshold <= 0:
+            return 0
+        now = time.monotonic()
+        found = 0
+        for scope_id, scope in list(self._sessions.items()):
+            if scope_id in self._reported or scope.acquired_at is None:
+                continue
+            held = now - scope.acquired_at
+            if held > self.threshold:
+                self._reported.add(scope_id)
+                self._leaks += 1
+                found += 1
+                logger.warning(
+                    f"数据库会话持有时间过长({scope.label}): 已持有 {held:.1f} 秒，"
+                    f"超过阈值 {self.threshold} 秒，可能存在连接泄漏"
+                )
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        """返回会话泄漏检测的统计信息"""
+        return {
+            "active_sessions": len(self._sessions),
+            "leaks": self._leaks,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._sessions:
+            await asyncio.sleep(self.interval)
+            self.check()
+
+
+class DBSessionScope:
+    """请求级数据库会话：首次访问时创建，close() 时释放"""
+
+    def __init__(
+        self,
+        label: str = "",
+        session_factory: Optional[Callable[[], Session]] = None,
+        async_session_factory: Optional[Callable[[], AsyncSession]] = None,
+        leak_detector: Optional[SessionLeakDetector] = None,
+    ):
+        self.label = label
+        self.acquired_at: Optional[float] = None
+        self._session_factory = session_factory
+        self._async_session_factory = async_session_factory
+        self._leak_detector = leak_detector or session_leak_detector
+        self._session: Optional[Session] = None
+        self._async_session: Optional[AsyncSession] = None
+        self._scope_id: Optional[int] = None
+
+    def get_session(self) -> Optional[Session]:
+        """获取同步会话，首次调用时创建"""
+        if self._session is None and self._session_factory is not None:
+            self._session = self._session_factory()
+            self._mark_acquired()
+        return self._session
+
+    def get_async_session(self) -> Optional[AsyncSession]:
+        """获取异步会话，首次调用时创建"""
+        if self._async_session is None and self._async_session_factory is not None:
+            self._async_session = self._async_session_factory()
+            self._mark_acquired()
+        return self._async_session
+
+    async def close(self) -> None:
+        """释放作用域内创建的所有会话，连接归还连接池"""
+        try:
+            if self._async_session is not None:
+                await self._async_session.close()
+        except Exception as e:
+            logger.error(f"关闭异步数据库会话失败({self.label}): {e}")
+        finally:
+            self._async_session = None
+            try:
+                if self._session is not None:
+                    self._session.close()
+            except Exception as e:
+                logger.error(f"关闭数据库会话失败({self.label}): {e}")
+            finally:
+                self._session = None
+                if self._scope_id is not None:
+                    self._leak_detector.unregister(self._scope_id)
+                    self._scope_id = None
+                self.acquired_at = None
+
+    def _mark_acquired(self) -> None:
+        if self._scope_id is None:
+            self.acquired_at = time.monotonic()
+            self._scope_id = self._leak_detector.register(self)
+
+
+# 全局会话泄漏检测器，load_config 时根据 MYSQL_SESSION_LEAK_THRESHOLD 调整阈值
+session_leak_detector = SessionLeakDetector()
@@ -0,0 +1,13 @@
+"""
+Scheduler - 进程内的定时任务
+"""
+from .cron import CronExpression
+from .scheduler import ScheduledRobot, SummaryScheduler, parse_scheduled_robots, summary_scheduler
+
+__all__ = [
+    'CronExpression',
+    'ScheduledRobot',
+    'SummaryScheduler',
+    'parse_scheduled_robots',
+    'summary_scheduler',
+]
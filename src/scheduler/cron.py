@@ -0,0 +1,117 @@
+"""
+Cron expression - 分钟级的 cron 表达式解析
+
+支持标准的 5 段表达式（分 时 日 月 周），以及带秒的 6 段表达式（秒字段被忽略，按分钟调度）；
+每段支持 *、?、数字、范围 a-b、步长 */n 和 a-b/n、逗号列表，以及 @hourly/@daily 等别名。
+"""
+from datetime import datetime, timedelta
+from typing import FrozenSet, Optional, Tuple
+
+_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# (最小值, 最大值)：分、时、日、月、周（0 和 7 都表示周日）
+_BOUNDS: Tuple[Tuple[int, int], ...] = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# 向前查找上一次触发时间的最大天数
+_MAX_LOOKBACK_DAYS = 366
+
+
+def _parse_field(text: str, low: int, high: int) -> Tuple[FrozenSet[int], bool]:
+    """解析一段表达式，返回 (取值集合, 是否为 *)"""
+    values = set()
+    wildcard = text in ("*", "?")
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"步长必须大于 0: {text}")
+        if part in ("*", "?"):
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"取值超出范围 {low}-{high}: {text}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values), wildcard
+
+
+class CronExpression:
+    """分钟级的 cron 表达式"""
+
+    def __init__(self, expression: str):
+        """
+        解析 cron 表达式
+
+        Args:
+            expression: cron 表达式
+
+        Raises:
+            ValueError: 表达式格式不正确
+        """
+        self.expression = expression.strip()
+        text = _ALIASES.get(self.expression.lower(), self.expression)
+        fields = text.split()
+        if len(fields) == 6:
+            # 带秒的表达式，按分钟调度时忽略秒字段
+            fields = fields[1:]
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式应为 5 段或 6 段: {expression}")
+        try:
+            parsed = [_parse_field(field, low, high) for field, (low, high) in zip(fields, _BOUNDS)]
+        except ValueError as e:
+            raise ValueError(f"无法解析 cron 表达式 {expression}: {e}") from e
+        (self.minutes, _), (self.hours, _), (self.days, days_any), (self.months, _), (weekdays, weekdays_any) = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self._days_any = days_any
+        self._weekdays_any = weekdays_any
+
+    def matches(self, moment: datetime) -> bool:
+        """moment 所在的分钟是否触发"""
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.month in self.months
+            and self._day_matches(moment)
+        )
+
+    def previous(self, moment: datetime) -> Optional[datetime]:
+        """moment 之前（不含 moment 所在分钟）最近一次触发的时间，一年内没有时返回 None"""
+        candidate = moment.replace(second=0, microsecond=0) - timedelta(minutes=1)
+        limit = candidate - timedelta(days=_MAX_LOOKBACK_DAYS)
+        while candidate > limit:
+            # 日期不匹配时直接跳到前一天的最后一分钟，小时不匹配时跳到前一小时的最后一分钟
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=23, minute=59) - timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=59) - timedelta(hours=1)
+            elif candidate.minute in self.minutes:
+                return candidate
+            else:
+                candidate -= timedelta(minutes=1)
+        return None
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        # Python 中周一为 0，cron 中周日为 0
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        # 与标准 cron 一致：日和周都有限制时满足其一即可
+        if self._days_any or self._weekdays_any:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
@@ -0,0 +1,265 @@
+"""
+Summary scheduler - 进程内的群聊总结定时任务
+
+按租户读取全局设置中的 chat_room_summary_cron 和开启了群聊总结的群，cron 触发时为每个群安排一次总结：
+- 每个群有确定性的延迟（按 robot_code/群ID 哈希），同一时刻触发的群被均匀打散到 jitter 秒内
+- 全局并发上限，同时执行的总结不超过 max_concurrency 个
+- 总结的时间范围为距上一次触发的间隔（最多 24 小时）
+
+定时总结需要机器人的微信ID和客户端端口（平时由 MCP 请求的 meta 提供），因此要调度的机器人通过
+SCHEDULER_ROBOTS 显式配置。
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from .cron import CronExpression
+
+logger = logging.getLogger(__name__)
+
+# 单次定时总结的最大时间范围(秒)，与工具的限制一致
+MAX_SUMMARY_DURATION = 24 * 3600
+# 调度循环中断后最多补齐的分钟数
+MAX_CATCH_UP_MINUTES = 5
+
+
+@dataclass(frozen=True)
+class ScheduledRobot:
+    """需要定时总结的机器人"""
+    robot_code: str
+    port: str
+    wx_id: str
+
+
+@dataclass
+class _TenantPlan:
+    robot: ScheduledRobot
+    cron: Optional[CronExpression] = None
+    chat_room_ids: List[str] = field(default_factory=list)
+
+
+def parse_scheduled_robots(text: str) -> List[ScheduledRobot]:
+    """
+    解析 SCHEDULER_ROBOTS 配置
+
+    Args:
+        text: 逗号分隔的 robot_code:port:wx_id 列表
+
+    Returns:
+        机器人列表，格式不正确的项会被忽略并记录日志
+    """
+    robots = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) != 3 or not all(parts):
+            logger.error(f"SCHEDULER_ROBOTS 配置格式应为 robot_code:port:wx_id，已忽略: {item}")
+            continue
+        robots.append(ScheduledRobot(robot_code=parts[0], port=parts[1], wx_id=parts[2]))
+    return robots
+
+
+class SummaryScheduler:
+    """群聊总结定时任务调度器"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        robots: Sequence[ScheduledRobot] = (),
+        max_concurrency: int = 2,
+        jitter: int = 600,
+        refresh_interval: int = 300,
+    ):
+        """
+        初始化调度器
+
+        Args:
+            enabled: 是否启用
+            robots: 需要定时总结的机器人
+            max_concurrency: 同时执行的总结数上限
+            jitter: 同一时刻触发的群最多延迟多久(秒)执行，不超过触发间隔的一半
+            refresh_interval: 多久(秒)重新读取一次各租户的 cron 和群列表
+        """
+        self.enabled = enabled
+        self.robots = list(robots)
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter
+        self.refresh_interval = refresh_interval
+        self._plans: List[_TenantPlan] = []
+        self._task: Optional[asyncio.Task] = None
+        self._runs: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._refreshed_at: Optional[float] = None
+        self._scheduled = 0
+        self._running = 0
+        self._succeeded = 0
+        self._failed = 0
+
+    def start(self) -> None:
+        """启动调度循环，必须在事件循环中调用"""
+        if not self.enabled:
+            return
+        if not self.robots:
+            logger.warning("已开启定时群聊总结，但没有配置 SCHEDULER_ROBOTS")
+            return
+        if self._task is None or self._task.done():
+            self._semaphore = asyncio.Semaphore(max(self.max_concurrency, 1))
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+            logger.info(f"定时群聊总结已启动，机器人 {len(self.robots)} 个，并发上限 {self.max_concurrency}")
+
+    async def aclose(self) -> None:
+        """停止调度循环和尚未完成的总结，服务退出时调用"""
+        tasks = list(self._runs)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def refresh(self) -> None:
+        """重新读取各租户的 cron 和开启了群聊总结的群"""
+        from ..config import config
+        from ..repository.chatroom_settings import AsyncChatRoomSettingsRepository
+        from ..repository.global_settings import AsyncGlobalSettingsRepository
+
+        plans = []
+        for robot in self.robots:
+            plan = _TenantPlan(robot=robot)
+            plans.append(plan)
+            try:
+                session_maker = await config.tenant_db_manager.get_async_session_maker(robot.robot_code)
+                if session_maker is None:
+                    continue
+                async with session_maker() as db:
+                    global_settings = await AsyncGlobalSettingsRepository(db, robot.robot_code).get_global_settings()
+                    cron = getattr(global_settings, "chat_room_summary_cron", None) or ""
+                    if not getattr(global_settings, "chat_room_summary_enabled", False) or not cron.strip():
+                        continue
+                    plan.cron = CronExpression(cron)
+                    plan.chat_room_ids = await AsyncChatRoomSettingsRepository(
+                        db, robot.robot_code
+                    ).list_summary_enabled_chat_room_ids()
+            except Exception as e:
+                logger.error(f"读取定时群聊总结配置失败({robot.robot_code}): {e}")
+        self._plans = plans
+        self._refreshed_at = time.time()
+
+    def tick(self, moment: datetime) -> int:
+        """
+        处理一分钟的触发，为 cron 匹配的租户的每个群安排一次总结
+
+        Args:
+            moment: 触发的分钟
+
+        Returns:
+            安排的总结数
+        """
+        scheduled = 0
+        for plan in self._plans:
+            if plan.cron is None or not plan.chat_room_ids or not plan.cron.matches(moment):
+                continue
+            previous = plan.cron.previous(moment)
+            duration = MAX_SUMMARY_DURATION
+            if previous is not None:
+                duration = min(int((moment - previous).total_seconds()), MAX_SUMMARY_DURATION)
+            window = min(self.jitter, duration // 2)
+            for chat_room_id in plan.chat_room_ids:
+                delay = self.jitter_for(plan.robot.robot_code, chat_room_id, window)
+                # 每个总结在独立的上下文中运行，机器人上下文和数据库会话互不影响
+                # （create_task 的 context 参数需要 Python 3.11，这里在新上下文中创建任务）
+                task = contextvars.Context().run(
+                    asyncio.get_running_loop().create_task,
+                    self._run_room(plan.robot, chat_room_id, duration, delay),
+                )
+                self._runs.add(task)
+                task.add_done_callback(self._runs.discard)
+                scheduled += 1
+        if scheduled:
+            self._scheduled += scheduled
+            logger.info(f"定时群聊总结 {moment.strftime('%Y-%m-%d %H:%M')} 触发，安排 {scheduled} 个群")
+        return scheduled
+
+    @staticmethod
+    def jitter_for(robot_code: str, chat_room_id: str, window: int) -> int:
+        """群的确定性延迟(秒)，同一个群每次触发的延迟相同"""
+        if window <= 0:
+            return 0
+        digest = hashlib.blake2b(f"{robot_code}/{chat_room_id}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % (window + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回调度器的统计信息"""
+        return {
+            "enabled": self.enabled and self._task is not None,
+            "robots": len(self.robots),
+            "tenants_with_cron": sum(1 for plan in self._plans if plan.cron is not None),
+            "chat_rooms": sum(len(plan.chat_room_ids) for plan in self._plans if plan.cron is not None),
+            "max_concurrency": self.max_concurrency,
+            "pending": len(self._runs) - self._running,
+            "running": self._running,
+            "scheduled": self._scheduled,
+            "succeeded": self._succeeded,
+            "failed": self._failed,
+            "refreshed_at": self._refreshed_at,
+        }
+
+    async def _loop(self) -> None:
+        last_minute: Optional[datetime] = None
+        while True:
+            try:
+                if self._refreshed_at is None or time.time() - self._refreshed_at >= self.refresh_interval:
+                    await self.refresh()
+                minute = datetime.now().replace(second=0, microsecond=0)
+                if last_minute is not None:
+                    # 从上次处理的下一分钟开始补齐，启动时所在的分钟不触发
+                    moment = max(last_minute + timedelta(minutes=1), minute - timedelta(minutes=MAX_CATCH_UP_MINUTES - 1))
+                    while moment <= minute:
+                        self.tick(moment)
+                        moment += timedelta(minutes=1)
+                last_minute = minute
+            except Exception as e:
+                logger.error(f"定时群聊总结调度失败: {e}")
+            # 睡到下一分钟开始后 1 秒
+            now = datetime.now()
+            await asyncio.sleep(60 - now.second - now.microsecond / 1e6 + 1)
+
+    async def _run_room(self, robot: ScheduledRobot, chat_room_id: str, duration: int, delay: int) -> None:
+        # 延迟导入：config 加载时会导入调度器，工具模块又依赖 config
+        from ..middleware.tenant import tenant_scope
+        from ..tools.chat_room_summary import chat_room_summary
+
+        await asyncio.sleep(delay)
+        assert self._semaphore is not None
+        async with self._semaphore:
+            self._running += 1
+            try:
+                meta = {
+                    "RobotCode": robot.robot_code,
+                    "RobotWxID": robot.wx_id,
+                    "WeChatClientPort": robot.port,
+                    "FromWxID": chat_room_id,
+                }
+                async with tenant_scope(meta):
+                    result, _, error = await chat_room_summary({"recent_duration": duration})
+                if error or (isinstance(result, dict) and result.get("isError")):
+                    self._failed += 1
+                    logger.warning(f"定时群聊总结未发送({robot.robot_code}/{chat_room_id}): {error or result}")
+                else:
+                    self._succeeded += 1
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"定时群聊总结失败({robot.robot_code}/{chat_room_id}): {e}")
+            finally:
+                self._running -= 1
+
+
+# 全局定时总结调度器，load_config 时根据 SCHEDULER_* 环境变量调整，默认关闭
+summary_scheduler = SummaryScheduler()
@@ -0,0 +1 @@
+"""Schema 工具包初始化文件"""
@@ -0,0 +1,227 @@
+"""
+Schema advisor - 租户库索引检查工具
+
+检查每个租户库是否具备仓库热点查询所需的联合索引，输出缺失索引的 DDL，
+可选择直接执行 DDL，或为新租户/本地替身库按模型建表。
+
+用法：
+    wechat-robot-schema-advisor --robot-code robot_a --robot-code robot_b
+    wechat-robot-schema-advisor --all --apply
+    wechat-robot-schema-advisor --dsn "sqlite:///./data/{robot_code}.db" --robot-code test --create-tables
+"""
+import argparse
+import logging
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import Engine, create_engine, inspect, text
+from sqlalchemy.pool import NullPool
+
+from ..config import config
+from ..model import chat_room_member, chatroom_settings, contact, global_settings, message, summary_bucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexAdvice:
+    """热点查询需要的索引"""
+    table: str
+    columns: Tuple[str, ...]
+    name: str
+    reason: str
+
+
+@dataclass
+class IndexFinding:
+    """单个索引的检查结果"""
+    advice: IndexAdvice
+    # ok: 已有索引覆盖；missing: 缺少索引；no_table: 表不存在
+    status: str
+    covered_by: Optional[str] = None
+
+
+# 与模型中声明的联合索引保持一致
+HOT_QUERY_INDEXES: List[IndexAdvice] = [
+    IndexAdvice(
+        table="messages",
+        columns=("from_wxid", "created_at"),
+        name="idx_from_wxid_created_at",
+        reason="群聊总结按群和时间范围查询消息",
+    ),
+    IndexAdvice(
+        table="chat_room_members",
+        columns=("chat_room_id", "wechat_id"),
+        name="idx_chat_room_id_wechat_id",
+        reason="按群批量查询发送者显示名称",
+    ),
+    IndexAdvice(
+        table="chat_room_settings",
+        columns=("chat_room_id",),
+        name="idx_chat_room_id",
+        reason="按群查询群聊设置",
+    ),
+]
+
+# 各模型模块的 Base，--create-tables 时按模型建表
+_MODEL_BASES = [
+    message.Base,
+    chat_room_member.Base,
+    chatroom_settings.Base,
+    contact.Base,
+    global_settings.Base,
+    summary_bucket.Base,
+]
+
+
+def check_indexes(engine: Engine, advices: Sequence[IndexAdvice] = HOT_QUERY_INDEXES) -> List[IndexFinding]:
+    """
+    检查租户库的索引，已有索引的前缀列与建议的列一致即视为覆盖
+
+    Args:
+        engine: 租户库引擎
+        advices: 需要检查的索引
+
+    Returns:
+        每个索引的检查结果
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    findings = []
+    for advice in advices:
+        if advice.table not in tables:
+            findings.append(IndexFinding(advice, "no_table"))
+            continue
+        existing = [
+            (index.get("name") or "", tuple(index.get("column_names") or ()))
+            for index in inspector.get_indexes(advice.table)
+        ]
+        primary_key = inspector.get_pk_constraint(advice.table)
+        existing.append(("PRIMARY", tuple(primary_key.get("constrained_columns") or ())))
+
+        covered_by = next(
+            (name for name, columns in existing if columns[:len(advice.columns)] == advice.columns),
+            None,
+        )
+        findings.append(IndexFinding(advice, "ok" if covered_by else "missing", covered_by))
+    return findings
+
+
+def index_ddl(engine: Engine, advice: IndexAdvice) -> str:
+    """生成创建索引的 DDL，按目标数据库的规则引用标识符"""
+    quote = engine.dialect.identifier_preparer.quote
+    columns = ", ".join(quote(column) for column in advice.columns)
+    return f"CREATE INDEX {quote(advice.name)} ON {quote(advice.table)} ({columns})"
+
+
+def apply_indexes(engine: Engine, findings: Sequence[IndexFinding]) -> List[str]:
+    """
+    为缺失的索引执行 DDL
+
+    Args:
+        engine: 租户库引擎
+        findings: check_indexes 的检查结果
+
+    Returns:
+        已执行的 DDL 列表
+    """
+    executed = []
+    for finding in findings:
+        if finding.status != "missing":
+            continue
+        ddl = index_ddl(engine, finding.advice)
+        with engine.begin() as conn:
+            conn.execute(text(ddl))
+        executed.append(ddl)
+    return executed
+
+
+def create_tables(engine: Engine) -> None:
+    """按模型创建不存在的表（含模型中声明的索引），已存在的表不做修改"""
+    for base in _MODEL_BASES:
+        base.metadata.create_all(engine, checkfirst=True)
+
+
+def list_tenant_schemas(engine: Engine) -> List[str]:
+    """列出 MySQL 主机上包含 messages 表的库名，即所有租户的 RobotCode"""
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT DISTINCT table_schema FROM information_schema.tables "
+            "WHERE table_name = 'messages' ORDER BY table_schema"
+        ))
+        return [str(row[0]) for row in rows]
+
+
+def _report(robot_code: str, engine: Engine, findings: Sequence[IndexFinding]) -> None:
+    print(f"[{robot_code}]")
+    for finding in findings:
+        advice = finding.advice
+        target = f"{advice.table}({', '.join(advice.columns)})"
+        if finding.status == "ok":
+            print(f"  ✓ {target} 已由索引 {finding.covered_by} 覆盖")
+        elif finding.status == "no_table":
+            print(f"  - {target} 表不存在，跳过")
+        else:
+            print(f"  ✗ {target} 缺少索引：{advice.reason}")
+            print(f"    {index_ddl(engine, advice)};")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """命令行入口，仍有缺失索引时返回 1"""
+    parser = argparse.ArgumentParser(
+        prog="wechat-robot-schema-advisor", description="检查租户库热点查询所需的索引"
+    )
+    parser.add_argument("--robot-code", action="append", default=[], help="要检查的 RobotCode，可重复指定")
+    parser.add_argument("--all", action="store_true", help="检查 MySQL 主机上的所有租户库")
+    parser.add_argument(
+        "--dsn",
+        help="租户库 DSN 模板，{robot_code} 会被替换，例如 sqlite:///./data/{robot_code}.db；默认使用 MYSQL_* 配置",
+    )
+    parser.add_argument("--apply", action="store_true", help="直接执行缺失索引的 DDL")
+    parser.add_argument("--create-tables", action="store_true", help="按模型创建不存在的表")
+    args = parser.parse_args(argv)
+
+    if args.dsn:
+        if args.all:
+            parser.error("--all 只能与 MySQL 配置一起使用")
+        dsn_template: str = args.dsn
+        build_dsn = lambda robot_code: dsn_template.format(robot_code=robot_code)  # noqa: E731
+    else:
+        config.load_config()
+        build_dsn = config.tenant_db_manager._build_dsn_for_robot
+
+    robot_codes: List[str] = list(args.robot_code)
+    if args.all:
+        host_engine = create_engine(config.tenant_db_manager._build_host_dsn_for_robot(""), poolclass=NullPool)
+        try:
+            robot_codes.extend(code for code in list_tenant_schemas(host_engine) if code not in robot_codes)
+        finally:
+            host_engine.dispose()
+    if not robot_codes:
+        parser.error("请通过 --robot-code 或 --all 指定要检查的租户")
+
+    missing = 0
+    for robot_code in robot_codes:
+        engine = create_engine(build_dsn(robot_code), poolclass=NullPool)
+        try:
+            if args.create_tables:
+                create_tables(engine)
+            findings = check_indexes(engine)
+            _report(robot_code, engine, findings)
+            if args.apply:
+                for ddl in apply_indexes(engine, findings):
+                    print(f"  已执行: {ddl}")
+                findings = check_indexes(engine)
+            missing += sum(1 for finding in findings if finding.status == "missing")
+        except Exception as e:
+            logger.error(f"检查租户 {robot_code} 的索引失败: {e}")
+            missing += 1
+        finally:
+            engine.dispose()
+
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
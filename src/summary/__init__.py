@@ -0,0 +1,30 @@
+"""群聊总结包初始化文件"""
+
+from .buckets import (
+    Segment,
+    compose_report,
+    plan_segments,
+    prefer_segments,
+    summarize_segment,
+    summarize_segments,
+)
+from .map_reduce import SummaryError, complete, split_chunks, summarize_transcript
+from .transcript import Transcript, TranscriptBuilder, TranscriptStats, build_transcript, estimate_tokens
+
+__all__ = [
+    "SummaryError",
+    "complete",
+    "split_chunks",
+    "summarize_transcript",
+    "Transcript",
+    "TranscriptBuilder",
+    "TranscriptStats",
+    "build_transcript",
+    "estimate_tokens",
+    "Segment",
+    "compose_report",
+    "plan_segments",
+    "prefer_segments",
+    "summarize_segment",
+    "summarize_segments",
+]
@@ -0,0 +1,217 @@
+"""
+Summary buckets - 按时间段增量总结
+
+把总结窗口按 summary_settings.bucket_seconds 对齐切分：
+已结束的完整时间段只总结一次并缓存到租户库，窗口开头不完整的部分和仍在进行中的
+最后一段每次重新总结，最后把各段摘要按时间顺序合并成报告。
+"最近1小时"、"最近6小时"、"今天" 这类重叠的请求大部分时间段都能直接命中缓存。
+"""
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple, Union
+
+from openai import AsyncOpenAI
+
+from ..config.config import summary_settings
+from .map_reduce import SummaryError, complete, split_chunks
+from .prompts import CHUNK_PROMPT, REDUCE_PROMPT
+from .transcript import Transcript
+
+# 时间段结束后再等待多久(秒)才视为已结束，给延迟入库的消息留出时间
+SETTLE_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class Segment:
+    """总结窗口中的一段，时间范围为 [start, end)"""
+    start: int
+    end: int
+    # 完整且已结束的时间段，摘要可以缓存
+    cacheable: bool
+
+    def label(self) -> str:
+        """时间段的中文标签，例如 05-20 14:00-15:00"""
+        start = datetime.fromtimestamp(self.start)
+        end = datetime.fromtimestamp(self.end)
+        return f"{start.strftime('%m-%d %H:%M')}-{end.strftime('%H:%M')}"
+
+
+def plan_segments(
+    start_ts: int,
+    end_ts: int,
+    bucket_seconds: int,
+    settle_seconds: int = SETTLE_SECONDS
+) -> List[Segment]:
+    """
+    把总结窗口切分成按时间段对齐的若干段
+
+    Args:
+        start_ts: 窗口开始时间戳
+        end_ts: 窗口结束时间戳（通常是当前时间）
+        bucket_seconds: 时间段长度(秒)，<= 0 时整个窗口为一段
+        settle_seconds: 时间段结束后多久才可以缓存
+
+    Returns:
+        按时间排序的各段
+    """
+    if bucket_seconds <= 0 or end_ts <= start_ts:
+        return [Segment(start_ts, end_ts, False)]
+
+    segments: List[Segment] = []
+    bucket = -(-start_ts // bucket_seconds) * bucket_seconds
+    if bucket > start_ts:
+        segments.append(Segment(start_ts, min(bucket, end_ts), False))
+    while bucket + bucket_seconds + settle_seconds <= end_ts:
+        segments.append(Segment(bucket, bucket + bucket_seconds, True))
+        bucket += bucket_seconds
+    if bucket < end_ts:
+        segments.append(Segment(bucket, end_ts, False))
+    return segments
+
+
+def count_report_calls(lines: Sequence[str], chunk_chars: int) -> int:
+    """整段总结（summarize_transcript）需要调用模型的次数"""
+    total_chars = sum(len(line) + 1 for line in lines)
+    if chunk_chars <= 0 or total_chars <= chunk_chars:
+        return 1
+    return len(split_chunks(lines, chunk_chars)) + 1
+
+
+def count_segment_calls(pending: Sequence[Tuple[Segment, Transcript]], chunk_chars: int) -> int:
+    """按时间段增量总结需要调用模型的次数：每段的提取次数加上最后合并的一次"""
+    calls = 1
+    for _, transcript in pending:
+        if transcript.lines:
+            calls += len(split_chunks(transcript.lines, chunk_chars)) if chunk_chars > 0 else 1
+    return calls
+
+
+def prefer_segments(
+    segments: Sequence[Segment],
+    cached: int,
+    transcript: Transcript,
+    pending: Sequence[Tuple[Segment, Transcript]],
+    min_cached_percent: int
+) -> bool:
+    """
+    判断是否按时间段增量总结，否则整段总结一次
+
+    命中缓存的时间段占比达到 min_cached_percent 时使用缓存。缓存不足时，只有聊天记录很长、整段总结本来
+    也要分段，并且逐段总结每段最多多调用一次模型时才逐段总结，顺便把已结束的时间段写入缓存
+
+    Args:
+        segments: 窗口的所有时间段
+        cached: 命中缓存的时间段数
+        transcript: 整个窗口的聊天记录
+        pending: 没有缓存的时间段及其聊天记录
+        min_cached_percent: 使用缓存所需的命中比例(%)
+
+    Returns:
+        是否按时间段增量总结
+    """
+    if not any(segment.cacheable for segment in segments):
+        return False
+    if cached and cached * 100 >= len(segments) * min_cached_percent:
+        return True
+    chunk_chars = summary_settings.chunk_chars
+    report_calls = count_report_calls(transcript.lines, chunk_chars)
+    if report_calls == 1:
+        return False
+    return count_segment_calls(pending, chunk_chars) <= report_calls + len(pending)
+
+
+async def summarize_segment(
+    client: AsyncOpenAI,
+    model: str,
+    chat_room_name: str,
+    segment: Segment,
+    transcript: Transcript
+) -> str:
+    """
+    提取一段聊天记录中的话题，记录过长时分成多次提取后拼接
+
+    Args:
+        client: AI 客户端
+        model: 模型名称
+        chat_room_name: 群名称
+        segment: 时间段
+        transcript: 时间段内的聊天记录
+
+    Returns:
+        话题摘要，没有可总结的聊天记录时为空
+    """
+    if not transcript.lines:
+        return ""
+    header = f"群名称: {chat_room_name}\n{transcript.preamble}\n"
+    chunk_chars = summary_settings.chunk_chars
+    chunks = split_chunks(transcript.lines, chunk_chars) if chunk_chars > 0 else [list(transcript.lines)]
+    partials = []
+    for index, chunk in enumerate(chunks):
+        part = f"（第 {index + 1}/{len(chunks)} 部分）" if len(chunks) > 1 else ""
+        partials.append(await complete(
+            client, model, CHUNK_PROMPT,
+            header + f"{segment.label()} 的聊天记录{part}如下:\n" + "\n".join(chunk),
+            summary_settings.chunk_max_tokens
+        ))
+    return "\n".join(partials)
+
+
+async def summarize_segments(
+    client: AsyncOpenAI,
+    model: str,
+    chat_room_name: str,
+    pending: Sequence[Tuple[Segment, Transcript]],
+    max_parallel: Optional[int] = None
+) -> List[Union[str, BaseException]]:
+    """
+    以有限的并行度总结多个时间段
+
+    某一段失败时不取消其余的段，已成功的摘要仍可以缓存，由调用方处理失败的段
+
+    Returns:
+        与 pending 一一对应的摘要或异常
+    """
+    if max_parallel is None:
+        max_parallel = summary_settings.max_parallel
+    semaphore = asyncio.Semaphore(max(max_parallel, 1))
+
+    async def run(segment: Segment, transcript: Transcript) -> str:
+        async with semaphore:
+            return await summarize_segment(client, model, chat_room_name, segment, transcript)
+
+    return list(await asyncio.gather(
+        *(run(segment, transcript) for segment, transcript in pending),
+        return_exceptions=True
+    ))
+
+
+async def compose_report(
+    client: AsyncOpenAI,
+    model: str,
+    chat_room_name: str,
+    parts: Sequence[Tuple[Segment, str]]
+) -> str:
+    """
+    把按时间排序的各段摘要合并成最终报告
+
+    Args:
+        client: AI 客户端
+        model: 模型名称
+        chat_room_name: 群名称
+        parts: (时间段, 摘要)，空摘要会被跳过
+
+    Returns:
+        群聊报告
+
+    Raises:
+        SummaryError: 所有时间段都没有可总结的聊天记录
+    """
+    digest = "\n\n".join(f"【{segment.label()}】\n{summary}" for segment, summary in parts if summary)
+    if not digest:
+        raise SummaryError("没有可总结的聊天记录")
+    return await complete(
+        client, model, REDUCE_PROMPT,
+        f"群名称: {chat_room_name}\n各时间段的话题摘要如下（按时间顺序）:\n\n" + digest,
+        summary_settings.max_tokens
+    )
@@ -0,0 +1,167 @@
+"""
+Map-reduce summary - 分段并行的群聊总结
+
+聊天记录较短时直接调用一次模型生成报告；超过 summary_settings.chunk_chars 时
+按时间顺序切分成连续的若干段，以有限的并行度分别提取每段的话题（map），
+再调用一次模型把各段摘要合并成最终报告（reduce），
+耗时取决于每段的长度而不是聊天记录的总量。
+"""
+import asyncio
+import logging
+from typing import Awaitable, List, Optional, Sequence
+
+from openai import AsyncOpenAI, RateLimitError
+
+from ..config.config import summary_settings
+from ..llm.rate_limiter import RateLimitTimeout, llm_rate_limiter
+from .prompts import CHUNK_PROMPT, REDUCE_PROMPT, REPORT_PROMPT
+from .transcript import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryError(Exception):
+    """AI 总结失败"""
+
+
+def split_chunks(lines: Sequence[str], max_chars: int) -> List[List[str]]:
+    """
+    按顺序把聊天记录切分成字符数不超过 max_chars 的连续段
+
+    Args:
+        lines: 按时间排序的聊天记录行
+        max_chars: 每段的最大字符数，单行超过时独占一段
+
+    Returns:
+        切分后的各段
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        line_size = len(line) + 1
+        if current and size + line_size > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += line_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def complete(
+    client: AsyncOpenAI,
+    model: str,
+    system_prompt: str,
+    user_content: str,
+    max_tokens: int
+) -> str:
+    """
+    调用一次模型，返回文本内容
+
+    调用前按估算的 token 数向上游限流器申请额度，额度不足时排队等待
+
+    Raises:
+        SummaryError: 排队等待额度超时，或模型返回了空内容
+    """
+    base_url, api_key = str(client.base_url), client.api_key
+    try:
+        await llm_rate_limiter.acquire(
+            base_url, api_key,
+            estimate_tokens(system_prompt) + estimate_tokens(user_content) + max_tokens
+        )
+    except RateLimitTimeout as e:
+        raise SummaryError(f"AI 服务繁忙，{e}") from e
+    try:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            stream=False,
+            max_tokens=max_tokens
+        )
+    except RateLimitError:
+        # SDK 重试后仍然 429：清空该上游的请求额度，让后续请求排队
+        llm_rate_limiter.penalize(base_url, api_key)
+        raise
+    if not response.choices or not response.choices[0].message.content:
+        raise SummaryError("AI 总结失败，返回了空内容")
+    return response.choices[0].message.content
+
+
+async def summarize_transcript(
+    client: AsyncOpenAI,
+    model: str,
+    chat_room_name: str,
+    lines: Sequence[str],
+    chunk_chars: Optional[int] = None,
+    max_parallel: Optional[int] = None,
+    preamble: str = ""
+) -> str:
+    """
+    总结聊天记录，记录过长时分段并行总结后合并
+
+    Args:
+        client: AI 客户端
+        model: 模型名称
+        chat_room_name: 群名称
+        lines: 按时间排序的聊天记录行
+        chunk_chars: 分段阈值(字符)，默认使用 summary_settings.chunk_chars，<= 0 表示不分段
+        max_parallel: 并行总结的段数，默认使用 summary_settings.max_parallel
+        preamble: 聊天记录的补充说明（时间格式、抽样情况等）
+
+    Returns:
+        群聊报告
+    """
+    if chunk_chars is None:
+        chunk_chars = summary_settings.chunk_chars
+    if max_parallel is None:
+        max_parallel = summary_settings.max_parallel
+
+    header = f"群名称: {chat_room_name}\n"
+    if preamble:
+        header += f"{preamble}\n"
+    total_chars = sum(len(line) + 1 for line in lines)
+    if chunk_chars <= 0 or total_chars <= chunk_chars:
+        return await complete(
+            client, model, REPORT_PROMPT,
+            header + "聊天记录如下:\n" + "\n".join(lines),
+            summary_settings.max_tokens
+        )
+
+    chunks = split_chunks(lines, chunk_chars)
+    logger.info(f"聊天记录共 {total_chars} 字符，分 {len(chunks)} 段总结，并行度 {max_parallel}")
+
+    semaphore = asyncio.Semaphore(max(max_parallel, 1))
+
+    async def summarize_chunk(index: int, chunk: List[str]) -> str:
+        async with semaphore:
+            return await complete(
+                client, model, CHUNK_PROMPT,
+                header + f"第 {index + 1}/{len(chunks)} 段聊天记录如下:\n" + "\n".join(chunk),
+                summary_settings.chunk_max_tokens
+            )
+
+    partials = await _gather_or_cancel([summarize_chunk(i, chunk) for i, chunk in enumerate(chunks)])
+
+    digest = "\n\n".join(f"【第 {i + 1} 段】\n{partial}" for i, partial in enumerate(partials))
+    return await complete(
+        client, model, REDUCE_PROMPT,
+        header + "各时间段的话题摘要如下（按时间顺序）:\n\n" + digest,
+        summary_settings.max_tokens
+    )
+
+
+async def _gather_or_cancel(coros: List[Awaitable[str]]) -> List[str]:
+    """并发执行，任意一段失败时取消其余的段并抛出异常"""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
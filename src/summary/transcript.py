@@ -0,0 +1,213 @@
+"""
+Transcript builder - 按 token 预算构建群聊总结的聊天记录
+
+- 时间只保留时:分（日期在开头说明，跨天时插入日期分隔行）
+- 去掉逐行的 JSON 引号和 --end-- 标记
+- 同一个人短时间内的连续发言合并成一行
+- 丢弃空消息和只有表情的消息
+- 超出 token 预算时按时间均匀抽样
+并统计每一步去掉了多少内容。
+"""
+import re
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from ..repository.message import TextMessageItem
+
+# 同一个人的连续发言间隔不超过该值(秒)时合并为一行
+MERGE_GAP_SECONDS = 300
+# 合并发言之间的分隔符
+MERGE_SEPARATOR = " ｜ "
+
+# 只包含微信表情（如 [捂脸][旺柴]）的消息
+_STICKER_ONLY_RE = re.compile(r"^(?:\s*\[[^\[\]\s]{1,8}\])+\s*$")
+# 中日韩文字及全角标点，按 1 个 token 估算
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数：中文按每字 1 个，其余按每 4 个字符 1 个"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@dataclass
+class TranscriptStats:
+    """构建聊天记录时每一步的统计"""
+    messages: int = 0          # 输入的消息条数
+    dropped_empty: int = 0     # 丢弃的空消息
+    dropped_stickers: int = 0  # 丢弃的纯表情消息
+    merged: int = 0            # 合并到上一行的消息
+    sampled_out: int = 0       # 超出预算被抽样去掉的行
+    lines: int = 0             # 输出的发言行数（不含日期分隔行）
+    tokens: int = 0            # 输出的估算 token 数
+    budget: int = 0            # token 预算，0 表示不限制
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return asdict(self)
+
+    def describe(self) -> str:
+        """一行中文描述，用于日志"""
+        return (
+            f"消息 {self.messages} 条 -> {self.lines} 行，约 {self.tokens} tokens"
+            f"（预算 {self.budget or '不限'}）；去掉空消息 {self.dropped_empty} 条、"
+            f"纯表情 {self.dropped_stickers} 条，合并连续发言 {self.merged} 条，"
+            f"抽样去掉 {self.sampled_out} 行"
+        )
+
+
+@dataclass
+class Transcript:
+    """构建好的聊天记录"""
+    preamble: str
+    lines: List[str]
+    stats: TranscriptStats = field(default_factory=TranscriptStats)
+
+
+class TranscriptBuilder:
+    """
+    按批累积消息并构建聊天记录
+
+    每批消息在 add() 时就精简成发言行（合并连续发言、丢弃空消息和纯表情），之后不再持有消息对象，
+    因此按批流式读取时内存占用只与精简后的聊天记录有关。发送者先按消息中的昵称（流式读取时为微信ID）记录，
+    构建时再替换成显示名称。
+    """
+
+    def __init__(self, window_start: int, token_budget: int = 0):
+        """
+        初始化
+
+        Args:
+            window_start: 时间窗口的开始时间戳
+            token_budget: 聊天记录的 token 预算，<= 0 表示不限制
+        """
+        self.window_start = window_start
+        self.stats = TranscriptStats(budget=max(token_budget, 0))
+        # (时间戳, 发送者, 内容列表)
+        self._entries: List[Tuple[int, str, List[str]]] = []
+        self._last_at: Optional[int] = None
+
+    @property
+    def senders(self) -> Set[str]:
+        """已累积的发言行的发送者"""
+        return {sender for _, sender, _ in self._entries}
+
+    def add(self, messages: Iterable[TextMessageItem]) -> None:
+        """
+        追加一批按时间排序的消息
+
+        Args:
+            messages: 消息，晚于之前追加的消息
+        """
+        entries = self._entries
+        for message in messages:
+            self.stats.messages += 1
+            content = " ".join(message.message.split())
+            if not content:
+                self.stats.dropped_empty += 1
+                continue
+            if _STICKER_ONLY_RE.match(content):
+                self.stats.dropped_stickers += 1
+                continue
+            created_at = int(message.created_at)
+            if (
+                entries and self._last_at is not None
+                and entries[-1][1] == message.nickname
+                and created_at - self._last_at <= MERGE_GAP_SECONDS
+            ):
+                entries[-1][2].append(content)
+                self.stats.merged += 1
+            else:
+                entries.append((created_at, message.nickname, [content]))
+            self._last_at = created_at
+
+    def build(self, display_names: Optional[Dict[str, str]] = None, token_budget: Optional[int] = None) -> Transcript:
+        """
+        构建聊天记录
+
+        Args:
+            display_names: 发送者到显示名称的映射，缺失的发送者保持原样
+            token_budget: 覆盖初始化时的 token 预算，<= 0 表示不限制
+
+        Returns:
+            聊天记录（说明、行列表和统计）
+        """
+        stats = self.stats
+        if token_budget is not None:
+            stats.budget = max(token_budget, 0)
+        names = display_names or {}
+        entries = self._entries
+
+        # 先对发言行抽样，再插入日期分隔行，避免分隔行被抽掉
+        lines = [
+            f"[{datetime.fromtimestamp(created_at).strftime('%H:%M')}] "
+            f"{names.get(sender) or sender}: {MERGE_SEPARATOR.join(contents)}"
+            for created_at, sender, contents in entries
+        ]
+        tokens = [estimate_tokens(line) for line in lines]
+        keep = list(range(len(lines)))
+        stats.sampled_out = 0
+        if stats.budget and sum(tokens) > stats.budget:
+            keep = _sample_evenly(tokens, stats.budget)
+            stats.sampled_out = len(lines) - len(keep)
+
+        lines = _with_day_separators([entries[i][0] for i in keep], [lines[i] for i in keep], self.window_start)
+        stats.lines = len(keep)
+        stats.tokens = sum(estimate_tokens(line) for line in lines)
+
+        start = datetime.fromtimestamp(self.window_start)
+        preamble = (
+            f"聊天记录从 {start.strftime('%Y-%m-%d %H:%M')} 开始，每行时间为时:分，跨天时有日期分隔行"
+        )
+        if stats.sampled_out:
+            preamble += f"；聊天记录较多，已按时间均匀抽样保留 {stats.lines}/{stats.lines + stats.sampled_out} 行"
+        return Transcript(preamble=preamble, lines=lines, stats=replace(stats))
+
+
+def build_transcript(
+    messages: Sequence[TextMessageItem],
+    window_start: int,
+    token_budget: int = 0
+) -> Transcript:
+    """
+    构建聊天记录
+
+    Args:
+        messages: 按时间排序的消息
+        window_start: 时间窗口的开始时间戳
+        token_budget: 聊天记录的 token 预算，<= 0 表示不限制
+
+    Returns:
+        聊天记录（说明、行列表和统计）
+    """
+    builder = TranscriptBuilder(window_start, token_budget)
+    builder.add(messages)
+    return builder.build()
+
+
+def _with_day_separators(timestamps: List[int], lines: List[str], window_start: int) -> List[str]:
+    """跨天时在发言行之间插入日期分隔行"""
+    result: List[str] = []
+    current_day = datetime.fromtimestamp(window_start).date()
+    for created_at, line in zip(timestamps, lines):
+        day = datetime.fromtimestamp(created_at).date()
+        if day != current_day:
+            current_day = day
+            result.append(f"--- {day.strftime('%m-%d')} ---")
+        result.append(line)
+    return result
+
+
+def _sample_evenly(tokens: List[int], budget: int) -> List[int]:
+    """按时间均匀选取若干行，使估算 token 数不超过预算，返回保留行的下标"""
+    count = len(tokens)
+    total = sum(tokens)
+    target = max(1, count * budget // max(total, 1))
+    while target > 0:
+        keep = sorted({i * count // target for i in range(target)})
+        if sum(tokens[i] for i in keep) <= budget:
+            return keep
+        target = target * 9 // 10
+    return []
@@ -5,20 +5,39 @@ Chat Room Summary Tool - 群聊总结工具
 """
 
 import logging
-from typing import Dict, Any, Optional, Tuple
+from bisect import bisect_right
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
-import httpx
-from openai import OpenAI
-
-from ..robot_context.context import get_robot_context, get_db
-from ..repository.global_settings import GlobalSettingsRepository
-from ..repository.chatroom_settings import ChatRoomSettingsRepository
-from ..repository.contact import ContactRepository
-from ..repository.message import MessageRepository
+
+from openai import AsyncOpenAI
+
+from ..robot_context.context import RobotContext, get_robot_context, get_async_db, release_async_db
+from ..repository.global_settings import AsyncGlobalSettingsRepository
+from ..repository.chatroom_settings import AsyncChatRoomSettingsRepository
+from ..repository.contact import AsyncContactRepository
+from ..repository.message import AsyncMessageRepository
+from ..repository.summary_bucket import AsyncSummaryBucketRepository
+from ..llm.client_registry import openai_client_registry
+from ..config.config import summary_settings
+from ..summary.map_reduce import SummaryError, summarize_transcript
+from ..summary.buckets import Segment, compose_report, plan_segments, prefer_segments, summarize_segments
+from ..summary.transcript import Transcript, TranscriptBuilder
 from ..utils.utils import normalize_ai_base_url, call_tool_result_error
+from ..utils.robot_client import robot_client
+from ..utils.singleflight import COOLDOWN, LEADER, summary_flight
 
 logger = logging.getLogger(__name__)
 
+# 需要总结的最少消息条数
+MIN_SUMMARY_MESSAGES = 100
+# 合并相同请求时时间范围的分档(秒)
+COALESCE_DURATION_SECONDS = 1800
+# 进度的总步数：读取聊天记录、AI 总结、发送、完成
+SUMMARY_PROGRESS_TOTAL = 4
+
+# 进度回调，参数为 (当前步骤, 说明)
+ProgressCallback = Callable[[int, str], Awaitable[None]]
+
 
 class ChatRoomSummaryInput:
     """群聊总结输入参数"""
@@ -34,44 +53,69 @@ class ChatRoomSummaryInput:
 
 
 async def chat_room_summary(
-    params: Dict[str, Any]
+    params: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None
 ) -> Tuple[Dict[str, Any], Any, Optional[Exception]]:
     """
     群聊总结工具
     
+    同一个群并发的相同请求只执行一次，其余请求等待结果；发送成功后的冷却时间内不再重复总结
+    
     Args:
         params: 参数字典，包含 recent_duration
+        progress: 进度回调，参数为 (当前步骤, 说明)，共 SUMMARY_PROGRESS_TOTAL 步
         
     Returns:
         包含结果的元组 (result, data, error)
     """
+    # 解析参数
+    recent_duration = params.get('recent_duration', 0)
+    if not recent_duration or recent_duration <= 0:
+        return call_tool_result_error("请指定有效的时间范围(秒)")
+    
+    if recent_duration > 24 * 3600:
+        return call_tool_result_error("最多只能总结最近24小时内的聊天记录")
+    
+    # 获取机器人上下文
+    rc = get_robot_context()
+    if rc is None:
+        return call_tool_result_error("获取机器人上下文失败")
+    
+    # 时间范围按档合并，例如 "最近1小时" 和 "最近50分钟" 视为相同的请求
+    duration_bucket = -(-recent_duration // COALESCE_DURATION_SECONDS)
+    key = (rc.robot_code, rc.from_wx_id, duration_bucket)
+    result, role = await summary_flight.do(
+        key,
+        lambda: _summarize_and_send(rc, recent_duration, progress),
+        reusable=lambda r: not r[0].get("isError")
+    )
+    if role == LEADER or result[0].get("isError"):
+        return result
+    if role == COOLDOWN:
+        return _text_result("最近已经发送过这个时间范围的聊天总结，请查看群里的消息")
+    return _text_result("聊天总结发送成功（与同时发起的相同请求合并）")
+
+
+async def _summarize_and_send(
+    rc: RobotContext,
+    recent_duration: int,
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[Dict[str, Any], Any, Optional[Exception]]:
+    """读取聊天记录、调用AI总结并发送到群里"""
     try:
-        # 解析参数
-        recent_duration = params.get('recent_duration', 0)
-        if not recent_duration or recent_duration <= 0:
-            return call_tool_result_error("请指定有效的时间范围(秒)")
-        
-        if recent_duration > 24 * 3600:
-            return call_tool_result_error("最多只能总结最近24小时内的聊天记录")
-        
-        # 获取机器人上下文
-        rc = get_robot_context()
-        if rc is None:
-            return call_tool_result_error("获取机器人上下文失败")
-        
         # 获取数据库连接
-        db = get_db()
+        db = get_async_db()
         if db is None:
             return call_tool_result_error("获取数据库连接失败")
         
         # 创建仓库实例
-        global_settings_repo = GlobalSettingsRepository(db)
-        chatroom_settings_repo = ChatRoomSettingsRepository(db)
-        contact_repo = ContactRepository(db)
-        message_repo = MessageRepository(db)
+        global_settings_repo = AsyncGlobalSettingsRepository(db, rc.robot_code)
+        chatroom_settings_repo = AsyncChatRoomSettingsRepository(db, rc.robot_code)
+        contact_repo = AsyncContactRepository(db)
+        message_repo = AsyncMessageRepository(db, rc.robot_code)
         
         # 获取全局设置
-        global_settings = global_settings_repo.get_global_settings()
+        global_settings = await global_settings_repo.get_global_settings()
         if global_settings is None:
             return call_tool_result_error("获取全局设置失败")
         
@@ -83,7 +127,7 @@ async def chat_room_summary(
             return call_tool_result_error("全局配置群聊总结未开启")
         
         # 获取群聊设置
-        chatroom_settings = chatroom_settings_repo.get_chatroom_settings(rc.from_wx_id)
+        chatroom_settings = await chatroom_settings_repo.get_chatroom_settings(rc.from_wx_id)
         if chatroom_settings is None:
             return call_tool_result_error("获取群聊设置失败")
         
@@ -91,58 +135,27 @@ async def chat_room_summary(
         if not chat_room_summary_enabled:
             return call_tool_result_error("群聊总结未开启")
         
-        # 获取群聊名称
-        chat_room_name = rc.from_wx_id
-        chat_room = contact_repo.get_contact_by_wechat_id(rc.from_wx_id)
-        if chat_room:
-            nickname = getattr(chat_room, 'nickname', None)
-            if nickname:
-                chat_room_name = nickname
-        
-        # 获取聊天记录
+        # 先用一条计数查询判断消息是否足够，冷清的群不再读取整个时间窗口
         end_time = datetime.now()
         start_time = end_time - timedelta(seconds=recent_duration)
+        start_ts = int(start_time.timestamp())
+        end_ts = int(end_time.timestamp())
         
-        messages = message_repo.get_messages_by_time_range(
-            rc.robot_wx_id,
-            rc.from_wx_id,
-            int(start_time.timestamp()),
-            int(end_time.timestamp())
+        message_count = await message_repo.count_messages_by_time_range(
+            rc.robot_wx_id, rc.from_wx_id, start_ts, end_ts, MIN_SUMMARY_MESSAGES
         )
+        if message_count < MIN_SUMMARY_MESSAGES:
+            return call_tool_result_error(f"聊天记录不足{MIN_SUMMARY_MESSAGES}条，不需要总结")
         
-        if len(messages) < 100:
-            return call_tool_result_error("聊天记录不足100条，不需要总结")
-        
-        # 组装对话记录为字符串
-        content_lines = []
-        for message in messages:
-            # 格式化时间
-            time_str = datetime.fromtimestamp(message.created_at).strftime("%Y-%m-%d %H:%M:%S")
-            # 替换换行符
-            msg_content = message.message.replace("\n", "。。")
-            content_lines.append(f'[{time_str}] {{"{message.nickname}": "{msg_content}"}}--end--')
-        
-        # 构建提示词
-        prompt = """你是一个中文的群聊总结的助手，你可以为一个微信的群聊记录，提取并总结每个时间段大家在重点讨论的话题内容。
-
-每一行代表一个人的发言，每一行的的格式为： {"[time] {nickname}": "{content}"}--end--
-
-请帮我将给出的群聊内容总结成一个今日的群聊报告，包含不多于10个的话题的总结（如果还有更多话题，可以在后面简单补充）。每个话题包含以下内容：
-- 话题名(50字以内，带序号1️⃣2️⃣3️⃣，同时附带热度，以🔥数量表示）
-- 参与者(不超过5个人，将重复的人名去重)
-- 时间段(从几点到几点)
-- 过程(50到200字左右）
-- 评价(50字以下)
-- 分割线： ------------
-
-另外有以下要求：
-1. 每个话题结束使用 ------------ 分割
-2. 使用中文冒号
-3. 无需大标题
-4. 开始给出本群讨论风格的整体评价，例如活跃、太水、太黄、太暴力、话题不集中、无聊诸如此类
-"""
+        await _report(progress, 1, "读取聊天记录")
         
-        msg = f"群名称: {chat_room_name}\n聊天记录如下:\n" + "\n".join(content_lines)
+        # 获取群聊名称
+        chat_room_name = rc.from_wx_id
+        chat_room = await contact_repo.get_contact_by_wechat_id(rc.from_wx_id)
+        if chat_room:
+            nickname = getattr(chat_room, 'nickname', None)
+            if nickname:
+                chat_room_name = nickname
         
         # 配置AI客户端
         ai_api_key = chat_api_key
@@ -162,75 +175,201 @@ async def chat_room_summary(
         if chatroom_model:
             ai_model = chatroom_model
         
-        # 创建OpenAI客户端
-        client = OpenAI(
-            api_key=ai_api_key,
-            base_url=ai_base_url
-        )
+        # 复用进程级的异步客户端，请求期间不阻塞事件循环
+        client = openai_client_registry.get_client(ai_base_url, ai_api_key)
         
-        # 调用AI进行总结
-        try:
-            response = client.chat.completions.create(
-                model=ai_model,
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": msg}
-                ],
-                stream=False,
-                max_tokens=2000
+        # 按时间段切分窗口：已结束的完整时间段可以使用缓存的摘要
+        segments = plan_segments(start_ts, end_ts, summary_settings.bucket_seconds)
+        bucket_repo = AsyncSummaryBucketRepository(db, rc.robot_code)
+        bucket_segments: List[Segment] = []
+        summaries: Dict[int, str] = {}
+        if any(segment.cacheable for segment in segments) and bucket_repo.available():
+            cached = await bucket_repo.get_summaries(
+                rc.from_wx_id, summary_settings.bucket_seconds,
+                [segment.start for segment in segments if segment.cacheable]
             )
-            
-            if not response.choices or len(response.choices) == 0 or not response.choices[0].message.content:
-                return call_tool_result_error("AI 总结失败，返回了空内容")
-            
-            summary_content = response.choices[0].message.content
-            
+            # 缓存表不可用时整段总结
+            if cached is not None:
+                bucket_segments = segments
+                summaries = cached
+        pending_segments = [
+            segment for segment in bucket_segments if not (segment.cacheable and segment.start in summaries)
+        ]
+        
+        # 读取整个窗口的聊天记录，同时按没有缓存的时间段分别组装
+        transcript, pending = await _load_transcripts(message_repo, rc, start_ts, end_ts, pending_segments)
+        # 旧数据的APP消息解析后可能被过滤，取数后仍需再判断一次
+        if transcript.stats.messages < MIN_SUMMARY_MESSAGES:
+            return call_tool_result_error(f"聊天记录不足{MIN_SUMMARY_MESSAGES}条，不需要总结")
+        
+        # 调用 AI 可能需要几十秒，先释放数据库连接
+        await release_async_db()
+        
+        try:
+            # 缓存命中足够多，或逐段总结不比整段总结调用更多次时才按时间段增量总结
+            if prefer_segments(
+                bucket_segments, len(summaries), transcript, pending, summary_settings.bucket_min_cached_percent
+            ):
+                summary_content = await _summarize_incrementally(
+                    client, ai_model, chat_room_name, rc, segments, summaries, pending, progress
+                )
+            else:
+                # 聊天记录过长时分段并行总结后合并
+                await _report(progress, 2, "AI 总结中")
+                summary_content = await summarize_transcript(
+                    client, ai_model, chat_room_name, transcript.lines,
+                    preamble=transcript.preamble
+                )
+        except SummaryError as e:
+            return call_tool_result_error(str(e))
         except Exception as e:
             logger.error(f"AI 总结失败: {e}")
             return call_tool_result_error(f"AI 总结失败: {str(e)}")
         
+        await _report(progress, 3, "发送聊天总结")
+        
         # 构建回复消息
         reply_msg = f"#消息总结\n让我们一起来看看群友们都聊了什么有趣的话题吧~\n\n{summary_content}"
         
         # 发送总结消息
         try:
-            async with httpx.AsyncClient() as http_client:
-                response = await http_client.post(
-                    f"http://client_{rc.robot_code}:{rc.we_chat_client_port}/api/v1/robot/message/send/longtext",
-                    json={
-                        "to_wxid": rc.from_wx_id,
-                        "content": reply_msg
-                    },
-                    headers={"Content-Type": "application/json"}
+            response = await robot_client.post(
+                rc.robot_code,
+                rc.we_chat_client_port,
+                "/api/v1/robot/message/send/longtext",
+                json={
+                    "to_wxid": rc.from_wx_id,
+                    "content": reply_msg
+                }
+            )
+            
+            if response.status_code != 200:
+                return call_tool_result_error(
+                    f"发送聊天总结失败，返回状态码不是 200: {response.status_code}"
                 )
-                
-                if response.status_code != 200:
-                    return call_tool_result_error(
-                        f"发送聊天总结失败，返回状态码不是 200: {response.status_code}"
-                    )
-                
-                resp_data = response.json()
-                if resp_data.get("code") != 200:
-                    return call_tool_result_error(
-                        f"发送聊天总结失败，返回状态码不是 200: {resp_data.get('message', '未知错误')}"
-                    )
-                
+            
+            resp_data = response.json()
+            if resp_data.get("code") != 200:
+                return call_tool_result_error(
+                    f"发送聊天总结失败，返回状态码不是 200: {resp_data.get('message', '未知错误')}"
+                )
+            
         except Exception as e:
             logger.error(f"发送聊天总结失败: {e}")
             return call_tool_result_error(f"发送聊天总结失败: {str(e)}")
         
-        # 返回成功结果
-        result = {
-            "content": [
-                {
-                    "type": "text",
-                    "text": "聊天总结发送成功"
-                }
-            ]
-        }
-        
-        return result, None, None
+        await _report(progress, 4, "聊天总结发送成功")
+        return _text_result("聊天总结发送成功")
         
     except Exception as e:
         logger.error(f"群聊总结工具执行失败: {e}")
         return call_tool_result_error(f"群聊总结工具执行失败: {str(e)}")
+
+
+async def _report(progress: Optional[ProgressCallback], step: int, message: str) -> None:
+    """报告进度，进度回调失败不影响总结"""
+    if progress is None:
+        return
+    try:
+        await progress(step, message)
+    except Exception as e:
+        logger.warning(f"报告群聊总结进度失败: {e}")
+
+
+def _text_result(text: str) -> Tuple[Dict[str, Any], Any, Optional[Exception]]:
+    """创建工具调用成功结果"""
+    result = {
+        "content": [
+            {
+                "type": "text",
+                "text": text
+            }
+        ]
+    }
+    return result, None, None
+
+
+async def _load_transcripts(
+    message_repo: AsyncMessageRepository,
+    rc: RobotContext,
+    start_ts: int,
+    end_ts: int,
+    segments: Sequence[Segment] = ()
+) -> Tuple[Transcript, List[Tuple[Segment, Transcript]]]:
+    """
+    读取时间范围内的聊天记录并组装成总结用的文本，同时按给定的时间段分别组装
+    
+    token 预算作用于整个窗口，各时间段按消息条数分摊预算
+    """
+    token_budget = summary_settings.token_budget
+    # 按批流式读取，每批精简成发言行后即释放，只保留精简后的文本
+    # 压缩时间戳、合并连续发言、去掉纯表情，超出预算时均匀抽样
+    builder = TranscriptBuilder(start_ts, token_budget)
+    segment_builders = [TranscriptBuilder(segment.start) for segment in segments]
+    segment_starts = [segment.start for segment in segments]
+    async for batch in message_repo.stream_messages_by_time_range(
+        rc.robot_wx_id, rc.from_wx_id, start_ts, end_ts
+    ):
+        builder.add(batch)
+        for message in batch:
+            index = bisect_right(segment_starts, message.created_at) - 1
+            if index >= 0 and message.created_at < segments[index].end:
+                segment_builders[index].add((message,))
+    
+    # 游标读取结束后再批量查询发送者昵称
+    display_names = await message_repo.member_repo.get_display_names(rc.from_wx_id, builder.senders)
+    transcript = builder.build(display_names)
+    logger.info(f"群聊总结聊天记录: {transcript.stats.describe()}")
+    
+    pending_messages = sum(segment_builder.stats.messages for segment_builder in segment_builders)
+    pending = []
+    for segment, segment_builder in zip(segments, segment_builders):
+        budget = 0
+        if token_budget > 0 and pending_messages:
+            budget = max(token_budget * segment_builder.stats.messages // pending_messages, 1)
+        pending.append((segment, segment_builder.build(display_names, budget)))
+    return transcript, pending
+
+
+async def _summarize_incrementally(
+    client: AsyncOpenAI,
+    ai_model: str,
+    chat_room_name: str,
+    rc: RobotContext,
+    segments: List[Segment],
+    summaries: Dict[int, str],
+    pending: List[Tuple[Segment, Transcript]],
+    progress: Optional[ProgressCallback] = None
+) -> str:
+    """
+    按时间段增量总结：已缓存的时间段直接使用摘要，其余时间段并行总结，
+    新总结的已结束时间段写入缓存，最后合并成报告
+    """
+    bucket_seconds = summary_settings.bucket_seconds
+    logger.info(
+        f"群聊总结共 {len(segments)} 段，命中缓存 {len(segments) - len(pending)} 段，需要总结 {len(pending)} 段"
+    )
+    
+    await _report(progress, 2, f"AI 总结中（{len(pending)} 段需要总结，{len(segments) - len(pending)} 段命中缓存）")
+    results = await summarize_segments(client, ai_model, chat_room_name, pending)
+    error: Optional[BaseException] = None
+    # 总结前已释放数据库连接，写缓存时重新获取会话
+    db = get_async_db()
+    bucket_repo = AsyncSummaryBucketRepository(db, rc.robot_code) if db is not None else None
+    for (segment, transcript), result in zip(pending, results):
+        if isinstance(result, BaseException):
+            error = error or result
+            continue
+        summaries[segment.start] = result
+        # 部分时间段失败时，已成功的时间段仍然缓存，下次请求不必重新总结
+        if segment.cacheable and bucket_repo is not None:
+            await bucket_repo.save_summary(
+                rc.from_wx_id, bucket_seconds, segment.start, result, transcript.stats.messages, ai_model
+            )
+    if error is not None:
+        raise error
+    
+    return await compose_report(
+        client, ai_model, chat_room_name,
+        [(segment, summaries.get(segment.start, "")) for segment in segments]
+    )
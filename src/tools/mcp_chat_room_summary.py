@@ -1,33 +1,103 @@
+import json
 import logging
+from typing import Any, Dict, Optional
+
 from mcp.server.fastmcp import Context, FastMCP
 
-from ..middleware.tenant import apply_tenant_from_meta
-from .chat_room_summary import chat_room_summary as _chat_room_summary
+from ..middleware.tenant import parse_robot_context, tenant_scope
+from ..utils.jobs import Job, JobQueueFull, job_queue
+from .chat_room_summary import SUMMARY_PROGRESS_TOTAL, chat_room_summary as _chat_room_summary
 
 logger = logging.getLogger(__name__)
 
+# 后台任务类型
+CHAT_ROOM_SUMMARY_JOB = "chat_room_summary"
+
 
 def register_chat_room_summary_tool(mcp: FastMCP) -> None:
     @mcp.tool()
-    async def ChatRoomSummary(recent_duration: int, ctx: Context) -> str:
+    async def ChatRoomSummary(recent_duration: int, ctx: Context, background: bool = False) -> str:
         """微信群聊总结，当用户想总结群聊内容时，可以调用该工具。
 
         Args:
             recent_duration: 最近多久的聊天记录(秒)，例如最近一小时是3600秒，最近一天是86400秒
+            background: 是否提交为后台任务，为 true 时立即返回任务ID，可以用 ChatRoomSummaryJobStatus 查询进度
         """
-        try:
-            meta: dict | None = getattr(ctx.request_context, "meta", None)
-            if meta:
-                apply_tenant_from_meta(meta)
-        except Exception as e:
-            logger.error(f"应用租户上下文失败: {e}")
-
-        result, data, error = await _chat_room_summary({"recent_duration": recent_duration})
+        meta: dict | None = getattr(ctx.request_context, "meta", None)
+        if background:
+            return _submit_summary_job(recent_duration, ctx, meta)
+
+        async def progress(step: int, message: str) -> None:
+            await ctx.report_progress(step, SUMMARY_PROGRESS_TOTAL, message)
+
+        # 请求级数据库会话在工具调用结束时释放
+        async with tenant_scope(meta):
+            result, data, error = await _chat_room_summary({"recent_duration": recent_duration}, progress)
         if error:
             raise Exception(f"错误: {error}")
+        return _result_text(result)
+
+    @mcp.tool()
+    async def ChatRoomSummaryJobStatus(job_id: str, ctx: Context) -> str:
+        """查询后台群聊总结任务的状态和进度。
+
+        Args:
+            job_id: ChatRoomSummary 以后台任务方式提交时返回的任务ID
+        """
+        meta: dict | None = getattr(ctx.request_context, "meta", None)
+        job = job_queue.get(job_id)
+        # 只能查询同一个机器人、同一个群提交的任务
+        if job is None or job.kind != CHAT_ROOM_SUMMARY_JOB or job.owner != _job_owner(meta):
+            return f"任务不存在或已过期: {job_id}"
+        return json.dumps(job.to_dict(), ensure_ascii=False)
+
+
+def _submit_summary_job(recent_duration: int, ctx: Context, meta: Any) -> str:
+    """把群聊总结提交为后台任务，返回任务ID"""
+    notify = True
+
+    async def run(job: Job) -> str:
+        async def progress(step: int, message: str) -> None:
+            nonlocal notify
+            job_queue.update(job, step, SUMMARY_PROGRESS_TOTAL, message)
+            if not notify:
+                return
+            # 工具调用已经返回，客户端可能已经不再接收该请求的进度通知，失败后不再发送
+            try:
+                await ctx.report_progress(step, SUMMARY_PROGRESS_TOTAL, message)
+            except Exception as e:
+                notify = False
+                logger.info(f"群聊总结任务 {job.id} 的进度通知发送失败，后续只记录在任务状态中: {e}")
+
+        async with tenant_scope(meta):
+            result, data, error = await _chat_room_summary({"recent_duration": recent_duration}, progress)
+        if error:
+            raise error
+        text = _result_text(result)
+        if isinstance(result, dict) and result.get("isError"):
+            raise Exception(text)
+        return text
+
+    try:
+        job = job_queue.submit(CHAT_ROOM_SUMMARY_JOB, run, owner=_job_owner(meta))
+    except JobQueueFull as e:
+        return str(e)
+    return f"群聊总结已提交为后台任务，任务ID: {job.id}，可以用 ChatRoomSummaryJobStatus 查询进度"
+
+
+def _job_owner(meta: Any) -> str:
+    """任务归属：机器人编码/群ID"""
+    if meta is not None and hasattr(meta, "model_dump"):
+        meta = meta.model_dump()
+    if not meta:
+        return ""
+    rc = parse_robot_context(meta)
+    return f"{rc.robot_code}/{rc.from_wx_id}"
+
 
-        if isinstance(result, dict) and "content" in result:
-            content_list = result["content"]
-            if content_list and isinstance(content_list[0], dict):
-                return content_list[0].get("text", str(result))
-        return str(result)
+def _result_text(result: Optional[Dict[str, Any]]) -> str:
+    if isinstance(result, dict) and "content" in result:
+        content_list = result["content"]
+        if content_list and isinstance(content_list[0], dict):
+            return content_list[0].get("text", str(result))
+    return str(result)
@@ -0,0 +1,304 @@
+"""
+AppMsg extractor - APP消息(type=49) XML 内容提取
+
+从 appmsg XML 中提取 type、title、des 三个字段：
+- 快速路径：正则直接截取字段，不构建 DOM
+- 慢速路径：快速路径无法确定结果时（字段重复、字段不是 appmsg 的直接子元素、有注释、找不到 appmsg 等），
+  使用预编译 XPath 解析
+- 按内容哈希缓存提取结果，转发的文章、文件等重复内容只解析一次
+- 大批量内容可选地分发到进程池解析
+"""
+import asyncio
+import hashlib
+import html
+import logging
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+
+class AppMessage(NamedTuple):
+    """appmsg 的关键字段，字段不存在或为空时为空字符串"""
+    type: str
+    title: str
+    des: str
+
+
+# 快速路径：appmsg 主体、常见的嵌套块（引用消息、公众号文章列表、小程序信息等，
+# 内部也有 type/title 字段）、字段值
+_APPMSG_RE = re.compile(r"<appmsg\b[^>]*>(.*)</appmsg>", re.S)
+_NESTED_RE = re.compile(
+    r"<(refermsg|mmreader|weappinfo|appattach|wcpayinfo|extinfo)\b(?:[^>]*/>|.*?</\1>)",
+    re.S,
+)
+_FIELD_RES = {
+    name: re.compile(rf"<{name}\s*/>|<{name}(?:\s[^>]*)?>(.*?)</{name}>", re.S)
+    for name in AppMessage._fields
+}
+_CDATA_RE = re.compile(r"^\s*<!\[CDATA\[(.*)\]\]>\s*$", re.S)
+# 检查字段是否为 appmsg 的直接子元素：去掉 CDATA 后逐个扫描标签的层级
+_CDATA_ANY_RE = re.compile(r"<!\[CDATA\[.*?\]\]>", re.S)
+_TAG_RE = re.compile(r"<(/?)([A-Za-z_][\w:.-]*)[^>]*?(/?)>")
+
+# 慢速路径：预编译 XPath，禁止实体展开和网络访问
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+_FIELD_XPATHS = {
+    name: etree.XPath(f"string((//appmsg/{name})[1])")
+    for name in AppMessage._fields
+}
+
+
+def _field_text(raw: str) -> Optional[str]:
+    """字段的文本，与 XPath 一致去掉首尾空白；含有子元素或 CDATA 与文本混排时返回 None 交给 XPath"""
+    cdata = _CDATA_RE.match(raw)
+    if cdata and "]]>" not in cdata.group(1):
+        return cdata.group(1).strip()
+    if "<" in raw:
+        return None
+    return html.unescape(raw).strip() if "&" in raw else raw.strip()
+
+
+def _parse_fast(content: str) -> Optional[AppMessage]:
+    """正则快速路径，无法确定结果时返回 None 交给 XPath"""
+    match = _APPMSG_RE.search(content)
+    if match is None:
+        return None
+    body = _NESTED_RE.sub("", match.group(1))
+    # 注释中的标签正则无法区分，交给 XPath
+    if "<appmsg" in body or "<!--" in body or not _fields_at_top_level(body):
+        return None
+
+    values = []
+    for name in AppMessage._fields:
+        found = _FIELD_RES[name].findall(body)
+        # 字段重复说明有嵌套的同名元素，无法用正则判断层级
+        if len(found) > 1:
+            return None
+        value = _field_text(found[0]) if found else ""
+        if value is None:
+            return None
+        values.append(value)
+    return AppMessage(*values)
+
+
+def _fields_at_top_level(body: str) -> bool:
+    """字段是否都是 appmsg 的直接子元素，未知的嵌套块（如 finderFeed）中有同名字段时返回 False"""
+    depth = 0
+    for closing, name, self_closing in _TAG_RE.findall(_CDATA_ANY_RE.sub("", body)):
+        if closing:
+            depth -= 1
+            continue
+        if depth > 0 and name in _FIELD_RES:
+            return False
+        if not self_closing:
+            depth += 1
+    return True
+
+
+def _parse_xml(content: str) -> Optional[AppMessage]:
+    """XPath 慢速路径，XML 格式错误时返回 None"""
+    try:
+        root = etree.fromstring(content.encode("utf-8"), _XML_PARSER)
+    except (etree.XMLSyntaxError, ValueError):
+        return None
+    return AppMessage(*(str(_FIELD_XPATHS[name](root)).strip() for name in AppMessage._fields))
+
+
+def parse_app_message(content: str) -> Optional[AppMessage]:
+    """
+    解析一条 appmsg XML（不经过缓存）
+
+    Args:
+        content: 消息内容
+
+    Returns:
+        提取的字段，XML 格式错误时返回 None
+    """
+    return _parse_fast(content) or _parse_xml(content)
+
+
+def _parse_batch(contents: List[str]) -> List[Optional[AppMessage]]:
+    """进程池工作进程入口"""
+    return [parse_app_message(content) for content in contents]
+
+
+# 缓存未命中的标记（缓存值本身可能为 None）
+_MISSING = object()
+
+
+def _content_key(content: str) -> bytes:
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+
+
+class AppMessageExtractor:
+    """带内容哈希 LRU 缓存和可选进程池的 appmsg 提取器"""
+
+    def __init__(self, cache_size: int = 4096, workers: int = 0, parallel_threshold: int = 256):
+        """
+        初始化提取器
+
+        Args:
+            cache_size: 缓存的提取结果条数，<= 0 表示关闭缓存
+            workers: 解析进程数，<= 1 表示在当前进程解析
+            parallel_threshold: 一批中未命中缓存的内容达到多少条才分发到进程池
+        """
+        self.cache_size = cache_size
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self._lock = Lock()
+        self._cache: "OrderedDict[bytes, Optional[AppMessage]]" = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._hits = 0
+        self._misses = 0
+        self._parallel_batches = 0
+
+    def configure(
+        self,
+        cache_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        parallel_threshold: Optional[int] = None,
+    ) -> None:
+        """调整缓存大小和进程池参数，进程数变化时重建进程池"""
+        with self._lock:
+            if cache_size is not None:
+                self.cache_size = cache_size
+                self._trim_locked()
+            if parallel_threshold is not None:
+                self.parallel_threshold = parallel_threshold
+            if workers is not None and workers != self.workers:
+                self.workers = workers
+                pool, self._pool = self._pool, None
+                if pool is not None:
+                    pool.shutdown(wait=False)
+
+    def extract(self, content: str) -> Optional[AppMessage]:
+        """提取一条 appmsg，XML 格式错误时返回 None"""
+        return self.extract_many([content]).get(content)
+
+    def extract_many(self, contents: Iterable[str]) -> Dict[str, Optional[AppMessage]]:
+        """
+        批量提取 appmsg，未命中缓存的内容较多时分发到进程池
+
+        Args:
+            contents: 消息内容列表
+
+        Returns:
+            消息内容到提取结果的映射
+        """
+        results, misses, keys = self._lookup(contents)
+        if misses:
+            pool = self._get_pool(len(misses))
+            if pool is not None:
+                parsed = [item for chunk in pool.map(_parse_batch, self._chunks(misses)) for item in chunk]
+            else:
+                parsed = _parse_batch(misses)
+            self._store(misses, keys, parsed, results)
+        return results
+
+    async def extract_many_async(self, contents: Iterable[str]) -> Dict[str, Optional[AppMessage]]:
+        """
+        批量提取 appmsg，使用进程池时不阻塞事件循环
+
+        Args:
+            contents: 消息内容列表
+
+        Returns:
+            消息内容到提取结果的映射
+        """
+        results, misses, keys = self._lookup(contents)
+        if misses:
+            pool = self._get_pool(len(misses))
+            if pool is not None:
+                loop = asyncio.get_running_loop()
+                chunks = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _parse_batch, chunk) for chunk in self._chunks(misses)
+                ))
+                parsed = [item for chunk in chunks for item in chunk]
+            else:
+                parsed = _parse_batch(misses)
+            self._store(misses, keys, parsed, results)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """返回提取器的统计信息"""
+        with self._lock:
+            return {
+                "cache_entries": len(self._cache),
+                "hits": self._hits,
+                "misses": self._misses,
+                "parallel_batches": self._parallel_batches,
+                "workers": self.workers,
+            }
+
+    def close(self) -> None:
+        """关闭进程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _lookup(
+        self, contents: Iterable[str]
+    ) -> Tuple[Dict[str, Optional[AppMessage]], List[str], List[bytes]]:
+        results: Dict[str, Optional[AppMessage]] = {}
+        misses: List[str] = []
+        keys: List[bytes] = []
+        with self._lock:
+            for content in contents:
+                if content in results:
+                    continue
+                key = _content_key(content)
+                cached = self._cache.get(key, _MISSING)
+                if cached is not _MISSING:
+                    self._cache.move_to_end(key)
+                    results[content] = cached
+                    self._hits += 1
+                else:
+                    # 占位，同一批内的重复内容只解析一次
+                    results[content] = None
+                    misses.append(content)
+                    keys.append(key)
+                    self._misses += 1
+        return results, misses, keys
+
+    def _store(
+        self,
+        contents: List[str],
+        keys: List[bytes],
+        parsed: List[Optional[AppMessage]],
+        results: Dict[str, Optional[AppMessage]],
+    ) -> None:
+        with self._lock:
+            for content, key, app_message in zip(contents, keys, parsed):
+                results[content] = app_message
+                if self.cache_size > 0:
+                    self._cache[key] = app_message
+            self._trim_locked()
+
+    def _trim_locked(self) -> None:
+        while self._cache and len(self._cache) > max(self.cache_size, 0):
+            self._cache.popitem(last=False)
+
+    def _chunks(self, contents: List[str]) -> List[List[str]]:
+        size = -(-len(contents) // self.workers)
+        return [contents[i:i + size] for i in range(0, len(contents), size)]
+
+    def _get_pool(self, count: int) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 1 or count < self.parallel_threshold:
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                logger.info(f"appmsg 解析进程池已启动，进程数: {self.workers}")
+            self._parallel_batches += 1
+            return self._pool
+
+
+# 全局 appmsg 提取器，load_config 时根据 APPMSG_* 环境变量调整
+appmsg_extractor = AppMessageExtractor()
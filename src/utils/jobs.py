@@ -0,0 +1,210 @@
+"""
+Job queue - 进程内的后台任务池
+
+耗时的工具调用可以提交为后台任务后立即返回任务ID，由固定数量的 worker 按提交顺序执行，
+调用方通过任务ID查询状态和进度。任务只保存在内存中，服务重启后丢失；
+结束的任务保留 retention 秒后清理。
+"""
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """排队的任务数量已达上限"""
+
+
+@dataclass
+class Job:
+    """后台任务"""
+    id: str
+    kind: str
+    # 任务归属（例如 robot_code/群ID），查询时用于校验
+    owner: str = ""
+    status: str = QUEUED
+    progress: float = 0
+    total: Optional[float] = None
+    message: str = ""
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        """任务是否已结束"""
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+JobFunc = Callable[[Job], Awaitable[Any]]
+
+
+class JobQueue:
+    """固定 worker 数量的异步任务池"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 100, retention: float = 3600):
+        """
+        初始化任务池
+
+        Args:
+            workers: 同时执行的任务数
+            max_pending: 最多排队的任务数，超出时拒绝提交
+            retention: 结束的任务保留多久(秒)以便查询
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional["asyncio.Queue[tuple[Job, JobFunc]]"] = None
+        self._tasks: List[asyncio.Task] = []
+        self._submitted = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def submit(self, kind: str, func: JobFunc, owner: str = "") -> Job:
+        """
+        提交后台任务，必须在事件循环中调用
+
+        Args:
+            kind: 任务类型
+            func: 任务函数，参数为任务本身，可以通过 update 报告进度
+            owner: 任务归属
+
+        Returns:
+            已排队的任务
+
+        Raises:
+            JobQueueFull: 排队的任务数量已达上限
+        """
+        self._purge()
+        queue = self._ensure_started()
+        if queue.qsize() >= max(self.max_pending, 1):
+            self._rejected += 1
+            raise JobQueueFull(f"后台任务排队已满({self.max_pending})，请稍后再试")
+        job = Job(id=uuid.uuid4().hex, kind=kind, owner=owner)
+        self._jobs[job.id] = job
+        queue.put_nowait((job, func))
+        self._submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """查询任务，不存在或已清理时返回 None"""
+        self._purge()
+        return self._jobs.get(job_id)
+
+    @staticmethod
+    def update(job: Job, progress: float, total: Optional[float] = None, message: str = "") -> None:
+        """更新任务进度"""
+        job.progress = progress
+        if total is not None:
+            job.total = total
+        if message:
+            job.message = message
+
+    def stats(self) -> Dict[str, Any]:
+        """返回任务池的统计信息"""
+        running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+        return {
+            "workers": self.workers,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "running": running,
+            "retained": len(self._jobs),
+            "submitted": self._submitted,
+            "succeeded": self._succeeded,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    async def aclose(self) -> None:
+        """停止所有 worker，未完成的任务标记为失败，服务退出时调用"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self._jobs.values():
+            if not job.done:
+                job.status = FAILED
+                job.error = "服务已停止"
+                job.finished_at = time.time()
+        self._queue = None
+
+    def _ensure_started(self) -> "asyncio.Queue[tuple[Job, JobFunc]]":
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < max(self.workers, 1):
+            self._tasks.append(asyncio.get_running_loop().create_task(self._worker(self._queue)))
+        return self._queue
+
+    async def _worker(self, queue: "asyncio.Queue[tuple[Job, JobFunc]]") -> None:
+        while True:
+            job, func = await queue.get()
+            try:
+                # 每个任务在独立的上下文中运行，机器人上下文和数据库会话不会串到下一个任务
+                # （create_task 的 context 参数需要 Python 3.11，这里在新上下文中创建任务）
+                await contextvars.Context().run(asyncio.create_task, self._run(job, func))
+            finally:
+                queue.task_done()
+
+    async def _run(self, job: Job, func: JobFunc) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = await func(job)
+            job.status = SUCCEEDED
+            self._succeeded += 1
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = "任务被取消"
+            self._failed += 1
+            raise
+        except Exception as e:
+            logger.error(f"后台任务执行失败({job.kind}/{job.id}): {e}")
+            job.status = FAILED
+            job.error = str(e)
+            self._failed += 1
+        finally:
+            job.finished_at = time.time()
+
+    def _purge(self) -> None:
+        now = time.time()
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and job.finished_at is not None and now - job.finished_at > self.retention
+        ]:
+            del self._jobs[job_id]
+
+
+# 全局后台任务池，load_config 时根据 JOB_* 环境变量调整
+job_queue = JobQueue()
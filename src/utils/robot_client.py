@@ -0,0 +1,182 @@
+"""
+Robot client - 访问微信机器人客户端(client_{robot_code})的共享 HTTP 客户端
+
+所有工具共用一个长连接的 httpx 客户端：按主机复用连接、显式的连接/读取超时，
+并缓存 client_* 主机名的 DNS 解析结果，避免每次发送都重新解析和握手。
+容器重启后 IP 可能变化，连接失败时会丢弃缓存重新解析并重试一次。
+"""
+import asyncio
+import logging
+import socket
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class DNSCache:
+    """主机名解析结果缓存（TTL）"""
+
+    def __init__(self, ttl: float = 60):
+        """
+        初始化 DNS 缓存
+
+        Args:
+            ttl: 解析结果的缓存有效期(秒)，<= 0 表示不缓存
+        """
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    async def resolve(self, host: str, port: int) -> str:
+        """解析主机名，返回 IP 地址"""
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        if not infos:
+            raise OSError(f"无法解析主机名: {host}")
+        # 优先使用 IPv4 地址
+        infos.sort(key=lambda info: info[0] != socket.AF_INET)
+        address = str(infos[0][4][0])
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (now + self.ttl, address)
+        return address
+
+    def invalidate(self, host: str, port: int) -> None:
+        """丢弃主机名的解析结果"""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def stats(self) -> Dict[str, int]:
+        """返回 DNS 缓存的统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+class RobotClient:
+    """访问机器人客户端的共享 HTTP 客户端"""
+
+    def __init__(
+        self,
+        connect_timeout: float = 5,
+        read_timeout: float = 60,
+        max_connections: int = 200,
+        max_keepalive_connections: int = 50,
+        keepalive_expiry: float = 30,
+        dns_ttl: float = 60,
+    ):
+        """
+        初始化客户端
+
+        Args:
+            connect_timeout: 建立连接的超时时间(秒)
+            read_timeout: 读取响应的超时时间(秒)
+            max_connections: 连接池的最大连接数
+            max_keepalive_connections: 连接池保持的空闲长连接数
+            keepalive_expiry: 空闲长连接的保持时间(秒)
+            dns_ttl: 主机名解析结果的缓存有效期(秒)
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.dns_cache = DNSCache(dns_ttl)
+        self._lock = Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._requests = 0
+        self._retries = 0
+
+    @staticmethod
+    def host_for(robot_code: str) -> str:
+        """机器人客户端的主机名"""
+        return f"client_{robot_code}"
+
+    async def post(self, robot_code: str, port: int, path: str, json: Any) -> httpx.Response:
+        """
+        向机器人客户端发送 POST 请求
+
+        Args:
+            robot_code: 机器人编码
+            port: 机器人客户端端口
+            path: 请求路径，例如 /api/v1/robot/message/send/longtext
+            json: 请求体
+
+        Returns:
+            HTTP 响应
+        """
+        host = self.host_for(robot_code)
+        port = int(port)
+        self._requests += 1
+        try:
+            return await self._post_once(host, port, path, json)
+        except httpx.ConnectError:
+            # 连接失败时请求尚未发出，丢弃缓存的 IP 后重新解析并重试一次
+            self.dns_cache.invalidate(host, port)
+            self._retries += 1
+            logger.warning(f"连接机器人客户端 {host}:{port} 失败，重新解析主机名后重试")
+        return await self._post_once(host, port, path, json)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回客户端的统计信息"""
+        return {
+            "requests": self._requests,
+            "retries": self._retries,
+            "dns": self.dns_cache.stats(),
+        }
+
+    async def aclose(self) -> None:
+        """关闭连接池，服务退出时调用"""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def _post_once(self, host: str, port: int, path: str, json: Any) -> httpx.Response:
+        address = await self.dns_cache.resolve(host, port)
+        if ":" in address:
+            address = f"[{address}]"
+        # 直接连接解析后的 IP，Host 头保持原主机名
+        return await self._get_client().post(
+            f"http://{address}:{port}{path}",
+            json=json,
+            headers={"Host": f"{host}:{port}"},
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(
+                        self.read_timeout,
+                        connect=self.connect_timeout,
+                    ),
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                        keepalive_expiry=self.keepalive_expiry,
+                    ),
+                )
+            return self._client
+
+
+# 全局机器人客户端，load_config 时根据 ROBOT_CLIENT_* 环境变量调整
+robot_client = RobotClient()
@@ -0,0 +1,130 @@
+"""
+SingleFlight - 合并并发的相同请求
+
+同一个 key 同一时间只执行一次：第一个请求（领头）执行，其余并发请求（跟随）等待领头的结果；
+领头成功完成后的冷却时间内，相同的请求直接返回最近的结果而不是重新执行。
+只在单个事件循环内使用，不需要加锁。
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 调用方的角色
+LEADER = "leader"
+FOLLOWER = "follower"
+COOLDOWN = "cooldown"
+
+
+class SingleFlight(Generic[T]):
+    """按 key 合并并发请求，并在成功后的冷却时间内复用结果"""
+
+    def __init__(self, cooldown: float = 60, max_entries: int = 1024):
+        """
+        初始化
+
+        Args:
+            cooldown: 成功结果的复用时间(秒)，<= 0 表示只合并并发请求
+            max_entries: 最多保留的冷却结果数量，超出后淘汰最早的结果
+        """
+        self.cooldown = cooldown
+        self.max_entries = max_entries
+        self._inflight: Dict[Hashable, "asyncio.Future[T]"] = {}
+        self._recent: "OrderedDict[Hashable, Tuple[float, T]]" = OrderedDict()
+        self._leaders = 0
+        self._followers = 0
+        self._cooldown_hits = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[T]],
+        reusable: Optional[Callable[[T], bool]] = None
+    ) -> Tuple[T, str]:
+        """
+        执行或等待 key 对应的请求
+
+        Args:
+            key: 请求的 key
+            fn: 领头请求执行的函数
+            reusable: 判断结果是否可以在冷却时间内复用，默认全部复用；失败的结果通常不复用
+
+        Returns:
+            (结果, 角色)，角色为 LEADER / FOLLOWER / COOLDOWN
+        """
+        while True:
+            recent = self._get_recent(key)
+            if recent is not None:
+                self._cooldown_hits += 1
+                return recent, COOLDOWN
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self._followers += 1
+            # asyncio.wait 不会取消被等待的 future：只有当前请求被取消时才抛出 CancelledError，
+            # 领头请求的结果（包括被取消）都通过 future 的状态判断
+            await asyncio.wait({future})
+            if future.cancelled():
+                # 领头请求被取消，由当前请求重新领头
+                continue
+            return future.result(), FOLLOWER
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # 没有跟随请求时也要取出异常，避免 "exception was never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self._leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            if self.cooldown > 0 and (reusable is None or reusable(result)):
+                self._set_recent(key, result)
+            return result, LEADER
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """返回统计信息"""
+        return {
+            "inflight": len(self._inflight),
+            "recent": len(self._recent),
+            "leaders": self._leaders,
+            "followers": self._followers,
+            "cooldown_hits": self._cooldown_hits,
+        }
+
+    def _get_recent(self, key: Hashable) -> Optional[T]:
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._recent[key]
+            return None
+        return entry[1]
+
+    def _set_recent(self, key: Hashable, result: T) -> None:
+        now = time.monotonic()
+        self._recent[key] = (now + self.cooldown, result)
+        self._recent.move_to_end(key)
+        # 淘汰已过期和超出数量的结果（按写入顺序，最早的在前）
+        while self._recent:
+            oldest_key, (expires_at, _) = next(iter(self._recent.items()))
+            if expires_at > now and len(self._recent) <= self.max_entries:
+                break
+            del self._recent[oldest_key]
+
+
+# 群聊总结请求的合并，load_config 时根据 SUMMARY_COOLDOWN_SECONDS 调整冷却时间
+summary_flight: SingleFlight = SingleFlight()
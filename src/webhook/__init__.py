@@ -1,7 +1,17 @@
 """Webhook Package"""
 from .wechat_messages import on_wechat_messages, WeChatMessageResponse
+from .dedupe import MessageDeduper, RecentIdSet, message_deduper
+from .ingest import IngestQueueFull, IngestStopped, MessageIngestor, message_ingestor, message_to_row
 
 __all__ = [
     'on_wechat_messages',
     'WeChatMessageResponse',
+    'IngestQueueFull',
+    'IngestStopped',
+    'MessageIngestor',
+    'message_ingestor',
+    'message_to_row',
+    'MessageDeduper',
+    'RecentIdSet',
+    'message_deduper',
 ]
@@ -0,0 +1,189 @@
+"""
+Message deduper - 按 NewMsgId 去重 Webhook 消息
+
+微信客户端会重复推送同一条消息。每个租户保留最近 window 秒内见过的 NewMsgId，
+按时间切成 buckets 个分段的集合，过期的分段整体丢弃；重复的消息在入队前丢弃，不会写到数据库。
+写入失败而被丢弃的消息会从集合中移除，客户端重新推送时可以再次入库。
+内存有上限：每个租户最多保留 max_ids 个 ID（超出时提前丢弃最早的分段），最多保留 max_tenants 个租户。
+"""
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class RecentIdSet:
+    """按时间分段的最近 ID 集合"""
+
+    def __init__(self, window: float = 600, buckets: int = 6, max_ids: int = 20000):
+        """
+        初始化
+
+        Args:
+            window: ID 的保留时间(秒)
+            buckets: 保留时间切分的分段数，分段越多过期越精确
+            max_ids: 最多保留的 ID 数量
+        """
+        self.window = window
+        self.buckets = buckets
+        self.max_ids = max_ids
+        # (分段序号, 分段内的 ID)，按时间从旧到新
+        self._buckets: Deque[Tuple[int, Set[int]]] = deque()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, item: int) -> bool:
+        return any(item in ids for _, ids in self._buckets)
+
+    def add(self, item: int, now: Optional[float] = None) -> None:
+        """记录一个 ID"""
+        now = time.monotonic() if now is None else now
+        self.expire(now)
+        if item in self:
+            return
+        index, ids = self._buckets[-1]
+        # 当前分段过大时在同一时间段内再开一个分段，超出上限时只丢弃较旧的一半
+        if len(ids) >= max(self.max_ids // 2, 1):
+            ids = set()
+            self._buckets.append((index, ids))
+        ids.add(item)
+        self._size += 1
+        # 超过上限时提前丢弃最早的分段
+        while self._size > max(self.max_ids, 1) and len(self._buckets) > 1:
+            _, oldest = self._buckets.popleft()
+            self._size -= len(oldest)
+
+    def discard(self, item: int) -> None:
+        """移除一个 ID，不存在时忽略"""
+        for _, ids in self._buckets:
+            if item in ids:
+                ids.discard(item)
+                self._size -= 1
+                return
+
+    def expire(self, now: float) -> None:
+        """丢弃过期的分段，并保证最新的分段是当前时间所在的分段"""
+        index = self._bucket_index(now)
+        while self._buckets and self._buckets[0][0] <= index - max(self.buckets, 1):
+            _, oldest = self._buckets.popleft()
+            self._size -= len(oldest)
+        if not self._buckets or self._buckets[-1][0] != index:
+            self._buckets.append((index, set()))
+
+    def _bucket_index(self, now: float) -> int:
+        span = max(self.window / max(self.buckets, 1), 0.001)
+        return int(now // span)
+
+
+class MessageDeduper:
+    """按租户记录最近见过的 NewMsgId"""
+
+    def __init__(self, window: float = 600, max_ids: int = 20000, max_tenants: int = 256, buckets: int = 6):
+        """
+        初始化
+
+        Args:
+            window: NewMsgId 的保留时间(秒)，应覆盖客户端的重试间隔，<= 0 表示不去重
+            max_ids: 每个租户最多保留的 ID 数量
+            max_tenants: 最多保留的租户数量，超出后淘汰最久没有消息的租户
+            buckets: 保留时间切分的分段数
+        """
+        self.window = window
+        self.max_ids = max_ids
+        self.max_tenants = max_tenants
+        self.buckets = buckets
+        self._tenants: "OrderedDict[str, RecentIdSet]" = OrderedDict()
+        self._checked = 0
+        self._duplicates = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用去重"""
+        return self.window > 0
+
+    def unseen(self, robot_code: str, messages: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        过滤掉最近见过的消息（同一次推送中重复的消息也只保留一条），不记录新的 ID
+
+        Args:
+            robot_code: 机器人编码
+            messages: WeChatMessage.AddMsgs
+
+        Returns:
+            (没见过的消息, 重复的条数)
+        """
+        messages = list(messages)
+        if not self.enabled:
+            return messages, 0
+        seen = self._tenants.get(robot_code)
+        now = time.monotonic()
+        if seen is not None:
+            seen.expire(now)
+        fresh: List[Dict[str, Any]] = []
+        batch_ids: Set[int] = set()
+        for message in messages:
+            msg_id = _new_msg_id(message)
+            # 没有 NewMsgId 的消息无法判断是否重复，直接保留
+            if msg_id:
+                if msg_id in batch_ids or (seen is not None and msg_id in seen):
+                    continue
+                batch_ids.add(msg_id)
+            fresh.append(message)
+        duplicates = len(messages) - len(fresh)
+        self._checked += len(messages)
+        self._duplicates += duplicates
+        return fresh, duplicates
+
+    def remember(self, robot_code: str, messages: Iterable[Dict[str, Any]]) -> None:
+        """记录已接收的消息的 NewMsgId"""
+        if not self.enabled:
+            return
+        seen = self._tenants.get(robot_code)
+        if seen is None:
+            while len(self._tenants) >= max(self.max_tenants, 1):
+                self._tenants.popitem(last=False)
+            seen = RecentIdSet(self.window, self.buckets, self.max_ids)
+            self._tenants[robot_code] = seen
+        else:
+            self._tenants.move_to_end(robot_code)
+        seen.window, seen.buckets, seen.max_ids = self.window, self.buckets, self.max_ids
+        now = time.monotonic()
+        for message in messages:
+            msg_id = _new_msg_id(message)
+            if msg_id:
+                seen.add(msg_id, now)
+
+    def forget(self, robot_code: str, messages: Iterable[Dict[str, Any]]) -> None:
+        """移除已接收但最终没有入库的消息的 NewMsgId，客户端重新推送时不再被当作重复"""
+        seen = self._tenants.get(robot_code)
+        if seen is None:
+            return
+        for message in messages:
+            msg_id = _new_msg_id(message)
+            if msg_id:
+                seen.discard(msg_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回去重的统计信息"""
+        return {
+            "window": self.window,
+            "tenants": len(self._tenants),
+            "ids": sum(len(seen) for seen in self._tenants.values()),
+            "checked": self._checked,
+            "duplicates": self._duplicates,
+            "hit_rate": round(self._duplicates / self._checked, 4) if self._checked else 0,
+        }
+
+
+def _new_msg_id(message: Any) -> int:
+    if not isinstance(message, dict):
+        return 0
+    try:
+        return int(message.get("NewMsgId") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+# 全局消息去重索引，load_config 时根据 INGEST_DEDUPE_* 环境变量调整
+message_deduper = MessageDeduper()
@@ -0,0 +1,358 @@
+"""
+Message ingestor - Webhook 消息入库管道
+
+Webhook 收到的 AddMsgs 先放进按租户划分的内存缓冲区并立即应答，由每个租户一个的写入协程
+攒批后用多行 INSERT 写入 messages 表：
+- 缓冲区攒满 batch_size 条，或最早的一条已等待 flush_interval 秒时写入一批
+- 按 NewMsgId 丢弃客户端重复推送的消息，重复的消息不会进入队列
+- 所有租户排队的消息总数不超过 max_pending，超出时拒绝本次投递，由调用方返回 429 让客户端重试；
+  队列为空时总是接收，超过 max_pending 条的单次投递不会被一直拒绝
+- messages.msg_id 不是唯一键，写入前在同一事务中按 NewMsgId 排除已入库的消息，整批重试不会重复写入；
+  每个租户只有一个写入协程，检查和写入之间不会有本进程的其他写入。数据库错误按退避重试 max_retries 次后丢弃
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..model.message import MessageType
+from ..repository.message import AsyncMessageRepository
+from ..utils.appmsg import appmsg_extractor
+from .dedupe import MessageDeduper, message_deduper
+
+logger = logging.getLogger(__name__)
+
+# 与 messages 表的列长度一致
+_CONTENT_MAX_LENGTH = 4000
+_MESSAGE_SOURCE_MAX_LENGTH = 1000
+_WXID_MAX_LENGTH = 64
+
+_ATUSERLIST_RE = re.compile(r"<atuserlist>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</atuserlist>", re.S)
+
+SessionMakerFactory = Callable[[str], Awaitable[Optional[async_sessionmaker]]]
+
+
+class IngestQueueFull(Exception):
+    """排队入库的消息数量已达上限"""
+
+
+class IngestStopped(Exception):
+    """服务正在停止，不再接收消息"""
+
+
+def _string_value(value: Any) -> str:
+    """SKBuiltinStringT 的 JSON 形式为 {"string": "..."}"""
+    if isinstance(value, dict):
+        value = value.get("string")
+    return value if isinstance(value, str) else ""
+
+
+def message_to_row(message: Dict[str, Any], robot_wx_id: str, now: int) -> Optional[Dict[str, Any]]:
+    """
+    把 WeChatMessage.AddMsgs 中的一条消息转换为 messages 表的一行
+
+    Args:
+        message: protobuf Message 的 JSON 形式
+        robot_wx_id: 机器人自己的微信ID，用于识别自己发的消息和艾特
+        now: 当前时间戳
+
+    Returns:
+        消息行，不需要入库的消息（初始化消息、格式错误）返回 None
+    """
+    if not isinstance(message, dict):
+        return None
+    msg_type = int(message.get("MsgType") or 0)
+    if msg_type == 0 or msg_type == MessageType.INIT:
+        return None
+
+    from_user = _string_value(message.get("FromUserName"))
+    to_user = _string_value(message.get("ToUserName"))
+    content = _string_value(message.get("Content"))
+    message_source = message.get("MsgSource") or ""
+
+    # 自己在群里发的消息，来源是自己、接收者是群，按群消息记录
+    if robot_wx_id and from_user == robot_wx_id and to_user.endswith("@chatroom"):
+        from_wxid, sender_wxid = to_user, robot_wx_id
+    else:
+        from_wxid, sender_wxid = from_user, from_user
+    is_chat_room = from_wxid.endswith("@chatroom")
+    # 群里其他人的消息内容带有 "发送者微信ID:\n" 前缀
+    if is_chat_room and sender_wxid != robot_wx_id:
+        prefix, separator, rest = content.partition(":\n")
+        if separator and prefix and "\n" not in prefix:
+            sender_wxid, content = prefix, rest
+
+    is_at_me = False
+    if robot_wx_id and "<atuserlist>" in message_source:
+        match = _ATUSERLIST_RE.search(message_source)
+        is_at_me = match is not None and robot_wx_id in match.group(1).split(",")
+
+    app_msg_type = 0
+    if msg_type == MessageType.APP:
+        app_message = appmsg_extractor.extract(content)
+        if app_message is not None and app_message.type.isdigit():
+            app_msg_type = int(app_message.type)
+
+    return {
+        "msg_id": int(message.get("NewMsgId") or 0),
+        "client_msg_id": int(message.get("MsgId") or 0),
+        "is_chat_room": is_chat_room,
+        "is_at_me": is_at_me,
+        "is_ai_context": False,
+        "is_recalled": False,
+        "type": msg_type,
+        "app_msg_type": app_msg_type,
+        "content": content[:_CONTENT_MAX_LENGTH],
+        "display_full_content": "",
+        "message_source": message_source[:_MESSAGE_SOURCE_MAX_LENGTH],
+        "from_wxid": from_wxid[:_WXID_MAX_LENGTH],
+        "sender_wxid": sender_wxid[:_WXID_MAX_LENGTH],
+        "reply_wxid": "",
+        "to_wxid": to_user[:_WXID_MAX_LENGTH],
+        "attachment_url": "",
+        "created_at": int(message.get("CreateTime") or now),
+        "updated_at": now,
+    }
+
+
+@dataclass
+class _TenantWriter:
+    # (到达时间, 机器人微信ID, 消息)，写入一批后剩余消息的等待时间从各自的到达时间算起
+    buffer: Deque[Tuple[float, str, Dict[str, Any]]] = field(default_factory=deque)
+    event: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+
+
+class MessageIngestor:
+    """按租户攒批写入 messages 表的异步入库管道"""
+
+    def __init__(
+        self,
+        max_pending: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        idle_timeout: float = 300,
+        session_maker_factory: Optional[SessionMakerFactory] = None,
+        deduper: Optional[MessageDeduper] = None,
+    ):
+        """
+        初始化入库管道
+
+        Args:
+            max_pending: 所有租户排队的消息总数上限，超出时拒绝投递（队列为空时总是接收）
+            batch_size: 每批写入的最大条数
+            flush_interval: 最早的一条消息最多等待多久(秒)写入
+            max_retries: 数据库错误时的重试次数
+            idle_timeout: 租户多久(秒)没有消息后回收其写入协程
+            session_maker_factory: 按 robot_code 获取异步 SessionMaker，默认使用租户数据库管理器
+            deduper: 按 NewMsgId 去重，为 None 时不去重
+        """
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self.session_maker_factory = session_maker_factory
+        self.deduper = deduper
+        self._writers: Dict[str, _TenantWriter] = {}
+        self._pending = 0
+        self._closing = False
+        self._accepted = 0
+        self._rejected = 0
+        self._written = 0
+        self._conflicts = 0
+        self._skipped = 0
+        self._failed = 0
+        self._batches = 0
+        self._batched_rows = 0
+        self._flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+
+    def submit(self, robot_code: str, robot_wx_id: str, messages: List[Dict[str, Any]]) -> int:
+        """
+        投递一次 Webhook 中的消息，必须在事件循环中调用
+
+        Args:
+            robot_code: 机器人编码
+            robot_wx_id: 机器人自己的微信ID
+            messages: WeChatMessage.AddMsgs
+
+        Returns:
+            接收的消息条数，不包括重复的消息
+
+        Raises:
+            IngestStopped: 服务正在停止
+            IngestQueueFull: 排队的消息数量已达上限
+        """
+        if self._closing:
+            raise IngestStopped("服务正在停止，请稍后重试")
+        if self.deduper is not None:
+            messages, _ = self.deduper.unseen(robot_code, messages)
+        if not messages:
+            return 0
+        if self._pending and self._pending + len(messages) > max(self.max_pending, 1):
+            self._rejected += len(messages)
+            raise IngestQueueFull(f"待入库的消息过多({self._pending})，请稍后重试")
+        # 被拒绝的投递会被重试，只记录已接收的消息
+        if self.deduper is not None:
+            self.deduper.remember(robot_code, messages)
+
+        writer = self._writers.get(robot_code)
+        if writer is None or writer.task is None or writer.task.done():
+            writer = _TenantWriter()
+            writer.task = asyncio.get_running_loop().create_task(self._run_writer(robot_code, writer))
+            self._writers[robot_code] = writer
+        arrived_at = time.monotonic()
+        writer.buffer.extend((arrived_at, robot_wx_id, message) for message in messages)
+        writer.event.set()
+        self._pending += len(messages)
+        self._accepted += len(messages)
+        return len(messages)
+
+    async def aclose(self, timeout: float = 10) -> None:
+        """停止接收消息，把已排队的消息写完（最多等待 timeout 秒），服务退出时调用"""
+        self._closing = True
+        tasks = [writer.task for writer in self._writers.values() if writer.task is not None]
+        for writer in self._writers.values():
+            writer.event.set()
+        try:
+            if tasks:
+                _, unfinished = await asyncio.wait(tasks, timeout=timeout)
+                for task in unfinished:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            if self._pending:
+                logger.error(f"服务停止时仍有 {self._pending} 条消息未入库")
+                self._failed += self._pending
+                self._pending = 0
+        finally:
+            self._writers.clear()
+            self._closing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """返回入库管道的统计信息"""
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "tenants": len(self._writers),
+            "accepted": self._accepted,
+            "rejected": self._rejected,
+            "written": self._written,
+            "conflicts": self._conflicts,
+            "skipped": self._skipped,
+            "failed": self._failed,
+            "batches": self._batches,
+            "avg_batch_size": round(self._batched_rows / self._batches, 1) if self._batches else 0,
+            "flush_seconds": round(self._flush_seconds, 3),
+            "max_flush_seconds": round(self._max_flush_seconds, 3),
+            "dedupe": self.deduper.stats() if self.deduper is not None else None,
+        }
+
+    async def _run_writer(self, robot_code: str, writer: _TenantWriter) -> None:
+        while True:
+            if not writer.buffer:
+                if self._closing:
+                    return
+                writer.event.clear()
+                try:
+                    await asyncio.wait_for(writer.event.wait(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    # 检查和移除之间没有 await，不会漏掉并发投递的消息
+                    if not writer.buffer and self._writers.get(robot_code) is writer:
+                        del self._writers[robot_code]
+                        return
+                continue
+
+            # 等到攒满一批或最早的消息等待超过 flush_interval
+            while len(writer.buffer) < self.batch_size and not self._closing:
+                remaining = writer.buffer[0][0] + self.flush_interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                writer.event.clear()
+                try:
+                    await asyncio.wait_for(writer.event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [
+                writer.buffer.popleft()[1:] for _ in range(min(len(writer.buffer), max(self.batch_size, 1)))
+            ]
+            try:
+                await self._flush(robot_code, batch)
+            finally:
+                self._pending -= len(batch)
+
+    async def _flush(self, robot_code: str, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        now = int(time.time())
+        rows = []
+        for robot_wx_id, message in batch:
+            try:
+                row = message_to_row(message, robot_wx_id, now)
+            except Exception as e:
+                logger.warning(f"无法解析的消息({robot_code}): {e}")
+                row = None
+            if row is not None:
+                rows.append(row)
+        self._skipped += len(batch) - len(rows)
+        if not rows:
+            return
+
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            try:
+                session_maker = await self._get_session_maker(robot_code)
+                if session_maker is None:
+                    raise RuntimeError("无法获取数据库会话")
+                async with session_maker() as db:
+                    repo = AsyncMessageRepository(db)
+                    fresh = await self._exclude_written(repo, rows)
+                    await repo.insert_messages(fresh)
+                    await db.commit()
+                self._written += len(fresh)
+                self._conflicts += len(rows) - len(fresh)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    self._failed += len(rows)
+                    logger.error(f"消息入库失败({robot_code})，丢弃 {len(rows)} 条: {e}")
+                    # 接收时已记为见过，丢弃后要忘掉，否则客户端重新推送会被当作重复
+                    if self.deduper is not None:
+                        self.deduper.forget(robot_code, [message for _, message in batch])
+                    break
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 5))
+        elapsed = time.monotonic() - started
+        self._batches += 1
+        self._batched_rows += len(rows)
+        self._flush_seconds += elapsed
+        self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+
+    @staticmethod
+    async def _exclude_written(repo: AsyncMessageRepository, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """排除已入库的消息和同一批中重复的消息，没有 NewMsgId 的消息无法判断，总是写入"""
+        seen = await repo.get_existing_msg_ids(row["msg_id"] for row in rows if row["msg_id"])
+        fresh = []
+        for row in rows:
+            msg_id = row["msg_id"]
+            if msg_id:
+                if msg_id in seen:
+                    continue
+                seen.add(msg_id)
+            fresh.append(row)
+        return fresh
+
+    async def _get_session_maker(self, robot_code: str) -> Optional[async_sessionmaker]:
+        if self.session_maker_factory is not None:
+            return await self.session_maker_factory(robot_code)
+        # 延迟导入：config 加载时会导入入库管道
+        from ..config import config
+        return await config.tenant_db_manager.get_async_session_maker(robot_code)
+
+
+# 全局消息入库管道，load_config 时根据 INGEST_* 环境变量调整
+message_ingestor = MessageIngestor(deduper=message_deduper)
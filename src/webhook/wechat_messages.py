@@ -7,6 +7,8 @@ import logging
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
 
+from .ingest import IngestQueueFull, IngestStopped, message_ingestor
+
 logger = logging.getLogger(__name__)
 
 
@@ -83,11 +85,43 @@ async def on_wechat_messages(request) -> Dict[str, Any]:
             message="invalid JSON body"
         ).to_dict()
     
-    # TODO: 在这里继续处理解析后的 req（如入库、业务逻辑等）
-    logger.info(f"Received WeChat message: {req}")
+    if not isinstance(req, dict):
+        return WeChatMessageResponse(
+            code=400,
+            message="invalid message body"
+        ).to_dict()
+    
+    # 机器人编码和微信ID由推送方通过查询参数或请求头传入
+    robot_code = request.query_params.get("robot_code") if is_starlette else request.query.get("robot_code")
+    robot_code = robot_code or request.headers.get("X-Robot-Code") or ""
+    robot_wx_id = request.query_params.get("robot_wx_id") if is_starlette else request.query.get("robot_wx_id")
+    robot_wx_id = robot_wx_id or request.headers.get("X-Robot-WxID") or ""
+    messages = req.get("AddMsgs") or []
+    if messages and not robot_code:
+        return WeChatMessageResponse(
+            code=400,
+            message="missing robot_code"
+        ).to_dict()
+    
+    # 放入入库队列后立即应答，队列满时让推送方稍后重试
+    try:
+        accepted = message_ingestor.submit(robot_code, robot_wx_id, messages)
+    except IngestQueueFull as e:
+        logger.warning(f"消息入库队列已满，拒绝 {len(messages)} 条消息({robot_code}): {e}")
+        return WeChatMessageResponse(
+            code=429,
+            message="too many pending messages, retry later"
+        ).to_dict()
+    except IngestStopped:
+        return WeChatMessageResponse(
+            code=503,
+            message="server is shutting down, retry later"
+        ).to_dict()
+    logger.debug(f"Received WeChat message({robot_code}): {len(messages)} messages")
     
     # 返回成功响应
     return WeChatMessageResponse(
         code=200,
-        message="ok"
+        message="ok",
+        data={"accepted": accepted, "duplicates": len(messages) - accepted}
     ).to_dict()
@@ -0,0 +1,106 @@
+"""appmsg 提取：正则快速路径与 XPath 慢速路径的结果一致"""
+import pytest
+
+from src.utils.appmsg import AppMessage, AppMessageExtractor, _parse_fast, _parse_xml, parse_app_message
+
+QUOTE = """<?xml version="1.0"?>
+<msg>
+    <appmsg appid="" sdkver="0">
+        <title>这个说得对 &lt;3</title>
+        <des />
+        <type>57</type>
+        <appattach><totallen>0</totallen></appattach>
+        <refermsg>
+            <type>1</type>
+            <title>被引用消息里的标题</title>
+            <content>被引用的消息</content>
+        </refermsg>
+    </appmsg>
+</msg>"""
+
+LINK = """<msg>
+    <appmsg appid="" sdkver="0">
+        <title><![CDATA[标题里有 <b> 和 & 符号]]></title>
+        <des><![CDATA[文章摘要]]></des>
+        <type>5</type>
+        <url>https://example.com/?a=1&amp;b=2</url>
+        <mmreader><category><item><title>文章列表里的标题</title></item></category></mmreader>
+    </appmsg>
+</msg>"""
+
+FILE = """<msg><appmsg><title>季度报告.pdf</title><type>6</type><appattach><fileext>pdf</fileext></appattach></appmsg></msg>"""
+
+# 视频号等未知的嵌套块中有同名字段，appmsg 本身没有 des
+FINDER_FEED = """<msg>
+    <appmsg appid="" sdkver="0">
+        <title>当前微信版本不支持展示该内容，请升级至最新版本。</title>
+        <type>51</type>
+        <finderFeed>
+            <objectId>1</objectId>
+            <nickname>某个视频号</nickname>
+            <desc>视频描述</desc>
+            <des>嵌套块里的描述</des>
+            <title>嵌套块里的标题</title>
+        </finderFeed>
+    </appmsg>
+</msg>"""
+
+# 嵌套块出现在字段之前，且 appmsg 自己的字段为空元素
+NESTED_FIRST = """<msg><appmsg><channelCard><des>卡片描述</des><type>9</type></channelCard>
+<des></des><type>33</type><title/></appmsg></msg>"""
+
+DUPLICATED = """<msg><appmsg><title>第一个</title><title>第二个</title><type>1</type></appmsg></msg>"""
+
+WITH_COMMENT = """<msg><appmsg><!-- <des>注释里的描述</des> --><title>带注释</title><type>4</type></appmsg></msg>"""
+
+# CDATA 内外的空白与 XPath 一样去掉
+PADDED_CDATA = """<msg><appmsg><title> <![CDATA[  标题  ]]> </title><des><![CDATA[
+摘要
+]]></des><type>5</type></appmsg></msg>"""
+
+# CDATA 与文本混排、字段中有子元素，正则无法拼接出与 XPath 相同的文本
+MIXED_TEXT = """<msg><appmsg><title>前缀<![CDATA[标题]]><![CDATA[后缀]]></title><des>描述<b>加粗</b></des><type>5</type></appmsg></msg>"""
+
+NO_APPMSG = """<msg><emoji md5="abc" /></msg>"""
+
+SAMPLES = [
+    QUOTE, LINK, FILE, FINDER_FEED, NESTED_FIRST, DUPLICATED, WITH_COMMENT, PADDED_CDATA, MIXED_TEXT, NO_APPMSG,
+]
+
+
+@pytest.mark.parametrize("content", SAMPLES)
+def test_fast_path_matches_xpath(content):
+    expected = _parse_xml(content)
+    fast = _parse_fast(content)
+    # 快速路径要么给出与 XPath 相同的结果，要么交给 XPath
+    assert fast is None or fast == expected
+    assert parse_app_message(content) == expected
+
+
+def test_fast_path_handles_common_payloads():
+    assert _parse_fast(QUOTE) == AppMessage(type="57", title="这个说得对 <3", des="")
+    assert _parse_fast(LINK) == AppMessage(type="5", title="标题里有 <b> 和 & 符号", des="文章摘要")
+    assert _parse_fast(FILE) == AppMessage(type="6", title="季度报告.pdf", des="")
+    assert _parse_fast(PADDED_CDATA) == AppMessage(type="5", title="标题", des="摘要")
+
+
+def test_nested_container_falls_back_to_xpath():
+    assert _parse_fast(FINDER_FEED) is None
+    assert parse_app_message(FINDER_FEED) == AppMessage(
+        type="51", title="当前微信版本不支持展示该内容，请升级至最新版本。", des=""
+    )
+
+
+def test_malformed_xml_returns_none():
+    assert parse_app_message("<msg><appmsg><title>未闭合") is None
+
+
+def test_extractor_caches_results():
+    extractor = AppMessageExtractor(cache_size=8)
+    results = extractor.extract_many([QUOTE, QUOTE, FILE])
+    assert results[QUOTE] == parse_app_message(QUOTE)
+    assert results[FILE] == parse_app_message(FILE)
+    assert extractor.extract(QUOTE) == results[QUOTE]
+    stats = extractor.stats()
+    assert stats["misses"] == 2
+    assert stats["hits"] == 1
@@ -0,0 +1,94 @@
+"""异步租户数据库：按 RobotCode 创建的异步引擎和异步设置、联系人仓库"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+
+from src.config.config import TenantDBManager
+from src.model.chatroom_settings import Base as ChatRoomSettingsBase, ChatRoomSettings
+from src.model.contact import Base as ContactBase, Contact
+from src.model.global_settings import Base as GlobalSettingsBase, GlobalSettings
+from src.repository.chatroom_settings import AsyncChatRoomSettingsRepository
+from src.repository.contact import AsyncContactRepository
+from src.repository.global_settings import AsyncGlobalSettingsRepository
+from src.repository.settings_cache import settings_cache
+
+ROBOT_CODE = "robot_async"
+ROOM = "12345678@chatroom"
+
+
+@pytest.fixture
+def manager(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / ROBOT_CODE}.db")
+    for base in (GlobalSettingsBase, ChatRoomSettingsBase, ContactBase):
+        base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(GlobalSettings.__table__.insert(), [
+            {"id": 1, "chat_room_summary_enabled": True, "chat_room_summary_model": "gpt-4o-mini"},
+        ])
+        conn.execute(ChatRoomSettings.__table__.insert(), [
+            {"id": 1, "chat_room_id": ROOM, "chat_room_summary_enabled": True},
+            {"id": 2, "chat_room_id": "other@chatroom", "chat_room_summary_enabled": False},
+        ])
+        conn.execute(Contact.__table__.insert(), [
+            {"id": 1, "wechat_id": ROOM, "nickname": "测试群", "type": "chat_room",
+             "created_at": 0, "last_active_at": 0, "updated_at": 0},
+        ])
+    engine.dispose()
+
+    manager = TenantDBManager(
+        async_dsn_builder=lambda robot_code: f"sqlite+aiosqlite:///{tmp_path / robot_code}.db",
+        idle_ttl=0,
+        shared_engine=False,
+    )
+    settings_cache.invalidate(ROBOT_CODE)
+    yield manager
+    settings_cache.invalidate(ROBOT_CODE)
+
+
+def test_async_session_maker_is_cached(manager):
+    async def run():
+        first, second = await asyncio.gather(
+            manager.get_async_session_maker(ROBOT_CODE),
+            manager.get_async_session_maker(ROBOT_CODE),
+        )
+        third = await manager.get_async_session_maker(ROBOT_CODE)
+        engine = manager._tenants[ROBOT_CODE].async_engine
+        await engine.dispose()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    # 并发的首次调用共享同一次创建
+    assert first is second is third
+    stats = manager.stats()
+    assert stats["tenants"] == 1
+    assert stats["hits"] == 1
+
+
+def test_async_repositories(manager):
+    async def run():
+        session_maker = await manager.get_async_session_maker(ROBOT_CODE)
+        try:
+            async with session_maker() as db:
+                global_settings = await AsyncGlobalSettingsRepository(db, ROBOT_CODE).get_global_settings()
+                room_repo = AsyncChatRoomSettingsRepository(db, ROBOT_CODE)
+                room_settings = await room_repo.get_chatroom_settings(ROOM)
+                missing = await room_repo.get_chatroom_settings("missing@chatroom")
+                enabled_rooms = await room_repo.list_summary_enabled_chat_room_ids()
+                contact_repo = AsyncContactRepository(db)
+                contact = await contact_repo.get_contact_by_wechat_id(ROOM)
+                unknown = await contact_repo.get_contact_by_wechat_id("wxid_unknown")
+            return global_settings, room_settings, missing, enabled_rooms, contact, unknown
+        finally:
+            await manager._tenants[ROBOT_CODE].async_engine.dispose()
+
+    global_settings, room_settings, missing, enabled_rooms, contact, unknown = asyncio.run(run())
+    assert global_settings.chat_room_summary_model == "gpt-4o-mini"
+    assert room_settings.chat_room_summary_enabled is True
+    assert missing is None
+    assert enabled_rooms == [ROOM]
+    assert contact.nickname == "测试群"
+    assert unknown is None
+    # 设置对象从会话中分离后缓存，会话关闭后仍可读取
+    hit, cached = settings_cache.get(ROBOT_CODE, "chat_room_settings", ROOM)
+    assert hit and cached is room_settings
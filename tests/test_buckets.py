@@ -0,0 +1,123 @@
+"""按时间段增量总结：切分时间段、选择是否使用缓存、逐段总结和合并报告"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.config.config import summary_settings
+from src.llm.rate_limiter import LLMRateLimiter
+from src.summary import map_reduce
+from src.summary.buckets import (
+    Segment,
+    compose_report,
+    plan_segments,
+    prefer_segments,
+    summarize_segment,
+    summarize_segments,
+)
+from src.summary.map_reduce import SummaryError
+from src.summary.prompts import REDUCE_PROMPT
+from src.summary.transcript import Transcript
+
+
+class FakeClient:
+    """记录每次调用的用户内容，内容包含 fail 时抛出异常"""
+
+    def __init__(self):
+        self.base_url = "https://api.example.com/v1"
+        self.api_key = "sk-test"
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, stream, max_tokens):
+        system, content = messages[0]["content"], messages[1]["content"]
+        self.calls.append((system, content))
+        await asyncio.sleep(0.01)
+        if "fail" in content:
+            raise RuntimeError("AI 服务不可用")
+        text = "报告" if system == REDUCE_PROMPT else content.rsplit("\n", 1)[-1]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(map_reduce, "llm_rate_limiter", LLMRateLimiter(rpm=0, tpm=0))
+    monkeypatch.setattr(summary_settings, "chunk_chars", 10)
+    monkeypatch.setattr(summary_settings, "max_parallel", 2)
+    return summary_settings
+
+
+def _transcript(*lines):
+    return Transcript(preamble="说明", lines=list(lines))
+
+
+def test_plan_segments_aligns_to_buckets():
+    assert plan_segments(150, 420, 100, settle_seconds=10) == [
+        Segment(150, 200, False),
+        Segment(200, 300, True),
+        Segment(300, 400, True),
+        Segment(400, 420, False),
+    ]
+    # 刚结束、还没过 settle_seconds 的时间段不缓存
+    assert plan_segments(200, 405, 100, settle_seconds=10) == [
+        Segment(200, 300, True),
+        Segment(300, 405, False),
+    ]
+    assert plan_segments(200, 300, 100, settle_seconds=10) == [Segment(200, 300, False)]
+    assert plan_segments(150, 420, 0) == [Segment(150, 420, False)]
+    assert plan_segments(420, 420, 100) == [Segment(420, 420, False)]
+
+
+def test_prefer_segments():
+    segments = plan_segments(150, 520, 100, settle_seconds=10)
+    assert sum(segment.cacheable for segment in segments) == 3
+    short = _transcript("短")
+    long_lines = [f"第{i}条" for i in range(4)]
+
+    # 没有可缓存的时间段时整段总结
+    assert not prefer_segments([Segment(150, 200, False)], 0, short, [], 50)
+    # 命中比例达标时使用缓存
+    assert prefer_segments(segments, 3, short, [], 50)
+    # 缓存不足且整段总结只需调用一次时整段总结
+    assert not prefer_segments(segments, 1, short, [(segments[0], short)], 50)
+    # 整段总结本来也要分段时逐段总结，顺便写入缓存
+    pending = [(segments[1], _transcript(*long_lines[:2])), (segments[2], _transcript(*long_lines[2:]))]
+    assert prefer_segments(segments, 0, _transcript(*long_lines), pending, 50)
+
+
+def test_summarize_segment_splits_long_transcripts():
+    client = FakeClient()
+    segment = Segment(150, 200, False)
+    assert asyncio.run(summarize_segment(client, "gpt", "测试群", segment, _transcript())) == ""
+    assert client.calls == []
+
+    summary = asyncio.run(summarize_segment(client, "gpt", "测试群", segment, _transcript("第0条", "第1条", "第2条")))
+    assert summary == "第1条\n第2条"
+    assert len(client.calls) == 2
+    assert f"{segment.label()} 的聊天记录（第 1/2 部分）如下" in client.calls[0][1]
+
+
+def test_failed_segment_does_not_cancel_the_others():
+    client = FakeClient()
+    pending = [
+        (Segment(0, 100, True), _transcript("第0条")),
+        (Segment(100, 200, True), _transcript("fail")),
+        (Segment(200, 300, True), _transcript("第2条")),
+    ]
+    results = asyncio.run(summarize_segments(client, "gpt", "测试群", pending))
+    assert results[0] == "第0条" and results[2] == "第2条"
+    assert isinstance(results[1], RuntimeError)
+
+
+def test_compose_report_skips_empty_parts():
+    client = FakeClient()
+    first, second, third = Segment(0, 100, True), Segment(100, 200, True), Segment(200, 300, False)
+    report = asyncio.run(compose_report(client, "gpt", "测试群", [(first, "话题A"), (second, ""), (third, "话题C")]))
+    assert report == "报告"
+    content = client.calls[0][1]
+    assert second.label() not in content
+    assert content.index(first.label()) < content.index(third.label())
+
+    with pytest.raises(SummaryError, match="没有可总结的聊天记录"):
+        asyncio.run(compose_report(client, "gpt", "测试群", [(first, ""), (second, "")]))
+    assert len(client.calls) == 1
@@ -0,0 +1,135 @@
+"""群成员显示名称：批量查询、按群的 LRU 缓存和非群成员的短期缓存"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.model.chat_room_member import Base, ChatRoomMember
+from src.repository import chat_room_member as member_module
+from src.repository.chat_room_member import (
+    AsyncChatRoomMemberRepository,
+    ChatRoomMemberRepository,
+    MemberNameCache,
+)
+
+ROBOT_CODE = "robot_a"
+ROOM = "12345678@chatroom"
+
+
+def _member(n, wechat_id, remark="", nickname="", room=ROOM):
+    return {"id": n, "chat_room_id": room, "wechat_id": wechat_id, "remark": remark, "nickname": nickname,
+            "joined_at": 0, "last_active_at": 0}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = MemberNameCache(ttl=60, miss_ttl=0.05)
+    monkeypatch.setattr(member_module, "member_name_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "tenant.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(ChatRoomMember.__table__.insert(), [
+            _member(1, "wxid_a", remark="备注A", nickname="昵称A"),
+            _member(2, "wxid_b", nickname="昵称B"),
+            _member(3, "wxid_c"),
+            _member(4, "wxid_a", remark="其他群的备注", room="other@chatroom"),
+        ])
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def session(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    session = sessionmaker(bind=engine)()
+    session.queries = queries
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_display_names_are_loaded_in_batches(cache, session, monkeypatch):
+    monkeypatch.setattr(member_module, "_IN_BATCH_SIZE", 2)
+    repo = ChatRoomMemberRepository(session, ROBOT_CODE)
+    names = repo.get_display_names(ROOM, ["wxid_a", "wxid_b", "wxid_c", "wxid_gone", "wxid_a"])
+    # 备注 > 昵称 > 微信ID，非群成员显示为微信ID
+    assert names == {"wxid_a": "备注A", "wxid_b": "昵称B", "wxid_c": "wxid_c", "wxid_gone": "wxid_gone"}
+    assert len(session.queries) == 2
+
+    # 再次查询全部命中缓存
+    assert repo.get_display_names(ROOM, ["wxid_a", "wxid_gone"]) == {"wxid_a": "备注A", "wxid_gone": "wxid_gone"}
+    assert len(session.queries) == 2
+    # 同一个微信ID在其他群按其他群的设置显示
+    assert repo.get_display_names("other@chatroom", ["wxid_a"]) == {"wxid_a": "其他群的备注"}
+    assert len(session.queries) == 3
+
+
+def test_new_member_is_visible_after_miss_ttl(cache, session):
+    repo = ChatRoomMemberRepository(session, ROBOT_CODE)
+    assert repo.get_display_names(ROOM, ["wxid_new", "wxid_a"]) == {"wxid_new": "wxid_new", "wxid_a": "备注A"}
+
+    session.execute(ChatRoomMember.__table__.insert(), [_member(5, "wxid_new", nickname="新成员")])
+    session.commit()
+    assert repo.get_display_names(ROOM, ["wxid_new"]) == {"wxid_new": "wxid_new"}
+
+    # 非群成员只缓存 miss_ttl，群成员的名称仍然命中缓存
+    time.sleep(0.06)
+    queries = len(session.queries)
+    assert repo.get_display_names(ROOM, ["wxid_new", "wxid_a"]) == {"wxid_new": "新成员", "wxid_a": "备注A"}
+    assert len(session.queries) == queries + 1
+    assert cache.get_many(ROBOT_CODE, ROOM, ["wxid_new"]) == ({"wxid_new": "新成员"}, set())
+
+
+def test_repository_without_robot_code_skips_cache(cache, session):
+    ChatRoomMemberRepository(session).get_display_names(ROOM, ["wxid_a"])
+    assert cache.get_many(ROBOT_CODE, ROOM, ["wxid_a"]) == ({}, {"wxid_a"})
+
+
+def test_rooms_are_evicted_least_recently_used_first():
+    cache = MemberNameCache(max_rooms=2)
+    cache.put_many(ROBOT_CODE, "a@chatroom", {"wxid_a": "A"})
+    cache.put_many(ROBOT_CODE, "b@chatroom", {"wxid_b": "B"})
+    cache.get_many(ROBOT_CODE, "a@chatroom", ["wxid_a"])
+    cache.put_many(ROBOT_CODE, "c@chatroom", {"wxid_c": "C"})
+
+    assert cache.get_many(ROBOT_CODE, "b@chatroom", ["wxid_b"]) == ({}, {"wxid_b"})
+    assert cache.get_many(ROBOT_CODE, "a@chatroom", ["wxid_a"]) == ({"wxid_a": "A"}, set())
+    # 不同租户的同名群分开缓存
+    assert cache.get_many("robot_b", "a@chatroom", ["wxid_a"]) == ({}, {"wxid_a"})
+
+
+def test_room_entry_expires_and_invalidates():
+    cache = MemberNameCache(ttl=0.05)
+    cache.put_many(ROBOT_CODE, ROOM, {"wxid_a": "A"})
+    cache.put_many(ROBOT_CODE, "other@chatroom", {"wxid_a": "A"})
+    cache.invalidate(ROBOT_CODE, ROOM)
+    assert cache.get_many(ROBOT_CODE, ROOM, ["wxid_a"]) == ({}, {"wxid_a"})
+    assert cache.get_many(ROBOT_CODE, "other@chatroom", ["wxid_a"]) == ({"wxid_a": "A"}, set())
+    time.sleep(0.06)
+    assert cache.get_many(ROBOT_CODE, "other@chatroom", ["wxid_a"]) == ({}, {"wxid_a"})
+
+
+def test_async_repository_matches_sync(cache, db_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        try:
+            async with async_sessionmaker(bind=engine)() as db:
+                return await AsyncChatRoomMemberRepository(db, ROBOT_CODE).get_display_names(
+                    ROOM, ["wxid_a", "wxid_b", "wxid_gone"]
+                )
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run()) == {"wxid_a": "备注A", "wxid_b": "昵称B", "wxid_gone": "wxid_gone"}
+    assert cache.get_many(ROBOT_CODE, ROOM, ["wxid_b", "wxid_gone"])[1] == set()
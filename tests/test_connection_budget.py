@@ -0,0 +1,151 @@
+"""进程级连接预算：FIFO 排队、空闲连接回收和连接关闭时归还预算"""
+import asyncio
+import gc
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from src.config.budget import BudgetedQueuePool, ConnectionBudget, connection_budget
+
+
+def test_sync_waiters_are_served_in_order():
+    budget = ConnectionBudget(limit=1)
+    budget.acquire(timeout=1)
+    served = []
+
+    def wait(name):
+        budget.acquire(timeout=2)
+        served.append(name)
+        budget.release()
+
+    threads = []
+    for name in ("first", "second", "third"):
+        thread = threading.Thread(target=wait, args=(name,))
+        thread.start()
+        threads.append(thread)
+        while budget.stats()["waiting"] < len(threads):
+            time.sleep(0.01)
+    # 有人排队时新来的调用方不能插队
+    assert budget.try_acquire() is False
+
+    budget.release()
+    for thread in threads:
+        thread.join()
+    assert served == ["first", "second", "third"]
+    assert budget.stats()["in_use"] == 0
+
+
+def test_async_waiters_are_served_in_order():
+    async def run():
+        budget = ConnectionBudget(limit=1)
+        await budget.acquire_async(timeout=1)
+        served = []
+
+        async def wait(name):
+            await budget.acquire_async(timeout=2)
+            served.append(name)
+            await asyncio.sleep(0)
+            budget.release()
+
+        tasks = []
+        for name in ("first", "second", "third"):
+            tasks.append(asyncio.ensure_future(wait(name)))
+            await asyncio.sleep(0)
+        budget.release()
+        await asyncio.gather(*tasks)
+        return served, budget.stats()
+
+    served, stats = asyncio.run(run())
+    assert served == ["first", "second", "third"]
+    assert stats["in_use"] == 0
+    assert stats["waits"] == 3
+
+
+def test_wait_times_out_and_leaves_queue():
+    budget = ConnectionBudget(limit=1)
+    budget.acquire(timeout=1)
+    with pytest.raises(exc.TimeoutError):
+        budget.acquire(timeout=0.05)
+    stats = budget.stats()
+    assert (stats["waiting"], stats["timeouts"]) == (0, 1)
+
+
+@pytest.fixture
+def budget_limit():
+    """在当前占用之上给出指定数量的预算，测试结束后恢复上限"""
+    gc.collect()
+    limit = connection_budget.limit
+    in_use = connection_budget.stats()["in_use"]
+    yield lambda extra: connection_budget.configure(in_use + extra)
+    connection_budget.configure(limit)
+
+
+def _engine(tmp_path, name):
+    return create_engine(
+        f"sqlite:///{tmp_path / name}.db",
+        poolclass=BudgetedQueuePool,
+        pool_size=2,
+        max_overflow=0,
+        pool_timeout=2,
+    )
+
+
+def test_idle_connection_is_reclaimed_from_other_pool(tmp_path, budget_limit):
+    budget_limit(2)
+    tenant_a, tenant_b = _engine(tmp_path, "a"), _engine(tmp_path, "b")
+    first, second = tenant_a.connect(), tenant_a.connect()
+    first.close()
+    second.close()
+    assert tenant_a.pool.checkedin() == 2
+    reclaims = connection_budget.stats()["reclaims"]
+
+    # 预算被 a 的空闲连接占满，b 关闭 a 的一个空闲连接后立即连接，不需要等待
+    started = time.monotonic()
+    with tenant_b.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert time.monotonic() - started < 1
+    assert tenant_a.pool.checkedin() == 1
+    assert connection_budget.stats()["reclaims"] == reclaims + 1
+
+    tenant_a.dispose()
+    tenant_b.dispose()
+
+
+def test_returned_connection_is_handed_to_waiter(tmp_path, budget_limit):
+    budget_limit(1)
+    tenant_a, tenant_b = _engine(tmp_path, "a"), _engine(tmp_path, "b")
+    held = tenant_a.connect()
+    result = []
+
+    def connect_b():
+        with tenant_b.connect() as conn:
+            result.append(conn.execute(text("SELECT 1")).scalar())
+
+    thread = threading.Thread(target=connect_b)
+    thread.start()
+    while not connection_budget.has_waiters():
+        time.sleep(0.01)
+
+    # 有人排队时归还的连接直接关闭，预算交给等待者
+    held.close()
+    thread.join(timeout=2)
+    assert result == [1]
+    assert tenant_a.pool.checkedin() == 0
+
+    tenant_a.dispose()
+    tenant_b.dispose()
+
+
+def test_dispose_releases_budget(tmp_path, budget_limit):
+    budget_limit(2)
+    in_use = connection_budget.stats()["in_use"]
+    engine = _engine(tmp_path, "a")
+    first, second = engine.connect(), engine.connect()
+    first.close()
+    second.close()
+    assert connection_budget.stats()["in_use"] == in_use + 2
+
+    engine.dispose()
+    assert connection_budget.stats()["in_use"] == in_use
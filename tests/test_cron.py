@@ -0,0 +1,96 @@
+"""定时群聊总结：cron 表达式解析和调度辅助函数"""
+from datetime import datetime
+
+import pytest
+
+from src.scheduler.cron import CronExpression
+from src.scheduler.scheduler import ScheduledRobot, SummaryScheduler, parse_scheduled_robots
+
+
+def test_parse_fields():
+    cron = CronExpression("0,30 9-18/3 * 1-6 1-5")
+    assert cron.minutes == {0, 30}
+    assert cron.hours == {9, 12, 15, 18}
+    assert cron.days == set(range(1, 32))
+    assert cron.months == set(range(1, 7))
+    assert cron.weekdays == {1, 2, 3, 4, 5}
+
+
+def test_step_from_start_value():
+    # a/n 表示从 a 开始到最大值，每 n 个取一个
+    assert CronExpression("5/20 * * * *").minutes == {5, 25, 45}
+
+
+def test_aliases_and_seconds_field():
+    assert CronExpression("@daily").minutes == {0}
+    assert CronExpression("@daily").hours == {0}
+    assert CronExpression("@HOURLY").hours == set(range(24))
+    # 6 段表达式忽略秒字段
+    cron = CronExpression("30 0 20 * * ?")
+    assert cron.minutes == {0}
+    assert cron.hours == {20}
+
+
+def test_sunday_as_zero_or_seven():
+    sunday = datetime(2024, 6, 2, 8, 0)
+    assert CronExpression("0 8 * * 0").matches(sunday)
+    assert CronExpression("0 8 * * 7").matches(sunday)
+    assert not CronExpression("0 8 * * 1").matches(sunday)
+
+
+def test_day_and_weekday_match_either():
+    # 与标准 cron 一致：日和周都有限制时满足其一即可
+    cron = CronExpression("0 0 1 * 1")
+    assert cron.matches(datetime(2024, 6, 1))   # 1 号（周六）
+    assert cron.matches(datetime(2024, 6, 3))   # 周一
+    assert not cron.matches(datetime(2024, 6, 4))
+    # 只限制其中一个时按该字段判断
+    assert not CronExpression("0 0 1 * *").matches(datetime(2024, 6, 3))
+    assert CronExpression("0 0 * * 1").matches(datetime(2024, 6, 3))
+
+
+@pytest.mark.parametrize("expression", [
+    "* * * *",
+    "* * * * * * *",
+    "60 * * * *",
+    "* 24 * * *",
+    "* * 0 * *",
+    "* * * 13 *",
+    "* * * * 8",
+    "*/0 * * * *",
+    "5-1 * * * *",
+    "a * * * *",
+    "",
+])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_previous_trigger():
+    cron = CronExpression("0 9,21 * * *")
+    assert cron.previous(datetime(2024, 6, 2, 21, 0)) == datetime(2024, 6, 2, 9, 0)
+    assert cron.previous(datetime(2024, 6, 2, 9, 0, 30)) == datetime(2024, 6, 1, 21, 0)
+    # 跨月、跨年
+    assert CronExpression("30 23 * * *").previous(datetime(2024, 1, 1, 0, 0)) == datetime(2023, 12, 31, 23, 30)
+    assert CronExpression("0 0 1 * *").previous(datetime(2024, 3, 1, 0, 0)) == datetime(2024, 2, 1, 0, 0)
+
+
+def test_previous_without_trigger_in_a_year():
+    assert CronExpression("0 0 30 2 *").previous(datetime(2024, 6, 1)) is None
+
+
+def test_parse_scheduled_robots_skips_malformed_items():
+    robots = parse_scheduled_robots(" robot_a:9000:wxid_a , bad, robot_b:9001:wxid_b, robot_c::wxid_c ,")
+    assert robots == [
+        ScheduledRobot(robot_code="robot_a", port="9000", wx_id="wxid_a"),
+        ScheduledRobot(robot_code="robot_b", port="9001", wx_id="wxid_b"),
+    ]
+
+
+def test_jitter_is_deterministic_and_bounded():
+    delays = [SummaryScheduler.jitter_for("robot_a", f"{n}@chatroom", 600) for n in range(200)]
+    assert delays == [SummaryScheduler.jitter_for("robot_a", f"{n}@chatroom", 600) for n in range(200)]
+    assert all(0 <= delay <= 600 for delay in delays)
+    assert len(set(delays)) > 100
+    assert SummaryScheduler.jitter_for("robot_a", "1@chatroom", 0) == 0
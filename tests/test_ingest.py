@@ -0,0 +1,260 @@
+"""Webhook 消息入库：消息转换、按批写入、NewMsgId 去重和队列上限"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.model.message import Base, Message
+from src.webhook.dedupe import MessageDeduper
+from src.webhook.ingest import IngestQueueFull, MessageIngestor, message_to_row
+
+ROBOT_CODE = "robot_a"
+ROBOT_WXID = "wxid_self"
+ROOM = "12345678@chatroom"
+
+
+def make_message(n: int, content: str = "", msg_type: int = 1, **extra) -> dict:
+    message = {
+        "MsgId": n,
+        "NewMsgId": 10_000 + n,
+        "FromUserName": {"string": ROOM},
+        "ToUserName": {"string": ROBOT_WXID},
+        "Content": {"string": content or f"wxid_member:\n第 {n} 条消息"},
+        "CreateTime": 1_700_000_000 + n,
+        "MsgType": msg_type,
+    }
+    message.update(extra)
+    return message
+
+
+def test_message_to_row_splits_group_sender():
+    row = message_to_row(make_message(1, "wxid_member:\n大家好"), ROBOT_WXID, 1)
+    assert row["from_wxid"] == ROOM
+    assert row["sender_wxid"] == "wxid_member"
+    assert row["content"] == "大家好"
+    assert row["msg_id"] == 10_001
+    assert row["is_chat_room"] is True
+
+
+def test_message_to_row_own_group_message_and_mentions():
+    own = make_message(2, "我发的", FromUserName={"string": ROBOT_WXID}, ToUserName={"string": ROOM})
+    row = message_to_row(own, ROBOT_WXID, 1)
+    assert (row["from_wxid"], row["sender_wxid"], row["content"]) == (ROOM, ROBOT_WXID, "我发的")
+
+    mention = make_message(3, MsgSource=f"<msgsource><atuserlist><![CDATA[wxid_x,{ROBOT_WXID}]]></atuserlist></msgsource>")
+    assert message_to_row(mention, ROBOT_WXID, 1)["is_at_me"] is True
+    assert message_to_row(make_message(4), ROBOT_WXID, 1)["is_at_me"] is False
+
+
+def test_message_to_row_app_type_and_skipped_messages():
+    appmsg = "wxid_member:\n<msg><appmsg><title>文章</title><type>5</type></appmsg></msg>"
+    assert message_to_row(make_message(5, appmsg, msg_type=49), ROBOT_WXID, 1)["app_msg_type"] == 5
+    assert message_to_row(make_message(6, msg_type=51), ROBOT_WXID, 1) is None  # 初始化消息
+    assert message_to_row({"MsgType": 0}, ROBOT_WXID, 1) is None
+    assert message_to_row("not a dict", ROBOT_WXID, 1) is None
+
+
+@pytest.fixture
+def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'tenant.db'}")
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(setup())
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def _ingestor(session_maker, **kwargs) -> MessageIngestor:
+    async def factory(robot_code):
+        return session_maker
+
+    kwargs.setdefault("flush_interval", 0.05)
+    return MessageIngestor(session_maker_factory=factory, **kwargs)
+
+
+async def _count_rows(session_maker) -> int:
+    async with session_maker() as db:
+        return int((await db.execute(select(func.count()).select_from(Message))).scalar_one())
+
+
+def test_batched_writes(session_maker):
+    async def run():
+        ingestor = _ingestor(session_maker, batch_size=50)
+        for offset in range(0, 120, 10):
+            ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(offset + n) for n in range(10)])
+        await ingestor.aclose()
+        return ingestor.stats(), await _count_rows(session_maker)
+
+    stats, rows = asyncio.run(run())
+    assert rows == 120
+    assert stats["written"] == 120
+    assert stats["pending"] == 0
+    # 投递之间没有让出事件循环，120 条按 50 条一批写入
+    assert stats["batches"] == 3
+
+
+def test_duplicate_deliveries_are_dropped(session_maker):
+    async def run():
+        deduper = MessageDeduper()
+        ingestor = _ingestor(session_maker, batch_size=50, deduper=deduper)
+        delivery = [make_message(n) for n in range(10)]
+        accepted = [
+            ingestor.submit(ROBOT_CODE, ROBOT_WXID, delivery),
+            # 客户端重试同一次推送
+            ingestor.submit(ROBOT_CODE, ROBOT_WXID, delivery),
+            # 一次推送中也可能有重复的消息
+            ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(20), make_message(20), make_message(3)]),
+        ]
+        await ingestor.aclose()
+        return accepted, deduper.stats(), await _count_rows(session_maker)
+
+    accepted, dedupe_stats, rows = asyncio.run(run())
+    assert accepted == [10, 0, 1]
+    assert rows == 11
+    assert dedupe_stats["duplicates"] == 12
+
+
+def test_writes_are_idempotent_without_deduper(session_maker):
+    async def run():
+        ingestor = _ingestor(session_maker, batch_size=50)
+        delivery = [make_message(n) for n in range(10)]
+        ingestor.submit(ROBOT_CODE, ROBOT_WXID, delivery + [make_message(3)])
+        while ingestor.stats()["pending"]:
+            await asyncio.sleep(0.01)
+        # msg_id 不是唯一键，已入库的消息在写入前被排除
+        ingestor.submit(ROBOT_CODE, ROBOT_WXID, delivery + [make_message(10)])
+        await ingestor.aclose()
+        return ingestor.stats(), await _count_rows(session_maker)
+
+    stats, rows = asyncio.run(run())
+    assert rows == 11
+    assert stats["written"] == 11
+    assert stats["conflicts"] == 11
+
+
+def test_retry_after_commit_error_does_not_duplicate(session_maker):
+    failures = [1]
+
+    class FlakySession(AsyncSession):
+        async def commit(self):
+            await super().commit()
+            # 提交已经生效，但调用方收到错误并整批重试
+            if failures:
+                failures.pop()
+                raise OperationalError("COMMIT", {}, Exception("连接中断"))
+
+    flaky = async_sessionmaker(bind=session_maker.kw["bind"], class_=FlakySession, expire_on_commit=False)
+
+    async def run():
+        ingestor = _ingestor(flaky, batch_size=50)
+        ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(n) for n in range(10)])
+        await ingestor.aclose()
+        return ingestor.stats(), await _count_rows(session_maker)
+
+    stats, rows = asyncio.run(run())
+    assert failures == []
+    assert rows == 10
+    # 第一次提交的结果未知，重试时整批都已入库
+    assert (stats["written"], stats["conflicts"], stats["failed"]) == (0, 10, 0)
+
+
+def test_rejected_delivery_is_not_remembered(session_maker):
+    async def run():
+        ingestor = _ingestor(session_maker, max_pending=5, batch_size=50, deduper=MessageDeduper())
+        ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(n) for n in range(4)])
+        retry = [make_message(n) for n in range(10, 13)]
+        with pytest.raises(IngestQueueFull):
+            ingestor.submit(ROBOT_CODE, ROBOT_WXID, retry)
+        # 队列写完后重试，被拒绝的消息没有被记为已见过
+        while ingestor.stats()["pending"]:
+            await asyncio.sleep(0.01)
+        accepted = ingestor.submit(ROBOT_CODE, ROBOT_WXID, retry)
+        await ingestor.aclose()
+        return accepted, ingestor.stats(), await _count_rows(session_maker)
+
+    accepted, stats, rows = asyncio.run(run())
+    assert accepted == 3
+    assert stats["rejected"] == 3
+    assert rows == 7
+
+
+def test_dropped_batch_is_forgotten_by_deduper(session_maker):
+    available = []
+
+    async def factory(robot_code):
+        return session_maker if available else None
+
+    async def run():
+        deduper = MessageDeduper()
+        ingestor = MessageIngestor(
+            flush_interval=0.01, max_retries=0, session_maker_factory=factory, deduper=deduper,
+        )
+        delivery = [make_message(n) for n in range(5)]
+        ingestor.submit(ROBOT_CODE, ROBOT_WXID, delivery)
+        while ingestor.stats()["pending"]:
+            await asyncio.sleep(0.01)
+        # 整批写入失败后被丢弃，客户端重新推送时不应被当作重复
+        available.append(True)
+        accepted = ingestor.submit(ROBOT_CODE, ROBOT_WXID, delivery)
+        await ingestor.aclose()
+        return accepted, ingestor.stats(), deduper.stats(), await _count_rows(session_maker)
+
+    accepted, stats, dedupe_stats, rows = asyncio.run(run())
+    assert accepted == 5
+    assert stats["failed"] == 5
+    assert rows == 5
+    assert dedupe_stats["ids"] == 5
+
+
+def test_deduper_forget():
+    deduper = MessageDeduper(window=600, buckets=6)
+    deduper.remember(ROBOT_CODE, [make_message(n) for n in range(4)])
+    deduper.forget(ROBOT_CODE, [make_message(1), make_message(2), make_message(99)])
+    deduper.forget("other_robot", [make_message(0)])
+    fresh, duplicates = deduper.unseen(ROBOT_CODE, [make_message(n) for n in range(4)])
+    assert [message["MsgId"] for message in fresh] == [1, 2]
+    assert duplicates == 2
+    assert deduper.stats()["ids"] == 2
+
+
+def test_oversize_delivery_is_accepted_when_queue_is_empty(session_maker):
+    async def run():
+        ingestor = _ingestor(session_maker, max_pending=5, batch_size=3)
+        accepted = ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(n) for n in range(8)])
+        with pytest.raises(IngestQueueFull):
+            ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(100)])
+        await ingestor.aclose()
+        return accepted, await _count_rows(session_maker)
+
+    assert asyncio.run(run()) == (8, 8)
+
+
+def test_leftover_messages_keep_their_flush_deadline():
+    async def run():
+        flushed = []
+        ingestor = MessageIngestor(batch_size=3, flush_interval=0.3)
+
+        async def slow_flush(robot_code, batch):
+            flushed.append((time.monotonic() - started, len(batch)))
+            await asyncio.sleep(0.2)
+
+        ingestor._flush = slow_flush
+        started = time.monotonic()
+        ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(n) for n in range(3)])
+        await asyncio.sleep(0.05)
+        # 写入第一批期间到达 4 条，攒满的一批写完后剩下 1 条
+        ingestor.submit(ROBOT_CODE, ROBOT_WXID, [make_message(n) for n in range(10, 14)])
+        await asyncio.sleep(0.8)
+        await ingestor.aclose()
+        return flushed
+
+    flushed = asyncio.run(run())
+    assert [size for _, size in flushed] == [3, 3, 1]
+    # 剩下的一条在 0.05 秒到达，0.35 秒到期，上一批 0.4 秒写完后立即写入，而不是从 0.2 秒取出上一批时重新计时
+    assert flushed[2][0] < 0.45
@@ -0,0 +1,132 @@
+"""后台任务池：状态流转、排队上限、清理、任务归属和上下文隔离"""
+import asyncio
+import contextvars
+import time
+
+import pytest
+
+from src.tools.mcp_chat_room_summary import _job_owner
+from src.utils.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobQueueFull
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="")
+
+
+def test_job_status_and_progress():
+    async def run():
+        queue = JobQueue(workers=1)
+        release = asyncio.Event()
+        seen = []
+
+        async def summarize(job):
+            queue.update(job, 1, 3, "读取聊天记录")
+            seen.append(job.to_dict())
+            await release.wait()
+            queue.update(job, 3)
+            return "报告"
+
+        async def fail(job):
+            raise RuntimeError("AI 服务不可用")
+
+        first = queue.submit("summary", summarize)
+        second = queue.submit("summary", fail)
+        assert (first.status, second.status) == (QUEUED, QUEUED)
+        await asyncio.sleep(0.01)
+        # 只有一个 worker，第二个任务还在排队
+        assert (first.status, second.status) == (RUNNING, QUEUED)
+        assert queue.stats()["pending"] == 1
+
+        release.set()
+        while not second.done:
+            await asyncio.sleep(0.01)
+        stats = queue.stats()
+        await queue.aclose()
+        return first, second, seen, stats
+
+    first, second, seen, stats = asyncio.run(run())
+    assert seen[0]["progress"] == 1 and seen[0]["total"] == 3 and seen[0]["message"] == "读取聊天记录"
+    assert (first.status, first.result, first.progress, first.message) == (SUCCEEDED, "报告", 3, "读取聊天记录")
+    assert (second.status, second.error) == (FAILED, "AI 服务不可用")
+    assert first.started_at <= first.finished_at <= second.started_at
+    assert (stats["succeeded"], stats["failed"], stats["running"]) == (1, 1, 0)
+
+
+def test_queue_limit_and_shutdown():
+    async def run():
+        queue = JobQueue(workers=1, max_pending=1)
+
+        async def forever(job):
+            await asyncio.sleep(10)
+
+        running = queue.submit("summary", forever)
+        await asyncio.sleep(0.01)
+        queued = queue.submit("summary", forever)
+        with pytest.raises(JobQueueFull):
+            queue.submit("summary", forever)
+        rejected = queue.stats()["rejected"]
+        await queue.aclose()
+        return running, queued, rejected
+
+    running, queued, rejected = asyncio.run(run())
+    assert rejected == 1
+    # 服务停止时未完成的任务（包括排队中的）标记为失败
+    assert (running.status, running.error) == (FAILED, "任务被取消")
+    assert (queued.status, queued.error) == (FAILED, "服务已停止")
+
+
+def test_finished_jobs_are_purged_after_retention():
+    async def run():
+        queue = JobQueue(retention=60)
+
+        async def noop(job):
+            return None
+
+        job = queue.submit("summary", noop)
+        while not job.done:
+            await asyncio.sleep(0.01)
+        assert queue.get(job.id) is job
+        job.finished_at = time.time() - 61
+        await queue.aclose()
+        return queue.get(job.id), queue.get("missing")
+
+    assert asyncio.run(run()) == (None, None)
+
+
+def test_jobs_run_in_isolated_contexts():
+    async def run():
+        queue = JobQueue(workers=1)
+        seen = []
+
+        async def record(job):
+            seen.append(request_id.get())
+            request_id.set(job.id)
+
+        request_id.set("提交方的请求")
+        jobs = [queue.submit("summary", record) for _ in range(2)]
+        while not all(job.done for job in jobs):
+            await asyncio.sleep(0.01)
+        await queue.aclose()
+        return seen, request_id.get()
+
+    seen, submitter = asyncio.run(run())
+    # 任务看不到提交方的上下文，前一个任务设置的值也不会串到下一个任务
+    assert seen == ["", ""]
+    assert submitter == "提交方的请求"
+
+
+class _Meta:
+    def __init__(self, data):
+        self.data = data
+
+    def model_dump(self):
+        return self.data
+
+
+def test_job_owner_is_robot_and_room():
+    meta = {"RobotCode": "robot_a", "FromWxID": "12345678@chatroom", "SenderWxID": "wxid_a"}
+    assert _job_owner(meta) == "robot_a/12345678@chatroom"
+    assert _job_owner(_Meta(meta)) == "robot_a/12345678@chatroom"
+    # 同一个群里的其他人也可以查询，其他群或其他机器人不行
+    assert _job_owner(dict(meta, SenderWxID="wxid_b")) == _job_owner(meta)
+    assert _job_owner(dict(meta, FromWxID="other@chatroom")) != _job_owner(meta)
+    assert _job_owner(dict(meta, RobotCode="robot_b")) != _job_owner(meta)
+    assert _job_owner(None) == ""
@@ -0,0 +1,132 @@
+"""分段总结：切分、并行度、合并顺序和失败时取消其余的段"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm.rate_limiter import LLMRateLimiter
+from src.summary import map_reduce
+from src.summary.map_reduce import SummaryError, _gather_or_cancel, split_chunks, summarize_transcript
+from src.summary.prompts import CHUNK_PROMPT, REDUCE_PROMPT, REPORT_PROMPT
+
+
+class FakeClient:
+    """按调用记录 system prompt 和用户内容，返回 reply 生成的内容"""
+
+    def __init__(self, reply=None, delay=0.01):
+        self.base_url = "https://api.example.com/v1"
+        self.api_key = "sk-test"
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.reply = reply or (lambda system, content: f"摘要{len(self.calls)}")
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, stream, max_tokens):
+        system, content = messages[0]["content"], messages[1]["content"]
+        self.calls.append((system, content))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            text = self.reply(system, content)
+        finally:
+            self.running -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+@pytest.fixture(autouse=True)
+def unlimited(monkeypatch):
+    monkeypatch.setattr(map_reduce, "llm_rate_limiter", LLMRateLimiter(rpm=0, tpm=0))
+
+
+def test_split_chunks_keeps_order_and_limit():
+    lines = ["a" * 4, "b" * 4, "c" * 4, "d" * 20, "e"]
+    chunks = split_chunks(lines, 10)
+    # 每行按长度 + 换行计算，超长的单行独占一段
+    assert chunks == [["aaaa", "bbbb"], ["cccc"], ["d" * 20], ["e"]]
+    assert [line for chunk in chunks for line in chunk] == lines
+    assert split_chunks([], 10) == []
+
+
+def test_short_transcript_is_summarized_in_one_call():
+    client = FakeClient()
+    report = asyncio.run(summarize_transcript(client, "gpt", "测试群", ["张三: 你好"], chunk_chars=100, preamble="时间为北京时间"))
+    assert report == "摘要1"
+    assert len(client.calls) == 1
+    system, content = client.calls[0]
+    assert system == REPORT_PROMPT
+    assert content.startswith("群名称: 测试群\n时间为北京时间\n")
+    assert content.endswith("张三: 你好")
+
+
+def test_long_transcript_is_mapped_in_parallel_and_reduced_in_order():
+    def reply(system, content):
+        if system == CHUNK_PROMPT:
+            return content.rsplit("\n", 1)[-1]
+        return "最终报告"
+
+    client = FakeClient(reply)
+    lines = [f"第{i}条" for i in range(8)]
+    report = asyncio.run(summarize_transcript(client, "gpt", "测试群", lines, chunk_chars=10, max_parallel=2))
+
+    assert report == "最终报告"
+    assert [system for system, _ in client.calls] == [CHUNK_PROMPT] * 4 + [REDUCE_PROMPT]
+    assert client.max_running == 2
+    # 合并时各段按时间顺序排列，与完成顺序无关
+    digest = client.calls[-1][1]
+    assert digest.index("【第 1 段】\n第1条") < digest.index("【第 4 段】\n第7条")
+
+
+def test_empty_reply_raises_summary_error():
+    client = FakeClient(lambda system, content: "")
+    with pytest.raises(SummaryError, match="空内容"):
+        asyncio.run(summarize_transcript(client, "gpt", "测试群", ["张三: 你好"], chunk_chars=0))
+
+
+def test_failed_chunk_cancels_the_others():
+    async def run():
+        cancelled = []
+
+        async def slow(i):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(i)
+                raise
+            return "不会返回"
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise SummaryError("AI 总结失败")
+
+        with pytest.raises(SummaryError):
+            await asyncio.wait_for(_gather_or_cancel([slow(0), fail(), slow(2)]), timeout=1)
+        return cancelled
+
+    assert sorted(asyncio.run(run())) == [0, 2]
+
+
+def test_cancelling_the_caller_cancels_every_chunk():
+    async def run():
+        started = asyncio.Event()
+        cancelled = []
+
+        async def slow(i):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(i)
+                raise
+            return "不会返回"
+
+        outer = asyncio.ensure_future(_gather_or_cancel([slow(i) for i in range(3)]))
+        await started.wait()
+        outer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await outer
+        return cancelled
+
+    assert sorted(asyncio.run(run())) == [0, 1, 2]
@@ -0,0 +1,149 @@
+"""群聊总结取数：列投影查询、按批流式读取和计数"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.model.chat_room_member import Base as MemberBase, ChatRoomMember
+from src.model.message import Base as MessageBase, Message
+from src.repository.message import AsyncMessageRepository, MessageRepository
+
+ROOM = "12345678@chatroom"
+SELF = "wxid_self"
+START = 1_700_000_000
+
+
+def _appmsg(app_type: int, title: str = "", des: str = "") -> str:
+    return f"<msg><appmsg><title>{title}</title><des>{des}</des><type>{app_type}</type></appmsg></msg>"
+
+
+# (类型, app_msg_type 列, 内容, 发送者, 时间偏移)
+ROWS = [
+    (1, 0, "早上好", "wxid_a", 0),
+    (1, 0, "今天开会吗", "wxid_b", 10),
+    (49, 57, _appmsg(57, "引用回复"), "wxid_c", 20),
+    (49, 57, _appmsg(57, ""), "wxid_a", 30),  # 标题为空的引用消息保留为空内容
+    (49, 5, _appmsg(5, "一篇文章", "文章摘要"), "wxid_b", 40),
+    (49, 6, _appmsg(6, "报告.pdf"), "wxid_c", 50),
+    (49, 0, _appmsg(57, "旧数据的引用"), "wxid_a", 60),  # 旧数据按 XML 中的类型判断
+    (49, 0, _appmsg(33, "小程序"), "wxid_b", 70),  # 小程序不参与总结
+    (49, 33, _appmsg(33, "小程序"), "wxid_b", 75),
+    (47, 0, "<emoji />", "wxid_c", 80),  # 表情不参与总结
+    (1, 0, "我自己发的", SELF, 90),  # 自己发的消息不参与总结
+    (1, 0, "晚上好", "wxid_c", 100),
+    (1, 0, "时间范围之外", "wxid_a", 5000),
+]
+
+EXPECTED = [
+    ("备注A", "早上好", START),
+    ("昵称B", "今天开会吗", START + 10),
+    ("wxid_c", "引用回复", START + 20),
+    ("备注A", "", START + 30),
+    ("昵称B", "网页分享消息，标题: 一篇文章，描述：文章摘要", START + 40),
+    ("wxid_c", "文件消息，文件名: 报告.pdf", START + 50),
+    ("备注A", "旧数据的引用", START + 60),
+    ("wxid_c", "晚上好", START + 100),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "tenant.db"
+    engine = create_engine(f"sqlite:///{path}")
+    MessageBase.metadata.create_all(engine)
+    MemberBase.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert(), [
+            {
+                "msg_id": n + 1,
+                "client_msg_id": n + 1,
+                "type": msg_type,
+                "app_msg_type": app_msg_type,
+                "content": content,
+                "from_wxid": ROOM,
+                "sender_wxid": sender,
+                "created_at": START + offset,
+                "updated_at": START + offset,
+            }
+            for n, (msg_type, app_msg_type, content, sender, offset) in enumerate(ROWS)
+        ] + [{
+            "msg_id": 1000,
+            "client_msg_id": 1000,
+            "type": 1,
+            "app_msg_type": 0,
+            "content": "其他群的消息",
+            "from_wxid": "other@chatroom",
+            "sender_wxid": "wxid_a",
+            "created_at": START,
+            "updated_at": START,
+        }])
+        conn.execute(ChatRoomMember.__table__.insert(), [
+            {"id": 1, "chat_room_id": ROOM, "wechat_id": "wxid_a", "remark": "备注A", "nickname": "昵称A",
+             "joined_at": 0, "last_active_at": 0},
+            {"id": 2, "chat_room_id": ROOM, "wechat_id": "wxid_b", "remark": "", "nickname": "昵称B",
+             "joined_at": 0, "last_active_at": 0},
+        ])
+    engine.dispose()
+    return path
+
+
+def _flatten(items):
+    return [(item.nickname, item.message, item.created_at) for item in items]
+
+
+def test_get_messages_by_time_range(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    with sessionmaker(bind=engine)() as db:
+        items = MessageRepository(db).get_messages_by_time_range(SELF, ROOM, START, START + 1000)
+    engine.dispose()
+    assert _flatten(items) == EXPECTED
+
+
+def test_iter_messages_in_batches(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    with sessionmaker(bind=engine)() as db:
+        repo = MessageRepository(db)
+        batches = list(repo.iter_messages_by_time_range(SELF, ROOM, START, START + 1000, batch_size=3))
+        items = [item for batch in batches for item in batch]
+        # 流式读取时发送者昵称为微信ID，读取结束后再填充
+        assert [item.nickname for item in items] == [item.sender_wxid for item in items]
+        repo.resolve_nicknames(ROOM, items)
+    engine.dispose()
+    assert all(len(batch) <= 3 for batch in batches)
+    assert len(batches) > 1
+    assert _flatten(items) == EXPECTED
+
+
+def test_count_messages_stops_at_limit(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    with sessionmaker(bind=engine)() as db:
+        repo = MessageRepository(db)
+        # 计数只走索引，旧数据的APP消息（含被过滤的小程序）也计入，是取数条数的上限
+        assert repo.count_messages_by_time_range(SELF, ROOM, START, START + 1000, 100) == len(EXPECTED) + 1
+        assert repo.count_messages_by_time_range(SELF, ROOM, START, START + 1000, 3) == 3
+    engine.dispose()
+
+
+def test_async_fetch_and_stream_match_sync(db_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        try:
+            async with async_sessionmaker(bind=engine)() as db:
+                repo = AsyncMessageRepository(db)
+                fetched = await repo.get_messages_by_time_range(SELF, ROOM, START, START + 1000)
+                streamed = []
+                async for batch in repo.stream_messages_by_time_range(SELF, ROOM, START, START + 1000, batch_size=2):
+                    assert len(batch) <= 2
+                    streamed.extend(batch)
+                await repo.resolve_nicknames(ROOM, streamed)
+                count = await repo.count_messages_by_time_range(SELF, ROOM, START, START + 1000, 100)
+            return fetched, streamed, count
+        finally:
+            await engine.dispose()
+
+    fetched, streamed, count = asyncio.run(run())
+    assert _flatten(fetched) == EXPECTED
+    assert _flatten(streamed) == EXPECTED
+    assert count == len(EXPECTED) + 1
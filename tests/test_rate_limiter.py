@@ -0,0 +1,113 @@
+"""LLM 限流：令牌桶补充、429 后清空额度和排队超时"""
+import asyncio
+
+import pytest
+
+from src.llm.rate_limiter import LLMRateLimiter, RateLimitTimeout, TokenBucket
+
+BASE_URL = "https://api.example.com/v1"
+API_KEY = "sk-test-1234"
+
+
+def test_bucket_refills_per_second():
+    bucket = TokenBucket(per_minute=60)
+    bucket.updated_at = 0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1)
+
+    bucket.refill(30)
+    assert bucket.tokens == pytest.approx(30)
+    # 补充不超过容量
+    bucket.refill(600)
+    assert bucket.tokens == 60
+
+
+def test_oversized_request_waits_for_full_bucket():
+    bucket = TokenBucket(per_minute=1000)
+    bucket.updated_at = 0
+    bucket.take(400)
+    # 超过容量的请求只需等到桶满，之后允许额度短暂为负
+    assert bucket.wait_time(5000) == pytest.approx(24)
+    bucket.refill(24)
+    assert bucket.wait_time(5000) == 0
+    bucket.take(5000)
+    assert bucket.tokens == pytest.approx(-4000)
+
+
+def test_unlimited_bucket():
+    bucket = TokenBucket(per_minute=0)
+    bucket.take(10 ** 9)
+    assert bucket.wait_time(10 ** 9) == 0
+
+
+def test_rpm_limit_times_out_instead_of_waiting():
+    async def run():
+        limiter = LLMRateLimiter(rpm=2, tpm=0, max_wait=0.1)
+        await limiter.acquire(BASE_URL, API_KEY, 100)
+        await limiter.acquire(BASE_URL + "/", API_KEY, 100)
+        # 下一个额度约 30 秒后才补充，超过 max_wait 时立即失败
+        with pytest.raises(RateLimitTimeout):
+            await limiter.acquire(BASE_URL, API_KEY, 100)
+        # 不同的 API Key 有各自的额度
+        await limiter.acquire(BASE_URL, "sk-other", 100)
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert len(stats["upstreams"]) == 2
+    upstream = stats["upstreams"][f"{BASE_URL} ***1234"]
+    assert (upstream["acquired"], upstream["timeouts"]) == (2, 1)
+
+
+def test_tpm_limit_waits_for_refill():
+    async def run():
+        limiter = LLMRateLimiter(rpm=0, tpm=6000, max_wait=2)
+        await limiter.acquire(BASE_URL, API_KEY, 5900)
+        # 还差 50 个 token，每秒补充 100 个，等待约 0.5 秒
+        waited = await limiter.acquire(BASE_URL, API_KEY, 150)
+        return waited, limiter.stats()
+
+    waited, stats = asyncio.run(run())
+    assert 0.3 < waited < 1
+    assert stats["upstreams"][f"{BASE_URL} ***1234"]["delayed"] == 1
+
+
+def test_penalize_empties_request_bucket():
+    async def run():
+        limiter = LLMRateLimiter(rpm=60, tpm=0, max_wait=0.1)
+        await limiter.acquire(BASE_URL, API_KEY, 100)
+        limiter.penalize(BASE_URL, API_KEY)
+        with pytest.raises(RateLimitTimeout):
+            await limiter.acquire(BASE_URL, API_KEY, 100)
+        # 没有用过的上游不受影响
+        limiter.penalize("https://other.example.com", API_KEY)
+        await limiter.acquire("https://other.example.com", API_KEY, 100)
+
+    asyncio.run(run())
+
+
+def test_lock_timeout_and_cancel_do_not_leak_the_lock():
+    async def run():
+        limiter = LLMRateLimiter(rpm=600, tpm=0, max_wait=0.05)
+        await limiter.acquire(BASE_URL, API_KEY, 1)
+        state = limiter._get_limiter((BASE_URL, API_KEY))
+
+        # 前面的请求持有锁时排队超时
+        await state.lock.acquire()
+        with pytest.raises(RateLimitTimeout, match="超过"):
+            await limiter.acquire(BASE_URL, API_KEY, 1)
+
+        # 排队时被取消
+        limiter.max_wait = 5
+        waiting = asyncio.ensure_future(limiter.acquire(BASE_URL, API_KEY, 1))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        # 释放锁和取消在同一轮事件循环中发生
+        state.lock.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        assert not state.lock.locked()
+        assert state.waiting == 0
+        await asyncio.wait_for(limiter.acquire(BASE_URL, API_KEY, 1), timeout=1)
+
+    asyncio.run(run())
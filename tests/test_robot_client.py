@@ -0,0 +1,122 @@
+"""机器人客户端：DNS 缓存和连接失败后重新解析重试"""
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from src.utils.robot_client import DNSCache, RobotClient
+
+
+class FakeResolver:
+    """按顺序返回地址的 getaddrinfo，记录解析次数"""
+
+    def __init__(self, *addresses):
+        self.addresses = list(addresses)
+        self.calls = 0
+
+    async def __call__(self, host, port, type=0):
+        address = self.addresses[min(self.calls, len(self.addresses) - 1)]
+        self.calls += 1
+        if isinstance(address, list):
+            return address
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+
+def _run_with_resolver(resolver, coro_factory):
+    async def run():
+        asyncio.get_running_loop().getaddrinfo = resolver
+        return await coro_factory()
+
+    return asyncio.run(run())
+
+
+def test_dns_cache_ttl_and_invalidate():
+    resolver = FakeResolver("10.0.0.1", "10.0.0.2", "10.0.0.3")
+    cache = DNSCache(ttl=0.05)
+
+    async def resolve():
+        first = await cache.resolve("client_a", 9000)
+        cached = await cache.resolve("client_a", 9000)
+        await asyncio.sleep(0.06)
+        expired = await cache.resolve("client_a", 9000)
+        cache.invalidate("client_a", 9000)
+        invalidated = await cache.resolve("client_a", 9000)
+        return first, cached, expired, invalidated
+
+    assert _run_with_resolver(resolver, resolve) == ("10.0.0.1", "10.0.0.1", "10.0.0.2", "10.0.0.3")
+    assert resolver.calls == 3
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 3}
+
+
+def test_dns_cache_disabled_and_prefers_ipv4():
+    ipv6_first = [
+        (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("fd00::1", 9000, 0, 0)),
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 9000)),
+    ]
+    resolver = FakeResolver(ipv6_first)
+    cache = DNSCache(ttl=0)
+
+    async def resolve():
+        return [await cache.resolve("client_a", 9000) for _ in range(2)]
+
+    assert _run_with_resolver(resolver, resolve) == ["10.0.0.1", "10.0.0.1"]
+    assert resolver.calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_connect_error_reresolves_and_retries_with_host_header():
+    resolver = FakeResolver("10.0.0.1", "10.0.0.2")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        # 旧 IP 的容器已经不存在
+        if request.url.host == "10.0.0.1":
+            raise httpx.ConnectError("连接被拒绝", request=request)
+        return httpx.Response(200, json={"code": 200})
+
+    client = RobotClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def post():
+        try:
+            first = await client.post("robot_a", "9000", "/api/v1/robot/message/send/text", {"to_wxid": "wxid_a"})
+            second = await client.post("robot_a", 9000, "/api/v1/robot/message/send/text", {"to_wxid": "wxid_a"})
+            return first, second
+        finally:
+            await client.aclose()
+
+    first, second = _run_with_resolver(resolver, post)
+    assert first.status_code == second.status_code == 200
+    assert [str(request.url) for request in requests] == [
+        "http://10.0.0.1:9000/api/v1/robot/message/send/text",
+        "http://10.0.0.2:9000/api/v1/robot/message/send/text",
+        "http://10.0.0.2:9000/api/v1/robot/message/send/text",
+    ]
+    assert {request.headers["Host"] for request in requests} == {"client_robot_a:9000"}
+    assert resolver.calls == 2
+    stats = client.stats()
+    assert (stats["requests"], stats["retries"], stats["dns"]["hits"]) == (2, 1, 1)
+
+
+def test_second_connect_error_is_raised():
+    resolver = FakeResolver("10.0.0.1")
+
+    def handler(request):
+        raise httpx.ConnectError("连接被拒绝", request=request)
+
+    client = RobotClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def post():
+        try:
+            return await client.post("robot_a", 9000, "/api/v1/robot/message/send/text", {})
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.ConnectError):
+        _run_with_resolver(resolver, post)
+    # 只重试一次
+    assert client.stats()["retries"] == 1
+    assert resolver.calls == 2
@@ -0,0 +1,74 @@
+"""租户库索引检查：缺失索引的检查、DDL 执行和按模型建表"""
+from sqlalchemy import create_engine, inspect, text
+
+from src.schema import advisor
+from src.schema.advisor import HOT_QUERY_INDEXES, apply_indexes, check_indexes, create_tables
+
+
+def _statuses(findings):
+    return {finding.advice.name: finding.status for finding in findings}
+
+
+def test_reports_and_applies_missing_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tenant.db'}")
+    with engine.begin() as conn:
+        # 早期建的表只有 from_wxid 单列索引
+        conn.execute(text(
+            "CREATE TABLE messages (id INTEGER PRIMARY KEY, from_wxid VARCHAR(64), created_at BIGINT)"
+        ))
+        conn.execute(text("CREATE INDEX idx_from_wxid ON messages (from_wxid)"))
+
+    findings = check_indexes(engine)
+    assert _statuses(findings) == {
+        "idx_from_wxid_created_at": "missing",
+        "idx_chat_room_id_wechat_id": "no_table",
+        "idx_chat_room_id": "no_table",
+    }
+
+    executed = apply_indexes(engine, findings)
+    assert executed == ['CREATE INDEX idx_from_wxid_created_at ON messages (from_wxid, created_at)']
+    indexes = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("messages")}
+    assert indexes["idx_from_wxid_created_at"] == ["from_wxid", "created_at"]
+
+    findings = check_indexes(engine)
+    assert findings[0].status == "ok"
+    assert findings[0].covered_by == "idx_from_wxid_created_at"
+    # 已有索引时不重复执行
+    assert apply_indexes(engine, findings) == []
+    engine.dispose()
+
+
+def test_longer_index_covers_its_prefix(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tenant.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE chat_room_settings (id INTEGER PRIMARY KEY, chat_room_id VARCHAR(64))"))
+        conn.execute(text("CREATE INDEX idx_room_and_id ON chat_room_settings (chat_room_id, id)"))
+    advice = [a for a in HOT_QUERY_INDEXES if a.table == "chat_room_settings"]
+    [finding] = check_indexes(engine, advice)
+    assert (finding.status, finding.covered_by) == ("ok", "idx_room_and_id")
+    engine.dispose()
+
+
+def test_create_tables_declares_hot_query_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tenant.db'}")
+    create_tables(engine)
+    assert set(_statuses(check_indexes(engine)).values()) == {"ok"}
+    assert "chat_room_summary_buckets" in inspect(engine).get_table_names()
+    # 表已存在时再次执行不报错
+    create_tables(engine)
+    engine.dispose()
+
+
+def test_cli_with_dsn_template(tmp_path, capsys):
+    dsn = f"sqlite:///{tmp_path}/{{robot_code}}.db"
+    engine = create_engine(f"sqlite:///{tmp_path / 'robot_a'}.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, from_wxid VARCHAR(64), created_at BIGINT)"))
+    engine.dispose()
+
+    assert advisor.main(["--dsn", dsn, "--robot-code", "robot_a"]) == 1
+    assert "CREATE INDEX idx_from_wxid_created_at" in capsys.readouterr().out
+
+    assert advisor.main(["--dsn", dsn, "--robot-code", "robot_a", "--apply"]) == 0
+    assert "已执行" in capsys.readouterr().out
+    assert advisor.main(["--dsn", dsn, "--robot-code", "robot_b", "--create-tables"]) == 0
@@ -0,0 +1,117 @@
+"""请求级数据库会话：首次访问时创建、作用域结束时释放和泄漏检测"""
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from src.config import config
+from src.config.config import TenantDBManager
+from src.middleware.tenant import tenant_scope
+from src.robot_context import get_async_db, get_db, get_db_scope, release_async_db
+from src.robot_context.session_scope import DBSessionScope, SessionLeakDetector
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncSession(FakeSession):
+    async def close(self):
+        self.closed = True
+
+
+def test_sessions_are_created_on_first_use_and_released():
+    created = []
+
+    def factory(session_type):
+        def create():
+            session = session_type()
+            created.append(session)
+            return session
+        return create
+
+    detector = SessionLeakDetector(threshold=60)
+    scope = DBSessionScope("robot_a", factory(FakeSession), factory(FakeAsyncSession), detector)
+    assert created == []
+    assert scope.acquired_at is None
+
+    session = scope.get_session()
+    assert scope.get_session() is session
+    async_session = scope.get_async_session()
+    assert created == [session, async_session]
+    # 同一个作用域只登记一次
+    assert detector.stats()["active_sessions"] == 1
+
+    asyncio.run(scope.close())
+    assert session.closed and async_session.closed
+    assert scope.acquired_at is None
+    assert detector.stats()["active_sessions"] == 0
+    # 释放后再次访问会创建新的会话
+    assert scope.get_async_session() is not async_session
+
+
+def test_scope_without_factory_returns_none():
+    scope = DBSessionScope("robot_a", leak_detector=SessionLeakDetector())
+    assert scope.get_session() is None
+    assert scope.get_async_session() is None
+    asyncio.run(scope.close())
+
+
+def test_leak_detector_reports_each_scope_once():
+    detector = SessionLeakDetector(threshold=0.05)
+    held = DBSessionScope("held", session_factory=FakeSession, leak_detector=detector)
+    short = DBSessionScope("short", session_factory=FakeSession, leak_detector=detector)
+    held.get_session()
+    short.get_session()
+    asyncio.run(short.close())
+
+    assert detector.check() == 0
+    time.sleep(0.06)
+    assert detector.check() == 1
+    assert detector.check() == 0
+    assert detector.stats() == {"active_sessions": 1, "leaks": 1}
+
+    asyncio.run(held.close())
+    assert detector.stats() == {"active_sessions": 0, "leaks": 1}
+
+
+def test_leak_detection_can_be_disabled():
+    detector = SessionLeakDetector(threshold=0)
+    scope = DBSessionScope("held", session_factory=FakeSession, leak_detector=detector)
+    scope.get_session()
+    assert detector.check() == 0
+
+
+def test_tenant_scope_provides_lazy_async_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "tenant_db_manager", TenantDBManager(
+        async_dsn_builder=lambda robot_code: f"sqlite+aiosqlite:///{tmp_path / robot_code}.db",
+        idle_ttl=0,
+        shared_engine=False,
+    ))
+
+    async def run():
+        async with tenant_scope({"RobotCode": "robot_a", "RobotWxID": "wxid_self"}) as rc:
+            scope = get_db_scope()
+            assert rc.robot_code == "robot_a"
+            assert scope.acquired_at is None
+            # 作用域只提供异步会话，不在事件循环中创建同步引擎
+            assert get_db() is None
+
+            db = get_async_db()
+            assert (await db.execute(text("SELECT 1"))).scalar() == 1
+            assert get_async_db() is db
+
+            await release_async_db()
+            assert scope.acquired_at is None
+            reopened = get_async_db()
+            assert reopened is not db
+            await reopened.execute(text("SELECT 1"))
+        assert scope.acquired_at is None
+        assert get_db_scope() is None
+        await config.tenant_db_manager._tenants["robot_a"].async_engine.dispose()
+
+    asyncio.run(run())
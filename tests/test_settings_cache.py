@@ -0,0 +1,154 @@
+"""设置缓存：读穿透、负缓存、过期和主动失效，以及失效接口的鉴权"""
+import time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src import main
+from src.config import config
+from src.model.chatroom_settings import Base as ChatRoomSettingsBase, ChatRoomSettings
+from src.model.global_settings import Base as GlobalSettingsBase, GlobalSettings
+from src.repository import chatroom_settings as chatroom_settings_module
+from src.repository import global_settings as global_settings_module
+from src.repository.chatroom_settings import ChatRoomSettingsRepository
+from src.repository.global_settings import GlobalSettingsRepository
+from src.repository.settings_cache import CHAT_ROOM_SETTINGS, GLOBAL_SETTINGS, SettingsCache
+
+ROBOT_CODE = "robot_a"
+ROOM = "12345678@chatroom"
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SettingsCache(ttl=60, negative_ttl=30)
+    monkeypatch.setattr(global_settings_module, "settings_cache", cache)
+    monkeypatch.setattr(chatroom_settings_module, "settings_cache", cache)
+    monkeypatch.setattr(main, "settings_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tenant.db'}")
+    GlobalSettingsBase.metadata.create_all(engine)
+    ChatRoomSettingsBase.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(GlobalSettings.__table__.insert(), [{"id": 1, "chat_room_summary_model": "gpt-4o-mini"}])
+        conn.execute(ChatRoomSettings.__table__.insert(), [{"id": 1, "chat_room_id": ROOM, "chat_room_summary_enabled": True}])
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    session = sessionmaker(bind=engine)()
+    session.queries = queries
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_read_through_and_negative_cache(cache, db):
+    global_repo = GlobalSettingsRepository(db, ROBOT_CODE)
+    room_repo = ChatRoomSettingsRepository(db, ROBOT_CODE)
+    first = global_repo.get_global_settings()
+    room = room_repo.get_chatroom_settings(ROOM)
+    assert room_repo.get_chatroom_settings("missing@chatroom") is None
+    assert len(db.queries) == 3
+
+    db.close()
+    # 命中缓存不再查询，缓存的对象已从会话中分离，会话关闭后仍可读取
+    assert global_repo.get_global_settings() is first
+    assert room_repo.get_chatroom_settings(ROOM) is room
+    assert room_repo.get_chatroom_settings("missing@chatroom") is None
+    assert len(db.queries) == 3
+    assert first.chat_room_summary_model == "gpt-4o-mini"
+    assert cache.stats()["hits"] == 3
+
+    # 不传 robot_code 时不经过缓存
+    ChatRoomSettingsRepository(db).get_chatroom_settings(ROOM)
+    assert len(db.queries) == 4
+
+
+def test_entries_expire():
+    cache = SettingsCache(ttl=0.05, negative_ttl=0.02)
+    cache.set(ROBOT_CODE, GLOBAL_SETTINGS, "", "settings")
+    cache.set(ROBOT_CODE, CHAT_ROOM_SETTINGS, ROOM, None)
+    time.sleep(0.03)
+    # 负缓存的有效期更短
+    assert cache.get(ROBOT_CODE, CHAT_ROOM_SETTINGS, ROOM) == (False, None)
+    assert cache.get(ROBOT_CODE, GLOBAL_SETTINGS) == (True, "settings")
+    time.sleep(0.03)
+    assert cache.get(ROBOT_CODE, GLOBAL_SETTINGS) == (False, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SettingsCache(ttl=0)
+    assert not cache.enabled
+    cache.set(ROBOT_CODE, GLOBAL_SETTINGS, "", "settings")
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SettingsCache(max_entries=2)
+    cache.set(ROBOT_CODE, CHAT_ROOM_SETTINGS, "a", 1)
+    cache.set(ROBOT_CODE, CHAT_ROOM_SETTINGS, "b", 2)
+    cache.get(ROBOT_CODE, CHAT_ROOM_SETTINGS, "a")
+    cache.set(ROBOT_CODE, CHAT_ROOM_SETTINGS, "c", 3)
+    assert cache.get(ROBOT_CODE, CHAT_ROOM_SETTINGS, "b") == (False, None)
+    assert cache.get(ROBOT_CODE, CHAT_ROOM_SETTINGS, "a") == (True, 1)
+
+
+def test_invalidate_scopes():
+    cache = SettingsCache()
+    for robot_code in (ROBOT_CODE, "robot_b"):
+        cache.set(robot_code, GLOBAL_SETTINGS, "", "settings")
+        cache.set(robot_code, CHAT_ROOM_SETTINGS, ROOM, "room")
+        cache.set(robot_code, CHAT_ROOM_SETTINGS, "other@chatroom", "room")
+
+    assert cache.invalidate(ROBOT_CODE, ROOM) == 1
+    assert cache.get(ROBOT_CODE, GLOBAL_SETTINGS) == (True, "settings")
+    assert cache.invalidate(ROBOT_CODE) == 2
+    assert cache.get("robot_b", CHAT_ROOM_SETTINGS, ROOM) == (True, "room")
+    assert cache.invalidate() == 3
+    assert cache.stats()["entries"] == 0
+
+
+def _admin_app():
+    return Starlette(routes=[
+        Route("/api/v1/stats", main.stats_handler, methods=["GET"]),
+        Route("/api/v1/settings/invalidate", main.settings_invalidate_handler, methods=["POST"]),
+    ])
+
+
+def test_admin_routes_require_token(cache, monkeypatch):
+    monkeypatch.setattr(config, "admin_token", "secret-token")
+    cache.set(ROBOT_CODE, CHAT_ROOM_SETTINGS, ROOM, "room")
+    client = TestClient(_admin_app(), client=("127.0.0.1", 50000))
+    body = {"robot_code": ROBOT_CODE, "chat_room_id": ROOM}
+
+    # 配置了令牌时本机请求也必须携带令牌
+    assert client.post("/api/v1/settings/invalidate", json=body).status_code == 401
+    wrong = {"Authorization": "Bearer wrong-token"}
+    assert client.post("/api/v1/settings/invalidate", json=body, headers=wrong).status_code == 401
+    assert client.get("/api/v1/stats").status_code == 401
+    assert cache.stats()["entries"] == 1
+
+    headers = {"Authorization": "Bearer secret-token"}
+    response = client.post("/api/v1/settings/invalidate", json=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["data"] == {"removed": 1}
+    stats = client.get("/api/v1/stats", headers=headers)
+    assert stats.status_code == 200
+    assert stats.json()["settings_cache"]["invalidations"] == 1
+
+
+def test_admin_routes_without_token_are_local_only(cache, monkeypatch):
+    monkeypatch.setattr(config, "admin_token", "")
+    remote = TestClient(_admin_app(), client=("203.0.113.7", 50000))
+    assert remote.post("/api/v1/settings/invalidate", json={}).status_code == 403
+    assert remote.get("/api/v1/stats").status_code == 403
+
+    local = TestClient(_admin_app(), client=("127.0.0.1", 50000))
+    assert local.post("/api/v1/settings/invalidate", json={}).status_code == 200
@@ -0,0 +1,108 @@
+"""合并并发请求：领头与跟随、失败传递、领头被取消和冷却复用"""
+import asyncio
+import time
+
+import pytest
+
+from src.utils.singleflight import COOLDOWN, FOLLOWER, LEADER, SingleFlight
+
+
+def test_concurrent_requests_are_coalesced():
+    async def run():
+        flight = SingleFlight(cooldown=0)
+        calls = []
+
+        async def summarize():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "报告"
+
+        results = await asyncio.gather(*(flight.do("room", summarize) for _ in range(5)))
+        other = await flight.do("other_room", summarize)
+        return results, other, calls, flight.stats()
+
+    results, other, calls, stats = asyncio.run(run())
+    assert sorted(role for _, role in results) == [FOLLOWER] * 4 + [LEADER]
+    assert {result for result, _ in results} == {"报告"}
+    assert other == ("报告", LEADER)
+    assert len(calls) == 2
+    assert stats == {"inflight": 0, "recent": 0, "leaders": 2, "followers": 4, "cooldown_hits": 0}
+
+
+def test_followers_receive_the_leader_error():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("AI 服务不可用")
+
+        results = await asyncio.gather(*(flight.do("room", fail) for _ in range(3)), return_exceptions=True)
+        return results, flight.stats()
+
+    results, stats = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # 失败的结果不进入冷却
+    assert stats["recent"] == 0
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    async def run():
+        flight = SingleFlight(cooldown=0)
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+            return "不会返回"
+
+        async def fast():
+            return "接手后的结果"
+
+        leader = asyncio.ensure_future(flight.do("room", slow))
+        await started.wait()
+        follower = asyncio.ensure_future(flight.do("room", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower, flight.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == ("接手后的结果", LEADER)
+    assert stats["leaders"] == 2
+    assert stats["inflight"] == 0
+
+
+def test_cooldown_reuses_only_reusable_results():
+    async def run():
+        flight = SingleFlight(cooldown=0.05)
+        calls = []
+
+        async def summarize():
+            calls.append(1)
+            return {"ok": len(calls) > 1}
+
+        reusable = lambda result: result["ok"]  # noqa: E731
+        first = await flight.do("room", summarize, reusable)
+        # 第一次的结果不可复用，第二次重新执行
+        second = await flight.do("room", summarize, reusable)
+        third = await flight.do("room", summarize, reusable)
+        await asyncio.sleep(0.06)
+        fourth = await flight.do("room", summarize, reusable)
+        return [role for _, role in (first, second, third, fourth)], len(calls)
+
+    roles, calls = asyncio.run(run())
+    assert roles == [LEADER, LEADER, COOLDOWN, LEADER]
+    assert calls == 3
+
+
+def test_recent_results_are_bounded():
+    flight = SingleFlight(cooldown=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        flight._set_recent(key, key)
+    assert list(flight._recent) == ["b", "c"]
+    # 过期的结果在读取时丢弃
+    flight._recent["b"] = (time.monotonic() - 1, "b")
+    assert flight._get_recent("b") is None
+    assert flight.stats()["recent"] == 1
@@ -0,0 +1,98 @@
+"""租户数据库连接管理：LRU 和空闲淘汰、连接失败的负缓存"""
+import time
+
+import pytest
+
+from src.config import config
+from src.config.budget import connection_budget
+from src.config.config import TenantDBManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.mysql_settings, "pool_timeout", 0.2)
+    limit = connection_budget.limit
+    manager = TenantDBManager(
+        dsn_builder=lambda robot_code: f"sqlite:///{tmp_path / robot_code}.db",
+        max_tenants=10,
+        idle_ttl=0,
+        failure_ttl=60,
+        shared_engine=False,
+    )
+    manager.disposed = []
+    dispose_entry = manager._dispose_entry
+
+    def record_dispose(entry):
+        manager.disposed.append(entry.engine)
+        dispose_entry(entry)
+
+    manager._dispose_entry = record_dispose
+    yield manager
+    manager.dispose_all()
+    connection_budget.configure(limit)
+
+
+def test_least_recently_used_tenant_is_evicted(manager):
+    manager._max_tenants = 2
+    session_a = manager.get_session_maker("a")
+    manager.get_session_maker("b")
+    engine_b = manager._tenants["b"].engine
+    # 访问 a 后 b 成为最久未使用的租户
+    assert manager.get_session_maker("a") is session_a
+    manager.get_session_maker("c")
+
+    assert list(manager._tenants) == ["a", "c"]
+    assert manager.disposed == [engine_b]
+    assert manager.stats()["evictions"] == 1
+
+    # 被淘汰的租户再次访问时重新创建
+    manager.get_session_maker("b")
+    assert list(manager._tenants) == ["c", "b"]
+    assert manager.stats()["misses"] == 4
+
+
+def test_idle_tenant_is_evicted_and_recreated(manager):
+    manager._idle_ttl = 0.1
+    session_a = manager.get_session_maker("a")
+    engine_a = manager._tenants["a"].engine
+    time.sleep(0.15)
+
+    session_b = manager.get_session_maker("b")
+    assert list(manager._tenants) == ["b"]
+    assert manager.disposed == [engine_a]
+
+    recreated = manager.get_session_maker("a")
+    assert recreated is not session_a
+    assert manager._tenants["a"].engine is not engine_a
+    with recreated() as db:
+        db.connection()
+    assert manager.get_session_maker("b") is session_b
+
+
+def test_budget_timeout_is_not_negative_cached(manager):
+    connection_budget.configure(connection_budget.stats()["in_use"] + 2)
+    held = [manager.get_session_maker(robot_code)() for robot_code in ("a", "b")]
+    for session in held:
+        session.connection()
+
+    # 预算被其他租户占满，等待超时
+    with pytest.raises(RuntimeError, match="预算已耗尽"):
+        manager.get_session_maker("c")
+    assert manager.stats()["failed_tenants"] == 0
+
+    # 预算释放后立即可以连接，而不是在 failure_ttl 内继续失败
+    held.pop().close()
+    session = manager.get_session_maker("c")()
+    session.connection()
+    session.close()
+    for session in held:
+        session.close()
+
+
+def test_connect_error_is_negative_cached(manager, tmp_path):
+    manager._dsn_builder = lambda robot_code: f"sqlite:///{tmp_path / 'missing' / robot_code}.db"
+    with pytest.raises(RuntimeError, match="打开数据库失败"):
+        manager.get_session_maker("a")
+    with pytest.raises(RuntimeError, match="秒后重试"):
+        manager.get_session_maker("a")
+    assert manager.stats()["negative_hits"] == 1
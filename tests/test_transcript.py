@@ -0,0 +1,92 @@
+"""聊天记录构建：精简、合并连续发言、日期分隔行和按 token 预算抽样"""
+from datetime import datetime
+
+from src.repository.message import TextMessageItem
+from src.summary.transcript import (
+    MERGE_GAP_SECONDS,
+    TranscriptBuilder,
+    _sample_evenly,
+    build_transcript,
+    estimate_tokens,
+)
+
+START = int(datetime(2026, 10, 17, 9, 0).timestamp())
+
+
+def _item(nickname, message, minutes):
+    return TextMessageItem(nickname, message, START + minutes * 60)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("你好，世界") == 5
+    assert estimate_tokens("hello world") == 3
+    assert estimate_tokens("你好 abcd") == 2 + 2
+
+
+def test_transcript_is_compacted_and_merged():
+    transcript = build_transcript([
+        _item("张三", "早上好", 0),
+        _item("张三", "  今天  开会 ", 1),
+        _item("李四", "   ", 2),
+        _item("李四", "[捂脸][旺柴]", 3),
+        _item("李四", "收到", 4),
+        _item("张三", "好的", 5),
+        # 同一个人间隔超过 MERGE_GAP_SECONDS 时另起一行
+        _item("张三", "散会", 5 + MERGE_GAP_SECONDS // 60 + 1),
+    ], START)
+
+    assert transcript.lines == [
+        "[09:00] 张三: 早上好 ｜ 今天 开会",
+        "[09:04] 李四: 收到",
+        "[09:05] 张三: 好的",
+        "[09:11] 张三: 散会",
+    ]
+    stats = transcript.stats
+    assert (stats.messages, stats.dropped_empty, stats.dropped_stickers, stats.merged) == (7, 1, 1, 1)
+    assert (stats.lines, stats.sampled_out, stats.budget) == (4, 0, 0)
+    assert stats.tokens == sum(estimate_tokens(line) for line in transcript.lines)
+    assert transcript.preamble.startswith("聊天记录从 2026-10-17 09:00 开始")
+
+
+def test_day_separator_and_display_names():
+    builder = TranscriptBuilder(START)
+    builder.add([_item("wxid_a", "今天", 0)])
+    builder.add([_item("wxid_b", "明天", 24 * 60)])
+    assert builder.senders == {"wxid_a", "wxid_b"}
+
+    transcript = builder.build({"wxid_a": "张三"})
+    # 缺失显示名称的发送者保持原样，分隔行不计入发言行数
+    assert transcript.lines == ["[09:00] 张三: 今天", "--- 10-18 ---", "[09:00] wxid_b: 明天"]
+    assert transcript.stats.lines == 2
+
+
+def test_sample_evenly_respects_budget():
+    tokens = [10] * 100
+    keep = _sample_evenly(tokens, 250)
+    assert len(keep) == 25
+    assert keep == sorted(set(keep))
+    # 均匀分布在整个时间范围内
+    assert keep[0] == 0 and keep[-1] >= 90
+    assert max(b - a for a, b in zip(keep, keep[1:])) == 4
+
+    # 行长不均时逐步减少行数直到不超预算
+    uneven = [1, 100] * 10
+    keep = _sample_evenly(uneven, 150)
+    assert sum(uneven[i] for i in keep) <= 150
+    assert _sample_evenly([100], 10) == []
+
+
+def test_build_samples_when_over_budget():
+    builder = TranscriptBuilder(START, token_budget=0)
+    builder.add([_item(f"用户{i}", f"第{i}条消息", i) for i in range(60)])
+    full = builder.build()
+    budget = full.stats.tokens // 3
+
+    sampled = builder.build(token_budget=budget)
+    assert sampled.stats.tokens <= budget
+    assert sampled.stats.lines + sampled.stats.sampled_out == 60
+    assert sampled.lines[0] == full.lines[0]
+    assert f"已按时间均匀抽样保留 {sampled.stats.lines}/60 行" in sampled.preamble
+    # 每次构建返回独立的统计
+    assert full.stats.sampled_out == 0